@@ -0,0 +1,217 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import json
+import random
+import resource
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mftlib
+import mkimage
+
+"""
+Measures mftlib on an image of mkimage.py. Every scenario runs in its own process, so the peak RSS
+is the one of the scenario; bytes read and read syscalls are taken from /proc/self/io.
+
+usage: benchmark.py [-i <<IMAGE>>] [-r <<RECORDS>>] [--runs <<RUNS>>] [--lookups <<LOOKUPS>>]
+                    [-w <<RESULTS>>] [--baseline <<RESULTS>> [--tolerance <<PERCENT>>]]
+"""
+
+SCENARIOS = ["single lookup", "batch lookup", "batch lookup (findMFTRecord)", "full enumeration"]
+
+
+def ioCounters():
+    """
+    bytes read and read/write syscalls of this process
+    :return: dictonary {'rchar', 'syscr', 'syscw'}; empty if /proc/self/io is missing
+    """
+
+    _counters = {}
+
+    try:
+        with open("/proc/self/io", "r") as io:
+            for line in io:
+                (name, sep, value) = line.partition(":")
+                _counters[name.strip()] = int(value)
+    except IOError:
+        pass
+
+    return _counters
+
+
+def singleLookup(_image, _records, _lookups):
+    """one record like one call of mft.py: find the MFT, search and parse the record"""
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, 0)
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+    recordoffset = mftlib.findMFTRecord(0, clustersize, _records // 2, datarunMFT)
+    mftlib.readMFTRecord(recordoffset)
+
+    return 1
+
+
+def batchLookup(_image, _records, _lookups):
+    """random records of one opened volume with get_record"""
+
+    volume = mftlib.open_volume(_image, 0)
+    lookup = random.Random(1)
+    found = 0
+
+    for i in range(_lookups):
+        try:
+            mftlib.get_record(volume, lookup.randint(mkimage.FIRSTFILE, _records - 1))
+            found += 1
+        except mftlib.RecordError:
+            pass
+
+    mftlib.close_volume(volume)
+
+    return found
+
+
+def batchFindRecord(_image, _records, _lookups):
+    """random records with findMFTRecord and readMFTRecord like the single record mode"""
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, 0)
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+    lookup = random.Random(1)
+    found = 0
+
+    for i in range(_lookups):
+        try:
+            mftlib.readMFTRecord(mftlib.findMFTRecord(0, clustersize, lookup.randint(mkimage.FIRSTFILE,
+                                                                                     _records - 1), datarunMFT))
+            found += 1
+        except mftlib.MFTError:
+            pass
+
+    return found
+
+
+def fullEnumeration(_image, _records, _lookups):
+    """all records of the MFT with iter_records"""
+
+    volume = mftlib.open_volume(_image, 0)
+    found = sum(1 for record in mftlib.iter_records(volume))
+    mftlib.close_volume(volume)
+
+    return found
+
+
+def runScenario(_function, _image, _records, _lookups, _results):
+    """
+    worker process of one scenario
+    :return: nothing; the measurement is put into _results
+    """
+
+    # readMFTRecord prints warnings of the USN area
+    sys.stdout = open(os.devnull, "w")
+
+    before = ioCounters()
+    start = time.time()
+    count = _function(_image, _records, _lookups)
+    seconds = time.time() - start
+    after = ioCounters()
+
+    _results.put({'records': count, 'seconds': seconds,
+                  'bytes': after['rchar'] - before['rchar'] if after else None,
+                  'syscalls': (after['syscr'] + after['syscw']) - (before['syscr'] + before['syscw'])
+                  if after else None,
+                  'rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss})
+
+
+def measure(_function, _image, _records, _lookups):
+    """
+    run one scenario in a new process
+    :return: dictonary {'records', 'seconds', 'bytes', 'syscalls', 'rss'}
+    """
+
+    results = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=runScenario, args=(_function, _image, _records, _lookups, results))
+    worker.start()
+    result = results.get()
+    worker.join()
+
+    return result
+
+
+def compareBaseline(_results, _baseline, _tolerance):
+    """
+    compare records/s with a saved run
+    :return: list of scenarios slower than the baseline by more than _tolerance percent
+    """
+
+    slower = []
+
+    for name in SCENARIOS:
+        if name not in _baseline or name not in _results:
+            continue
+        old = _baseline[name]['records'] / max(_baseline[name]['seconds'], 1e-9)
+        new = _results[name]['records'] / max(_results[name]['seconds'], 1e-9)
+        if new < old * (1 - _tolerance / 100.0):
+            slower.append("{}: {:.0f} records/s, baseline {:.0f} records/s".format(name, new, old))
+
+    return slower
+
+
+def main(argv):
+    '''
+    checking startoptions, build the image and run the scenarios
+    :return:
+    '''
+
+    parser = argparse.ArgumentParser(description='Benchmark mftlib on a synthetic image.')
+    parser.add_argument('-i', nargs=1, metavar='<<IMAGE>>', help='image; written by mkimage if missing')
+    parser.add_argument('-r', nargs=1, metavar='<<RECORDS>>', type=int, default=[100000], help='MFT records')
+    parser.add_argument('--runs', nargs=1, metavar='<<RUNS>>', type=int, default=[8], help='runs of the $MFT')
+    parser.add_argument('--lookups', nargs=1, metavar='<<LOOKUPS>>', type=int, default=[1000],
+                        help='records of the batch lookups')
+    parser.add_argument('-w', nargs=1, metavar='<<RESULTS>>', help='save the results as JSON')
+    parser.add_argument('--baseline', nargs=1, metavar='<<RESULTS>>', help='compare with saved results')
+    parser.add_argument('--tolerance', nargs=1, metavar='<<PERCENT>>', type=float, default=[10.0],
+                        help='allowed loss of records/s against the baseline')
+
+    args = parser.parse_args(argv[1:])
+
+    records = args.r[0]
+    image = args.i[0] if args.i else "bench-{}-{}.raw".format(records, args.runs[0])
+
+    if not os.path.exists(image):
+        mkimage.buildImage(image, records, args.runs[0])
+        print "Image {} written: {} records in {} runs".format(image, records, args.runs[0])
+
+    functions = {"single lookup": singleLookup, "batch lookup": batchLookup,
+                 "batch lookup (findMFTRecord)": batchFindRecord, "full enumeration": fullEnumeration}
+    results = {}
+
+    print "scenario|records|seconds|records/s|bytes read|syscalls|peak RSS KB"
+
+    for name in SCENARIOS:
+        result = measure(functions[name], image, records, args.lookups[0])
+        results[name] = result
+        print "{}|{}|{:.3f}|{:.0f}|{}|{}|{}".format(name, result['records'], result['seconds'],
+                                                    result['records'] / max(result['seconds'], 1e-9),
+                                                    result['bytes'], result['syscalls'], result['rss'])
+
+    if args.w:
+        with open(args.w[0], "w") as output:
+            json.dump(results, output, indent=1)
+
+    if args.baseline:
+        with open(args.baseline[0], "r") as baseline:
+            slower = compareBaseline(results, json.load(baseline), args.tolerance[0])
+        for line in slower:
+            print "Slower than baseline: " + line
+        if slower:
+            sys.exit(1)
+
+
+# get started
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,846 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import struct
+import random
+import argparse
+import binascii
+
+"""
+Writes deterministic NTFS-like raw images for the benchmarks and tests: a VBR as read by mftlib.VBR_DATA,
+a $MFT fragmented into a given number of runs and records with $STANDARD_INFORMATION, $FILE_NAME,
+resident, non resident and LZNT1 compressed $DATA, alternate data streams, $ATTRIBUTE_LIST with
+extension records, hard links, junctions and symbolic links. The system files $LogFile, $Bitmap, $Secure and
+$Extend\$UsnJrnl have content the parsers of mftlib can read.
+The same arguments always give the same image.
+
+usage: mkimage.py -w <<IMAGE>> [-r <<RECORDS>>] [--runs <<RUNS>>] [--seed <<SEED>>]
+"""
+
+BPS         = 512           # bytes per sector
+SPC         = 8             # sectors per cluster
+CLUSTER     = BPS * SPC
+RECORDSIZE  = 1024
+RESERVED    = 16            # clusters before the first MFT run
+WRITECHUNK  = 4194304       # bytes written at once
+
+SYSTEMFILES = {0: u"$MFT", 1: u"$MFTMirr", 2: u"$LogFile", 3: u"$Volume", 4: u"$AttrDef", 5: u".",
+               6: u"$Bitmap", 7: u"$Boot", 8: u"$BadClus", 9: u"$Secure", 10: u"$UpCase", 11: u"$Extend"}
+USNJRNL     = 12            # record of $Extend\$UsnJrnl; reserved on real volumes
+FIRSTFILE   = 16            # first record of the generated files
+DIRECTORY   = 1000          # every DIRECTORY-th record is a directory
+COMPRESSED  = 100           # every COMPRESSED-th non resident file is compressed (at record % COMPRESSED == 3)
+JUNCTION    = 500           # records % DIRECTORY of the junction and the symbolic link in every DIRECTORY records
+SYMLINK     = 600
+HARDLINK    = 100           # every HARDLINK-th file (at record % HARDLINK == 50) has a second name in another directory
+
+COMPUNIT    = 4             # compression unit of compressed streams: 2^4 clusters
+LZNT1CHUNK  = 4096          # uncompressed bytes of a LZNT1 chunk
+
+LOGPAGE     = 4096          # system and log page size of $LogFile
+LOGPAGES    = 8             # log record pages of $LogFile
+LOGSEQBITS  = 44            # bits of the sequence number in a LSN
+
+USNRECORDS  = 40            # records in $J
+USNSPARSE   = 64            # sparse clusters at the start of $J, as left by a journal that wrapped
+
+# security ids of $Secure; every record gets SECURITYID, links LINKSECURITYID
+SECURITYID      = 0x100
+LINKSECURITYID  = 0x101
+
+# data of non resident streams is cut from this block, so the content differs per record
+PATTERN = "".join(chr((i * 7 + i // 251) % 256) for i in range(65536 + CLUSTER * 4))
+
+
+def align8(_length):
+    """round up to the next multiple of 8"""
+    return (_length + 7) & ~7
+
+
+def filetime(_recordnr):
+    """deterministic timestamp of a record"""
+    return 130000000000000000 + _recordnr * 10000000 * 60
+
+
+def leBytes(_value, _signed):
+    """
+    shortest little endian representation of _value as used in runlists
+    :return: bytes
+    """
+
+    n = 1
+    while True:
+        _low = -(1 << (8 * n - 1)) if _signed else 0
+        _high = (1 << (8 * n - 1)) - 1 if _signed else (1 << (8 * n)) - 1
+        if _low <= _value <= _high:
+            break
+        n += 1
+
+    if _value < 0:
+        _value += 1 << (8 * n)
+
+    return "".join(chr((_value >> (8 * i)) & 0xff) for i in range(n))
+
+
+def encodeRunlist(_runs):
+    """
+    build a runlist
+    :param _runs: list of (lcn, length); lcn None for sparse runs
+    :return: runlist with end marker
+    """
+
+    _runlist = ""
+    _last = 0
+
+    for (_lcn, _length) in _runs:
+        _lengthbytes = leBytes(_length, False)
+        if _lcn is None:
+            _runlist += chr(len(_lengthbytes)) + _lengthbytes
+        else:
+            _offsetbytes = leBytes(_lcn - _last, True)
+            _runlist += chr((len(_offsetbytes) << 4) | len(_lengthbytes)) + _lengthbytes + _offsetbytes
+            _last = _lcn
+
+    return _runlist + "\0"
+
+
+def residentAttribute(_type, _content, _name=u"", _instance=0):
+    """
+    build a resident attribute
+    :return: attribute bytes, length multiple of 8
+    """
+
+    _namebytes = _name.encode("utf-16le")
+    _contentoffset = align8(24 + len(_namebytes))
+    _length = align8(_contentoffset + len(_content))
+
+    _attribute = struct.pack("<IIBBHHHIHBB", _type, _length, 0, len(_name), 24, 0, _instance,
+                             len(_content), _contentoffset, 0, 0) + _namebytes
+    _attribute += "\0" * (_contentoffset - len(_attribute)) + _content
+
+    return _attribute + "\0" * (_length - len(_attribute))
+
+
+def nonresidentAttribute(_type, _runs, _size, _name=u"", _instance=0, _startvcn=0, _compressed=False):
+    """
+    build a non resident attribute
+    :param _runs:       list of (lcn, length)
+    :param _size:       logical size in bytes
+    :param _compressed: LZNT1 compressed in units of 2^COMPUNIT clusters; the header gets the compressed size
+    :return: attribute bytes, length multiple of 8
+    """
+
+    _namebytes = _name.encode("utf-16le")
+    _headerlength = 72 if _compressed else 64
+    _runoffset = align8(_headerlength + len(_namebytes))
+    _runlist = encodeRunlist(_runs)
+    _clusters = sum(_length for (_lcn, _length) in _runs)
+    _length = align8(_runoffset + len(_runlist))
+
+    # compressed streams have sparse runs too, but only the compressed flag
+    if _compressed:
+        _flags = 0x0001
+    elif any(_lcn is None for (_lcn, _count) in _runs):
+        _flags = 0x8000
+    else:
+        _flags = 0
+
+    _attribute = struct.pack("<IIBBHHH", _type, _length, 1, len(_name), _headerlength, _flags, _instance)
+    _attribute += struct.pack("<QQHH4xQQQ", _startvcn, _startvcn + max(_clusters - 1, 0), _runoffset,
+                              COMPUNIT if _compressed else 0, _clusters * CLUSTER, _size, _size)
+    if _compressed:
+        _allocated = sum(_length for (_lcn, _length) in _runs if _lcn is not None)
+        _attribute += struct.pack("<Q", _allocated * CLUSTER)
+    _attribute += _namebytes
+    _attribute += "\0" * (_runoffset - len(_attribute)) + _runlist
+
+    return _attribute + "\0" * (_length - len(_attribute))
+
+
+def standardInformation(_recordnr, _securityid=SECURITYID):
+    """content of $STANDARD_INFORMATION"""
+
+    _time = filetime(_recordnr)
+
+    return struct.pack("<QQQQIIIIIIQQ", _time, _time + 1, _time + 2, _time + 3, 0x20, 0, 0, 0, 0, _securityid,
+                       0, 0)
+
+
+def fileName(_parent, _parentseq, _name, _recordnr, _size=0, _flags=0x20):
+    """content of $FILE_NAME; Win32 and DOS namespace"""
+
+    _time = filetime(_recordnr) + 5
+
+    return struct.pack("<QQQQQQQII", _parent | (_parentseq << 48), _time, _time, _time, _time,
+                       align8(_size), _size, _flags, 0) + struct.pack("<BB", len(_name), 3) + _name.encode("utf-16le")
+
+
+def attributeList(_entries):
+    """
+    content of $ATTRIBUTE_LIST
+    :param _entries: list of (type, record, sequence, instance, name)
+    """
+
+    _content = ""
+
+    for (_type, _recordnr, _sequence, _instance, _name) in _entries:
+        _namebytes = _name.encode("utf-16le")
+        _length = align8(26 + len(_namebytes))
+        _entry = struct.pack("<IHBBQQH", _type, _length, len(_name), 26 if _name else 0, 0,
+                             _recordnr | (_sequence << 48), _instance) + _namebytes
+        _content += _entry + "\0" * (_length - len(_entry))
+
+    return _content
+
+
+def buildRecord(_recordnr, _attributes, _flags=1, _sequence=1, _base=0):
+    """
+    build a record with header, attributes and update sequence
+    :param _attributes: list of attribute bytes
+    :param _base:       file reference of the base record for extension records
+    :return: record bytes of RECORDSIZE
+    """
+
+    _body = "".join(_attributes) + struct.pack("<I", 0xffffffff) + "\0" * 4
+    _used = 56 + len(_body)
+    if _used > RECORDSIZE:
+        raise ValueError("record {} too large ({} bytes)".format(_recordnr, _used))
+
+    _header = struct.pack("<4sHHQHHHHIIQHHI", "FILE", 48, 3, filetime(_recordnr), _sequence, 1, 56, _flags,
+                          _used, RECORDSIZE, _base, len(_attributes) + 1, 0, _recordnr)
+    _record = bytearray(_header + "\0" * (56 - len(_header)) + _body + "\0" * (RECORDSIZE - _used))
+
+    updateSequence(_record, 48, (_recordnr % 0xfffe) + 1)
+
+    return str(_record)
+
+
+def updateSequence(_buffer, _arrayoffset, _usn):
+    """
+    protect a record or page: the last two bytes of every sector are saved in the update sequence
+    array and replaced by the update sequence number
+    :param _buffer:      bytearray; changed in place
+    :param _arrayoffset: offset of the update sequence array
+    :param _usn:         update sequence number
+    """
+
+    struct.pack_into("<H", _buffer, _arrayoffset, _usn)
+    for i in range(len(_buffer) // BPS):
+        _end = (i + 1) * BPS - 2
+        _buffer[_arrayoffset + 2 + 2 * i:_arrayoffset + 4 + 2 * i] = _buffer[_end:_end + 2]
+        struct.pack_into("<H", _buffer, _end, _usn)
+
+
+def indexEntry(_fileref, _content):
+    """entry of a $I30 index: file reference and $FILE_NAME content"""
+
+    _length = align8(16 + len(_content))
+    _entry = struct.pack("<QHHI", _fileref, _length, len(_content), 0) + _content
+
+    return _entry + "\0" * (_length - len(_entry))
+
+
+def indexRoot(_entries, _type=0x30, _collation=1):
+    """
+    content of a resident $INDEX_ROOT without subnodes
+    :param _entries:   index entries in collation order
+    :param _type:      indexed attribute type; 0 for views like $SII
+    :param _collation: collation rule; 1 file names, 0x10 unsigned long
+    """
+
+    _body = "".join(_entries) + struct.pack("<QHHI", 0, 16, 0, 2)
+
+    return struct.pack("<IIIB3x", _type, _collation, 4096, 1) + \
+        struct.pack("<IIII", 16, 16 + len(_body), 16 + len(_body), 0) + _body
+
+
+class Allocator(object):
+    """hands out clusters behind the MFT and writes their data"""
+
+    def __init__(self, _image, _first):
+        self.image = _image
+        self.next = _first
+
+    def write(self, _data):
+        _lcn = self.next
+        self.next += (len(_data) + CLUSTER - 1) // CLUSTER
+        self.image.seek(_lcn * CLUSTER)
+        self.image.write(_data)
+        return _lcn
+
+
+def lznt1Compress(_data):
+    """
+    compress data with LZNT1; chunks which don't get shorter are stored uncompressed
+    :return: compressed data with end marker
+    """
+
+    _out = []
+
+    for _start in range(0, len(_data), LZNT1CHUNK):
+        _chunk = _data[_start:_start + LZNT1CHUNK]
+        _compressed = lznt1Chunk(_chunk)
+        if len(_compressed) < len(_chunk):
+            _out.append(struct.pack("<H", 0xb000 | (len(_compressed) - 1)) + _compressed)
+        else:
+            _out.append(struct.pack("<H", 0x3000 | (len(_chunk) - 1)) + _chunk)
+
+    return "".join(_out) + "\0\0"
+
+
+def lznt1Chunk(_chunk):
+    """
+    compress one chunk greedy with the longest back reference in reach
+    :param _chunk: up to LZNT1CHUNK bytes
+    :return: compressed chunk without header
+    """
+
+    _out = []
+    _pos = 0
+
+    while _pos < len(_chunk):
+
+        _flags = 0
+        _tokens = ""
+
+        for _bit in range(8):
+
+            if _pos >= len(_chunk):
+                break
+
+            # split of offset and length bits depends on the position in the chunk
+            _lengthbits = 12
+            _position = _pos - 1
+            while _position >= 0x10:
+                _position >>= 1
+                _lengthbits -= 1
+            _window = max(0, _pos - (1 << (16 - _lengthbits)))
+
+            # the match may overlap the position, so it repeats the last bytes
+            (_offset, _length) = (0, 0)
+            while _length < (1 << _lengthbits) + 2 and _pos + _length < len(_chunk):
+                _found = _chunk.rfind(_chunk[_pos:_pos + _length + 1], _window, _pos + _length)
+                if _found < 0:
+                    break
+                (_offset, _length) = (_pos - _found, _length + 1)
+
+            if _length >= 3:
+                _flags |= 1 << _bit
+                _tokens += struct.pack("<H", ((_offset - 1) << _lengthbits) | (_length - 3))
+                _pos += _length
+            else:
+                _tokens += _chunk[_pos]
+                _pos += 1
+
+        _out.append(chr(_flags) + _tokens)
+
+    return "".join(_out)
+
+
+def compressibleContent(_recordnr, _size):
+    """content of a compressed stream; the same line again and again"""
+
+    _line = "compressed stream of record %07d\r\n" % _recordnr
+
+    return (_line * (_size // len(_line) + 1))[:_size]
+
+
+def reparsePoint(_tag, _substitute, _print, _flags=None):
+    """
+    content of $REPARSE_POINT of a junction or, with _flags, a symbolic link
+    :param _tag:        reparse tag
+    :param _substitute: substitute name like \\??\\C:\\dir
+    :param _print:      print name like C:\\dir
+    :param _flags:      flags of a symbolic link; 1 relative
+    """
+
+    _substitute = _substitute.encode("utf-16le")
+    _print = _print.encode("utf-16le")
+
+    _data = struct.pack("<HHHH", 0, len(_substitute), len(_substitute), len(_print))
+    if _flags is not None:
+        _data += struct.pack("<I", _flags)
+    _data += _substitute + _print
+
+    return struct.pack("<IHH", _tag, len(_data), 0) + _data
+
+
+def sidBytes(_sid):
+    """binary SID of a string like 'S-1-5-18'"""
+
+    _parts = _sid.split("-")
+    _subauthorities = [int(_part) for _part in _parts[3:]]
+
+    return struct.pack("<BB", int(_parts[1]), len(_subauthorities)) + struct.pack(">Q", int(_parts[2]))[2:] + \
+        struct.pack("<{}I".format(len(_subauthorities)), *_subauthorities)
+
+
+def aceBytes(_type, _flags, _mask, _sid):
+    """access control entry; type 0 allowed, 1 denied"""
+
+    _body = struct.pack("<I", _mask) + sidBytes(_sid)
+
+    return struct.pack("<BBH", _type, _flags, 4 + len(_body)) + _body
+
+
+def securityDescriptor(_owner, _group, _aces):
+    """self relative security descriptor with owner, group and DACL"""
+
+    _acl = "".join(_aces)
+    _acl = struct.pack("<BBHHH", 2, 0, 8 + len(_acl), len(_aces), 0) + _acl
+    _owner = sidBytes(_owner)
+    _group = sidBytes(_group)
+
+    # self relative, DACL present
+    return struct.pack("<BBHIIII", 1, 0, 0x8004, 20, 20 + len(_owner), 0, 20 + len(_owner) + len(_group)) + \
+        _owner + _group + _acl
+
+
+def secureStreams():
+    """
+    descriptors of SECURITYID and LINKSECURITYID for $Secure
+    :return: (content of $SDS, list of $SII index entries)
+    """
+
+    _descriptors = [
+        (SECURITYID, securityDescriptor("S-1-5-32-544", "S-1-5-18",
+                                        [aceBytes(0, 3, 0x1f01ff, "S-1-5-18"), aceBytes(0, 3, 0x1f01ff, "S-1-5-32-544"),
+                                         aceBytes(0, 3, 0x1200a9, "S-1-5-32-545")])),
+        (LINKSECURITYID, securityDescriptor("S-1-5-21-1-2-3-1001", "S-1-5-21-1-2-3-513",
+                                            [aceBytes(0, 0, 0x1f01ff, "S-1-5-21-1-2-3-1001"),
+                                             aceBytes(1, 0, 0x10000, "S-1-1-0")]))]
+
+    _sds = ""
+    _entries = []
+
+    for (_securityid, _descriptor) in _descriptors:
+        # the CRC stands for the hash of NTFS; nothing checks it
+        _header = struct.pack("<IIQI", binascii.crc32(_descriptor) & 0xffffffff, _securityid, len(_sds),
+                              20 + len(_descriptor))
+        _entries.append(struct.pack("<HHIHHHHI", 20, 20, 0, 40, 4, 0, 0, _securityid) + _header)
+        _sds += _header + _descriptor
+        _sds += "\0" * (-len(_sds) % 16)
+
+    return _sds, _entries
+
+
+def logLsn(_offset):
+    """LSN of the log record at _offset of $LogFile; sequence number 1"""
+    return (1 << (64 - LOGSEQBITS)) | (_offset >> 3)
+
+
+def logRecord(_lsn, _prevlsn, _transaction, _datalength, _flags=0):
+    """
+    client record of $LogFile: UpdateResidentValue / UpdateNonresidentValue
+    :param _datalength: length of the client data; at least 32
+    :param _flags:      1 if the record goes on in the next page
+    :return: record, length multiple of 8
+    """
+
+    _header = struct.pack("<QQQIIIIH6x", _lsn, _prevlsn, _prevlsn, _datalength, 0, 1, _transaction, _flags)
+    _client = struct.pack("<HHHHHHHHHHHHQ", 7, 8, 0x28, 8, 0x30, 8, 0x18, 1, 0x98, 0x40, 0, 0, _transaction)
+    _record = _header + _client + "\xab" * (_datalength - len(_client))
+
+    return _record + "\0" * (-len(_record) % 8)
+
+
+def logFile():
+    """
+    content of $LogFile: two restart pages, two empty buffer pages and LOGPAGES log record pages
+    with three client records each; the last record of every third page is long and goes on in the next page
+    :return: (content, LSNs of the records in order)
+    """
+
+    _lsns = []
+    _pages = []
+    _carry = ""
+
+    for i in range(LOGPAGES):
+
+        _pageoffset = (4 + i) * LOGPAGE
+        _body = _carry
+        # the record carried over ends in this page
+        _lastend = _lsns[-1] if _carry else 0
+        _carry = ""
+
+        for j in range(3):
+            _lsn = logLsn(_pageoffset + 0x40 + len(_body))
+            _long = i % 3 == 2 and j == 2
+            _record = logRecord(_lsn, _lsns[-1] if _lsns else 0, i + 1, 4000 if _long else 40, 1 if _long else 0)
+            _lsns.append(_lsn)
+
+            _room = LOGPAGE - 0x40 - len(_body)
+            if len(_record) > _room:
+                _body += _record[:_room]
+                _carry = _record[_room:]
+                break
+            _body += _record
+            _lastend = _lsn
+
+        _page = struct.pack("<4sHHQIHHH6xQ", "RCRD", 0x28, LOGPAGE // BPS + 1, _lsns[-1], 1 if _carry else 0, 1, 1,
+                            min(0x40 + len(_body), LOGPAGE), _lastend)
+        _page = bytearray(_page + "\0" * (0x40 - len(_page)) + _body + "\0" * (LOGPAGE - 0x40 - len(_body)))
+        updateSequence(_page, 0x28, 3)
+        _pages.append(str(_page))
+
+    _size = (4 + LOGPAGES) * LOGPAGE
+    _restart = []
+
+    # the second restart page is one checkpoint older
+    for _lsn in (_lsns[-1], _lsns[-4]):
+        _page = struct.pack("<4sHHQIIHHH", "RSTR", 30, LOGPAGE // BPS + 1, 0, LOGPAGE, LOGPAGE, 0x30, 1, 1)
+        _page += "\0" * (0x30 - len(_page))
+        _page += struct.pack("<QHHHHIHHQIHHI", _lsn, 1, 0xffff, 0, 0, LOGSEQBITS, 0x40, 0x40, _size, 0, 0x30, 0x40, 7)
+        _page = bytearray(_page + "\0" * (LOGPAGE - len(_page)))
+        updateSequence(_page, 30, 3)
+        _restart.append(str(_page))
+
+    return "".join(_restart) + "\0" * (2 * LOGPAGE) + "".join(_pages), _lsns
+
+
+def usnJournal():
+    """
+    USNRECORDS change journal records of the first generated files; a record never crosses a page
+    :return: (content of $J behind USNSPARSE sparse clusters, list of (USN, record number))
+    """
+
+    _data = ""
+    _usns = []
+
+    for k in range(USNRECORDS):
+        _recordnr = FIRSTFILE + k
+        _name = (u"file%07d.dat" % _recordnr).encode("utf-16le")
+        _length = align8(60 + len(_name))
+
+        if len(_data) % 4096 + _length > 4096:
+            _data += "\0" * (-len(_data) % 4096)
+
+        # file create; data extend and close
+        _usn = USNSPARSE * CLUSTER + len(_data)
+        _reason = 0x100 if k % 2 == 0 else 0x80000002
+        _record = struct.pack("<IHHQQQQIIIIHH", _length, 2, 0, _recordnr | (1 << 48), 5 | (5 << 48), _usn,
+                              filetime(_recordnr), _reason, 0, SECURITYID, 0x20, len(_name), 60) + _name
+        _data += _record + "\0" * (_length - len(_record))
+        _usns.append((_usn, _recordnr))
+
+    return _data, _usns
+
+
+def buildSystemFiles(_allocator):
+    """
+    build $LogFile, $Secure, $Extend and $Extend\\$UsnJrnl with their data; $Bitmap is written
+    at last by buildImage
+    :return: ({record number: record}, {'lsns', 'usns'})
+    """
+
+    _records = {}
+
+    (_log, _lsns) = logFile()
+    _lcn = _allocator.write(_log)
+    _records[2] = buildRecord(2, [residentAttribute(0x10, standardInformation(2)),
+                                  residentAttribute(0x30, fileName(5, 5, SYSTEMFILES[2], 2, len(_log)), _instance=1),
+                                  nonresidentAttribute(0x80, [(_lcn, len(_log) // CLUSTER)], len(_log), _instance=2)],
+                              _sequence=2)
+
+    (_sds, _entries) = secureStreams()
+    _lcn = _allocator.write(_sds)
+    _records[9] = buildRecord(9, [residentAttribute(0x10, standardInformation(9)),
+                                  residentAttribute(0x30, fileName(5, 5, SYSTEMFILES[9], 9), _instance=1),
+                                  nonresidentAttribute(0x80, [(_lcn, (len(_sds) + CLUSTER - 1) // CLUSTER)], len(_sds),
+                                                       u"$SDS", 2),
+                                  residentAttribute(0x90, indexRoot(_entries, 0, 0x10), u"$SII", 3)],
+                              _sequence=9)
+
+    _entry = indexEntry(USNJRNL | (1 << 48), fileName(11, 11, u"$UsnJrnl", USNJRNL))
+    _records[11] = buildRecord(11, [residentAttribute(0x10, standardInformation(11)),
+                                    residentAttribute(0x30, fileName(5, 5, SYSTEMFILES[11], 11), _instance=1),
+                                    residentAttribute(0x90, indexRoot([_entry]), u"$I30", 2)],
+                               _flags=3, _sequence=11)
+
+    (_journal, _usns) = usnJournal()
+    _lcn = _allocator.write(_journal)
+    _runs = [(None, USNSPARSE), (_lcn, (len(_journal) + CLUSTER - 1) // CLUSTER)]
+    _records[USNJRNL] = buildRecord(USNJRNL, [residentAttribute(0x10, standardInformation(USNJRNL)),
+                                              residentAttribute(0x30, fileName(11, 11, u"$UsnJrnl", USNJRNL),
+                                                                _instance=1),
+                                              residentAttribute(0x80, struct.pack("<QQ", 32 << 20, 8 << 20), u"$Max",
+                                                                2),
+                                              nonresidentAttribute(0x80, _runs, USNSPARSE * CLUSTER + len(_journal),
+                                                                   u"$J", 3)])
+
+    return _records, {'lsns': _lsns, 'usns': _usns}
+
+
+def buildBitmap(_clusters, _used):
+    """
+    content of $Bitmap
+    :param _clusters: clusters of the volume
+    :param _used:     list of (first cluster, count) in use
+    """
+
+    _bitmap = bytearray((_clusters + 7) // 8)
+
+    for (_first, _count) in _used:
+        for _lcn in xrange(_first, _first + _count):
+            _bitmap[_lcn >> 3] |= 1 << (_lcn & 7)
+
+    return str(_bitmap)
+
+
+def recordPosition(_mftruns, _recordnr):
+    """byte offset of a record in the image"""
+
+    _pos = _recordnr * RECORDSIZE
+
+    for (_lcn, _length) in _mftruns:
+        if _pos < _length * CLUSTER:
+            return _lcn * CLUSTER + _pos
+        _pos -= _length * CLUSTER
+
+    raise ValueError("record {} behind the MFT".format(_recordnr))
+
+
+def buildFile(_recordnr, _random, _allocator, _directories):
+    """
+    build the records of one generated file or directory; a file with $ATTRIBUTE_LIST
+    also gets the extension record _recordnr + 1
+    :param _directories: list of (record, sequence, path) of the directories so far
+    :return: dictonary {record number: record}
+    """
+
+    _sequence = _random.randint(1, 5)
+    (_parent, _parentseq, _parentpath) = _random.choice(_directories)
+    _si = residentAttribute(0x10, standardInformation(_recordnr), _instance=0)
+
+    if _recordnr % DIRECTORY == 0:
+        _name = u"dir%07d" % _recordnr
+        _directories.append((_recordnr, _sequence, _parentpath + u"\\" + _name))
+        return {_recordnr: buildRecord(_recordnr, [_si,
+                                                   residentAttribute(0x30, fileName(_parent, _parentseq, _name,
+                                                                                    _recordnr, 0, 0x10000000), _instance=1),
+                                                   residentAttribute(0x90, indexRoot([]), u"$I30", 2)],
+                                       _flags=3, _sequence=_sequence)}
+
+    _name = u"file%07d.dat" % _recordnr
+    _kind = _random.random()
+
+    # some records are deleted files
+    _flags = 0 if _random.random() < 0.05 else 1
+
+    # junction and absolute symbolic link to the newest directory
+    if _recordnr % DIRECTORY in (JUNCTION, SYMLINK):
+        _target = u"\\??\\C:" + (_directories[-1][2] or u"\\")
+        _si = residentAttribute(0x10, standardInformation(_recordnr, LINKSECURITYID), _instance=0)
+        if _recordnr % DIRECTORY == JUNCTION:
+            _name = u"junction%07d" % _recordnr
+            _attributes = [_si, residentAttribute(0x30, fileName(_parent, _parentseq, _name, _recordnr, 0, 0x10000400),
+                                                  _instance=1),
+                           residentAttribute(0x90, indexRoot([]), u"$I30", 2),
+                           residentAttribute(0xc0, reparsePoint(0xa0000003, _target, _target[4:]), _instance=3)]
+            return {_recordnr: buildRecord(_recordnr, _attributes, _flags=3, _sequence=_sequence)}
+        _name = u"link%07d" % _recordnr
+        _attributes = [_si, residentAttribute(0x30, fileName(_parent, _parentseq, _name, _recordnr, 0, 0x400),
+                                              _instance=1),
+                       residentAttribute(0xc0, reparsePoint(0xa000000c, _target, _target[4:], 0), _instance=2)]
+        return {_recordnr: buildRecord(_recordnr, _attributes, _sequence=_sequence)}
+
+    # base record with $ATTRIBUTE_LIST; the $DATA is in the extension record _recordnr + 1
+    if _recordnr % 10 == 8:
+        _size = _random.randint(1, 3 * CLUSTER)
+        _lcn = _allocator.write(PATTERN[_recordnr % 65536:_recordnr % 65536 + _size])
+        _clusters = (_size + CLUSTER - 1) // CLUSTER
+        _entries = [(0x10, _recordnr, _sequence, 0, u""), (0x30, _recordnr, _sequence, 2, u""),
+                    (0x80, _recordnr + 1, 1, 0, u"")]
+        _base = buildRecord(_recordnr, [_si, residentAttribute(0x20, attributeList(_entries), _instance=1),
+                                        residentAttribute(0x30, fileName(_parent, _parentseq, _name, _recordnr,
+                                                                         _size), _instance=2)],
+                            _flags=_flags, _sequence=_sequence)
+        _extension = buildRecord(_recordnr + 1, [nonresidentAttribute(0x80, [(_lcn, _clusters)], _size)],
+                                 _flags=_flags, _base=_recordnr | (_sequence << 48))
+        return {_recordnr: _base, _recordnr + 1: _extension}
+
+    if _kind < 0.5:
+        _content = PATTERN[_recordnr % 65536:_recordnr % 65536 + _random.randint(0, 400)]
+        _data = [residentAttribute(0x80, _content, _instance=2)]
+        _size = len(_content)
+    elif _kind < 0.8:
+        _size = _random.randint(401, 4 * CLUSTER)
+        if _recordnr % COMPRESSED == 3:
+            # one compression unit; the clusters not needed by the compressed data are sparse
+            _compressed = lznt1Compress(compressibleContent(_recordnr, _size))
+            _clusters = (len(_compressed) + CLUSTER - 1) // CLUSTER
+            _lcn = _allocator.write(_compressed)
+            _data = [nonresidentAttribute(0x80, [(_lcn, _clusters), (None, (1 << COMPUNIT) - _clusters)], _size,
+                                          _instance=2, _compressed=True)]
+        else:
+            _lcn = _allocator.write(PATTERN[_recordnr % 65536:_recordnr % 65536 + _size])
+            _data = [nonresidentAttribute(0x80, [(_lcn, (_size + CLUSTER - 1) // CLUSTER)], _size, _instance=2)]
+    else:
+        _content = PATTERN[_recordnr % 65536:_recordnr % 65536 + _random.randint(0, 200)]
+        _ads = "[ZoneTransfer]\r\nZoneId=3\r\n"
+        _data = [residentAttribute(0x80, _content, _instance=2),
+                 residentAttribute(0x80, _ads, u"Zone.Identifier", 3)]
+        _size = len(_content)
+
+    _fn = [residentAttribute(0x30, fileName(_parent, _parentseq, _name, _recordnr, _size), _instance=1)]
+
+    # hard link in the root or the newest directory; every second one under another name
+    (_linkparent, _linkseq, _linkpath) = _directories[-1] if _parent != _directories[-1][0] else _directories[0]
+    if _recordnr % HARDLINK == 50 and _linkparent != _parent:
+        _linkname = _name if _recordnr // HARDLINK % 2 else u"hardlink%07d.dat" % _recordnr
+        _fn.append(residentAttribute(0x30, fileName(_linkparent, _linkseq, _linkname, _recordnr, _size), _instance=4))
+
+    return {_recordnr: buildRecord(_recordnr, [_si] + _fn + _data, _flags=_flags, _sequence=_sequence)}
+
+
+def buildImage(_path, _records=100000, _runs=8, _seed=1):
+    """
+    write a deterministic image
+    :param _path:    image file
+    :param _records: number of MFT records
+    :param _runs:    number of runs of the $MFT; free clusters are left between the runs
+    :param _seed:    seed of the random choices
+    :return: dictonary {'records', 'runs', 'mftruns', 'clusters', 'size', 'used', 'lsns', 'usns'}; 'used' are
+             the (first cluster, count) in use, 'lsns' the LSNs of $LogFile, 'usns' the (USN, record) of $J
+    """
+
+    _random = random.Random(_seed)
+    _mftclusters = (_records * RECORDSIZE + CLUSTER - 1) // CLUSTER
+    _runs = max(1, min(_runs, _mftclusters))
+
+    # the MFT runs with one free cluster between them
+    _mftruns = []
+    _lcn = RESERVED
+    for i in range(_runs):
+        _length = _mftclusters // _runs + (1 if i < _mftclusters % _runs else 0)
+        _mftruns.append((_lcn, _length))
+        _lcn += _length + 1
+
+    # start of every run in bytes of the MFT
+    _runstarts = []
+    _pos = 0
+    for (_runlcn, _length) in _mftruns:
+        _runstarts.append(_pos)
+        _pos += _length * CLUSTER
+
+    _image = open(_path, "wb")
+    _allocator = Allocator(_image, _lcn)
+    _directories = [(5, 5, u"")]
+    (_system, _info) = buildSystemFiles(_allocator)
+
+    _recordnr = 0
+    _pending = {}
+    _mft = []
+    _written = [0]
+
+    def _flush():
+        # write the collected records to their place in the MFT runs
+        _data = "".join(_mft)
+        del _mft[:]
+        for ((_runlcn, _length), _runstart) in zip(_mftruns, _runstarts):
+            _begin = max(_written[0], _runstart)
+            _end = min(_written[0] + len(_data), _runstart + _length * CLUSTER)
+            if _begin < _end:
+                _image.seek(_runlcn * CLUSTER + _begin - _runstart)
+                _image.write(_data[_begin - _written[0]:_end - _written[0]])
+        _written[0] += len(_data)
+
+    while _recordnr < _records:
+
+        if _recordnr in _pending:
+            _record = _pending.pop(_recordnr)
+        elif _recordnr in _system:
+            _record = _system[_recordnr]
+        elif _recordnr == 0:
+            _record = buildRecord(0, [residentAttribute(0x10, standardInformation(0)),
+                                      residentAttribute(0x30, fileName(5, 5, u"$MFT", 0, _records * RECORDSIZE),
+                                                        _instance=1),
+                                      nonresidentAttribute(0x80, _mftruns, _records * RECORDSIZE, _instance=2)])
+        elif _recordnr < FIRSTFILE:
+            _name = SYSTEMFILES.get(_recordnr)
+            _attributes = [residentAttribute(0x10, standardInformation(_recordnr))]
+            if _name is not None:
+                _attributes.append(residentAttribute(0x30, fileName(5, 5, _name, _recordnr), _instance=1))
+                _attributes.append(residentAttribute(0x80, "", _instance=2))
+            _record = buildRecord(_recordnr, _attributes, _flags=3 if _recordnr in (5, 11) else 1,
+                                  _sequence=_recordnr if _recordnr < 12 else 1)
+        elif _recordnr % 10 == 8 and _recordnr + 1 >= _records:
+            # no room for the extension record
+            _record = "\0" * RECORDSIZE
+        else:
+            _built = buildFile(_recordnr, _random, _allocator, _directories)
+            _record = _built.pop(_recordnr)
+            _pending.update(_built)
+
+        _mft.append(_record)
+        _recordnr += 1
+
+        if len(_mft) * RECORDSIZE >= WRITECHUNK:
+            _flush()
+
+    _flush()
+
+    # $Bitmap behind all other data; its size depends on the size of the volume
+    _bitmapclusters = 1
+    while (_allocator.next + _bitmapclusters + 16 + 8 * CLUSTER - 1) // (8 * CLUSTER) > _bitmapclusters:
+        _bitmapclusters += 1
+    _clusters = _allocator.next + _bitmapclusters + 16
+
+    # the clusters between the MFT runs and the last 16 clusters are free
+    _used = [(0, RESERVED)] + _mftruns + [(_lcn, _allocator.next + _bitmapclusters - _lcn)]
+    _bitmap = buildBitmap(_clusters, _used)
+    _record = buildRecord(6, [residentAttribute(0x10, standardInformation(6)),
+                              residentAttribute(0x30, fileName(5, 5, SYSTEMFILES[6], 6, len(_bitmap)), _instance=1),
+                              nonresidentAttribute(0x80, [(_allocator.write(_bitmap), _bitmapclusters)], len(_bitmap),
+                                                   _instance=2)],
+                          _sequence=6)
+    _image.seek(recordPosition(_mftruns, 6))
+    _image.write(_record)
+
+    # VBR as read by mftlib.VBR_DATA
+    _vbr = bytearray(BPS)
+    _vbr[0:3] = "\xeb\x52\x90"
+    _vbr[3:11] = "NTFS    "
+    struct.pack_into("<HB", _vbr, 11, BPS, SPC)
+    struct.pack_into("<QQQ", _vbr, 40, _clusters * SPC - 1, _mftruns[0][0], 2)
+    _vbr[64] = 0xf6             # 2^10 bytes per record
+    _vbr[68] = 0x01             # clusters per index record
+    _vbr[510:512] = "\x55\xaa"
+    _image.seek(0)
+    _image.write(str(_vbr))
+
+    _image.truncate(_clusters * CLUSTER)
+    _image.close()
+
+    return {'records': _records, 'runs': _runs, 'mftruns': _mftruns, 'clusters': _clusters,
+            'size': _clusters * CLUSTER, 'used': _used, 'lsns': _info['lsns'], 'usns': _info['usns']}
+
+
+def main(argv):
+    '''
+    checking startoptions and write the image
+    :return:
+    '''
+
+    parser = argparse.ArgumentParser(description='Write a deterministic NTFS-like image.')
+    parser.add_argument('-w', nargs=1, metavar='<<IMAGE>>', required=True, help='image file to write')
+    parser.add_argument('-r', nargs=1, metavar='<<RECORDS>>', type=int, default=[100000], help='MFT records')
+    parser.add_argument('--runs', nargs=1, metavar='<<RUNS>>', type=int, default=[8], help='runs of the $MFT')
+    parser.add_argument('--seed', nargs=1, metavar='<<SEED>>', type=int, default=[1], help='random seed')
+
+    args = parser.parse_args(argv[1:])
+
+    if args.r[0] < FIRSTFILE:
+        print "At least {} records required".format(FIRSTFILE)
+        sys.exit(1)
+
+    image = buildImage(args.w[0], args.r[0], args.runs[0], args.seed[0])
+
+    print "{}: {} records in {} runs, {} bytes".format(args.w[0], image['records'], image['runs'], image['size'])
+
+
+# get started
+if __name__ == '__main__':
+    main(sys.argv)
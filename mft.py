@@ -2,8 +2,18 @@
 # -*- coding: utf-8 -*-
 
 import mftlib
+import os
+import stat
 import sys
+import struct
 import argparse
+import time
+import json
+import urlparse
+import SocketServer
+import BaseHTTPServer
+import tempfile
+import multiprocessing
 
 """
 Author			:	Ingo Braun
@@ -16,6 +26,9 @@ Devices and partitions only works, using linux.
 
 version = "0.9"
 
+# options naming a file of one partition; every partition of --all-partitions gets its own one
+PERPARTITION = ['-w', '--checkpoint', '--lsn-cursor', '--snapshot-save', '--snapshot-diff', '--trace', '--cluster-map']
+
 
 
 def printVersion():
@@ -52,23 +65,823 @@ def start_parsing( _offset ,_image, _record):
 	searchedRec, OUTPUT = mftlib.readMFTRecord(recordoffset)
 
 	# print OUTPUT
-	for key in OUTPUT:
+	with mftlib.timer("output"):
+		for key in OUTPUT:
+
+			print OUTPUT[key]
+
+	# security descriptor in $Secure
+	securityid = [attribute['securityId'] for attribute in searchedRec if 'securityId' in attribute]
+	if securityid:
+		try:
+			security = mftlib.openSecurity(_offset, clustersize, datarunMFT)
+			descriptor = mftlib.securityDescriptor(_offset, clustersize, security, securityid[0])
+			print "\t\t\t\tSecurity descriptor {} in $Secure:".format(securityid[0])
+			print mftlib.formatSecurity(descriptor)
+		except mftlib.MFTError as err:
+			print "\t\t\t\tSecurity descriptor {} not resolved: {}\n".format(securityid[0], err)
+
+	# attributes in extension records of the $ATTRIBUTE_LIST
+	record = mftlib.readRecord(recordoffset)
+	if struct.unpack_from("<Q", record, 32)[0] == 0:
+		for extrecord in mftlib.extensionNumbers(_record, mftlib.readAttributeList(_offset, clustersize, record)):
+
+			extoffset = mftlib.findMFTRecord(_offset, clustersize, extrecord, datarunMFT)
+			extensionRec, OUTPUT = mftlib.readMFTRecord(extoffset)
 
-		print OUTPUT[key]
+			with mftlib.timer("output"):
+				print "Extension record {}:".format(extrecord)
+				for key in OUTPUT:
+
+					print OUTPUT[key]
 
 
 	sys.exit(0)
 
 
+def start_timeline(_offset, _image, _sortmemory):
+    '''
+    prints the MACB timeline of all records, sorted by time
+    :param _sortmemory: memory budget of the sort in MB; None for the default of mftlib
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    for line in mftlib.buildTimeline(_offset, clustersize, datarunMFT, _sortmemory * 1048576 if _sortmemory else None):
+
+        with mftlib.timer("output"):
+            print line
+
+    sys.exit(0)
+
+
+def start_extract(_offset, _image, _record, _streamname, _output, _range=None):
+    '''
+    writes the content of a $DATA stream to _output or stdout
+    :param _streamname: name of the stream; empty for the unnamed stream
+    :param _output: output file or None for stdout
+    :param _range: (offset, length) to write only a part of the stream or None
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    # the stream may continue in the extension records of the $ATTRIBUTE_LIST
+    stream = mftlib.readRecordStream(_offset, clustersize, datarunMFT, _record, _streamname)
+
+    if _output:
+        outfd = os.open(_output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+    else:
+        outfd = sys.stdout.fileno()
+
+    try:
+        if _range is None:
+            mftlib.extractStream(_offset, clustersize, stream, outfd)
+        else:
+            # only the needed clusters/compression units are read
+            cache = mftlib.newUnitCache()
+            (position, length) = _range
+            while length > 0:
+                data = mftlib.readStreamRange(_offset, clustersize, stream, position,
+                                              min(length, mftlib.EXTRACTCHUNK), cache)
+                if not data:
+                    break
+                mftlib.writeAll(outfd, data)
+                position += len(data)
+                length -= len(data)
+    finally:
+        if _output:
+            os.close(outfd)
+
+    sys.exit(0)
+
+
+def start_hash(_offset, _image, _threads, _output, _checkpoint=None, _resume=False):
+    '''
+    writes the hash manifest of all allocated files
+    :param _threads: number of hashing threads
+    :param _output: output file or None for stdout
+    :param _checkpoint: checkpoint file written every mftlib.CHECKPOINTSECONDS; None for no checkpoints
+    :param _resume: continue the scan saved in _checkpoint
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    state = loadCheckpoint(_checkpoint, _resume, "hash", _image, _offset, _output)
+
+    if _checkpoint:
+        outfile = mftlib.resumeOutput(_output, state)
+    else:
+        outfile = open(_output, "w") if _output else sys.stdout
+
+    if state is None:
+        outfile.write("record|filename|size|" + "|".join(mftlib.HASHES) + "\n")
+        state = {"scan": "hash", "image": _image, "offset": _offset, "position": 0, "done": []}
+
+    done = set(state['done'])
+    lastcheckpoint = time.time()
+
+    for (recordnr, line, resume) in mftlib.hashManifest(_offset, clustersize, datarunMFT, _threads,
+                                                        state['position'], done):
+
+        if isinstance(line, mftlib.RecordError):
+            sys.stderr.write("Record {} skipped: {}\n".format(recordnr, line))
+        else:
+            outfile.write(line + "\n")
+
+        done.add(recordnr)
+
+        if _checkpoint and time.time() - lastcheckpoint >= mftlib.CHECKPOINTSECONDS:
+            done = set(nr for nr in done if nr >= resume)
+            state['position'] = resume
+            state['done'] = sorted(done)
+            mftlib.writeCheckpoint(_checkpoint, state, outfile)
+            lastcheckpoint = time.time()
+
+    outfile.close()
+
+    if _checkpoint:
+        os.remove(_checkpoint)
+
+    sys.exit(0)
+
+
+def loadCheckpoint(_checkpoint, _resume, _scan, _image, _offset, _output):
+    '''
+    checks the options of a checkpointed scan and reads the checkpoint to resume
+    :return: state of the checkpoint or None to start a new scan
+    '''
+
+    if _resume and not _checkpoint:
+        print "--resume needs --checkpoint"
+        usage()
+
+    if _checkpoint and not _output:
+        print "Output file (-w) required with --checkpoint"
+        usage()
+
+    if not _resume:
+        return None
+
+    state = mftlib.readCheckpoint(_checkpoint, _scan)
+
+    if state is not None and (state['image'] != _image or state['offset'] != _offset):
+        err_note = "Checkpoint '{}' belongs to image {} at offset {}.".format(_checkpoint, state['image'],
+                                                                           state['offset'])
+        sys.exit(err_note)
+
+    return state
+
+
+def start_streams(_offset, _image, _record):
+    '''
+    lists the $DATA streams of one record or the alternate data streams of all records
+    :param _record: record number or None for all records
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    if _record is None:
+        streams = mftlib.iterADS(_offset, clustersize, datarunMFT)
+    else:
+        recordoffset = mftlib.findMFTRecord(_offset, clustersize, _record, datarunMFT)
+        record = mftlib.readRecord(recordoffset)
+        filename = mftlib.recordFilename(record)
+        extensions = mftlib.loadExtensions(_offset, clustersize, datarunMFT, _record, record)
+        streams = [(_record, filename, stream) for stream in mftlib.listStreams(record, extensions)]
+
+    for (recordnr, filename, stream) in streams:
+
+        with mftlib.timer("output"):
+            location = "Resident" if stream['resident'] else "Non Resident"
+            print "{}|{}|{}|{}|{}".format(recordnr, filename, stream['name'].encode("utf-8"), location, stream['size'])
+
+    sys.exit(0)
+
+
+def start_carve(_offset, _image, _unallocated, _output=None, _checkpoint=None, _resume=False):
+    '''
+    carves FILE and INDX records from the whole image or the unallocated clusters of the partition
+    :param _unallocated: search only the unallocated clusters of the partition at _offset
+    :param _output: output file or None for stdout
+    :param _checkpoint: checkpoint file written every mftlib.CHECKPOINTSECONDS; None for no checkpoints
+    :param _resume: continue the scan saved in _checkpoint
+    :return: nothing
+    '''
+
+    state = loadCheckpoint(_checkpoint, _resume, "carve", _image, _offset, _output)
+
+    if state is not None and state['unallocated'] != _unallocated:
+        err_note = "Checkpoint '{}' belongs to a scan {} --unallocated.".format(
+            _checkpoint, "with" if state['unallocated'] else "without")
+        sys.exit(err_note)
+
+    if _unallocated:
+        (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+        clustersize = vbrdata["bps"] * vbrdata["spc"]
+        bitmap = mftlib.readBitmap(_offset, clustersize, datarunMFT)
+        ranges = [(_offset + lcn * clustersize, count * clustersize)
+                  for (lcn, count) in mftlib.iterUnallocated(bitmap, mftlib.volumeClusters(vbrdata))]
+    else:
+        mftlib.openFile(_image)
+        ranges = [(0, mftlib.imageSize())]
+
+    if _checkpoint:
+        outfile = mftlib.resumeOutput(_output, state)
+    else:
+        outfile = open(_output, "w") if _output else sys.stdout
+
+    if state is None:
+        state = {"scan": "carve", "image": _image, "offset": _offset, "unallocated": _unallocated, "position": 0}
+
+    lastcheckpoint = time.time()
+
+    for (offset, signature, record) in mftlib.carveRecords(ranges, _startoffset=state['position']):
+
+        # end of a searched window
+        if signature is None:
+            if _checkpoint and time.time() - lastcheckpoint >= mftlib.CHECKPOINTSECONDS:
+                state['position'] = offset
+                mftlib.writeCheckpoint(_checkpoint, state, outfile)
+                lastcheckpoint = time.time()
+            continue
+
+        if signature == "INDX":
+            outfile.write("INDX record at offset {:}\tVCN: {:}\n\n".format(offset,
+                                                                          struct.unpack_from("<Q", record, 16)[0]))
+            continue
+
+        try:
+            searchedRec, OUTPUT = mftlib.readMFTRecord(offset)
+        except Exception as err:
+            sys.stderr.write("FILE record at offset {:} skipped: {}\n".format(offset, err))
+            outfile.write("FILE record at offset {:} not parseable: {}\n\n".format(offset, err))
+            continue
+
+        for key in OUTPUT:
+            outfile.write(OUTPUT[key] + "\n")
+
+    outfile.close()
+
+    if _checkpoint:
+        os.remove(_checkpoint)
+
+    sys.exit(0)
+
+
+def start_indxslack(_offset, _image):
+    '''
+    prints the $FILE_NAME entries recovered from the slack of all index records
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    print "directory|dirname|indexrecord|record|sequence|filename|size|created|modified|mftmodified|accessed"
+
+    for (dirrecord, dirname, number, fileref, fndata) in mftlib.iterIndexSlack(_offset, clustersize, datarunMFT):
+
+        with mftlib.timer("output"):
+            print "{}|{}|{}|{}|{}|{}|{}|{}|{}|{}|{}".format(
+                dirrecord, dirname, number, fileref & 0xffffffffffff, fileref >> 48, fndata['name'].encode("utf-8"),
+                fndata['realSize'], mftlib.mfttime(fndata['creation']), mftlib.mfttime(fndata['modified']),
+                mftlib.mfttime(fndata['mftmodified']), mftlib.mfttime(fndata['lastaccess']))
+
+    sys.exit(0)
+
+
+def start_usn(_offset, _image):
+    '''
+    prints the records of the change journal $UsnJrnl:$J
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    stream = mftlib.findUsnJournal(_offset, clustersize, datarunMFT)
+
+    print "usn|timestamp|record|sequence|parent|parentsequence|filename|reason"
+
+    for usnrecord in mftlib.iterUsnRecords(_offset, clustersize, stream):
+
+        with mftlib.timer("output"):
+            print "{}|{}|{}|{}|{}|{}|{}|{}".format(
+                usnrecord['usn'], mftlib.mfttime(usnrecord['timestamp']),
+                usnrecord['fileRef'] & 0xffffffffffff, usnrecord['fileRef'] >> 48,
+                usnrecord['parentRef'] & 0xffffffffffff, usnrecord['parentRef'] >> 48,
+                usnrecord['name'].encode("utf-8"), mftlib.usnReasons(usnrecord['reason']))
+
+    sys.exit(0)
+
+
+def start_logfile(_offset, _image, _cursorfile):
+    '''
+    prints the restart pages and log records of $LogFile
+    :param _cursorfile: LSN cursor file; only records newer than its LSN are printed and it is updated
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    # record 2 is $LogFile
+    stream = mftlib.readRecordStream(_offset, clustersize, datarunMFT, 2)
+
+    lastlsn = mftlib.readLsnCursor(_cursorfile) if _cursorfile else 0
+
+    # a $LogFile without valid restart page ends here, before any output
+    restartpages = mftlib.readLogRestart(_offset, clustersize, stream)
+    mftlib.currentRestart(restartpages)
+
+    for restart in restartpages:
+
+        print "Restart page at offset {:}\tCurrent LSN: {:}\tLog page size: {:}\tVersion: {:}.{:}".format(
+            restart['offset'], restart['currentLsn'], restart['logPageSize'], restart['majorVer'], restart['minorVer'])
+
+    print "lsn|previouslsn|undonextlsn|transaction|redo|undo|targetvcn|pageoffset"
+
+    for logrecord in mftlib.iterLogRecords(_offset, clustersize, stream, lastlsn, restartpages):
+
+        with mftlib.timer("output"):
+            print "{}|{}|{}|{}|{}|{}|{}|{}".format(
+                logrecord['lsn'], logrecord['prevLsn'], logrecord['undoNextLsn'], logrecord['transId'],
+                mftlib.LOG_OPERATION.get(logrecord.get('redoOp'), ""), mftlib.LOG_OPERATION.get(logrecord.get('undoOp'), ""),
+                logrecord.get('targetVcn', ""), logrecord['offset'])
+
+        lastlsn = max(lastlsn, logrecord['lsn'])
+
+    if _cursorfile:
+        mftlib.writeLsnCursor(_cursorfile, lastlsn)
+
+    sys.exit(0)
+
+
+def start_snapshot(_offset, _image, _oldsnapshot, _newsnapshot):
+    '''
+    prints the records changed since the snapshot _oldsnapshot and/or saves the snapshot _newsnapshot
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+
+    if _oldsnapshot:
+        # check the snapshot before any output
+        mftlib.openSnapshot(_oldsnapshot)[0].close()
+        print "change|record|sequence|filename"
+
+    for (change, recordnr, sequence, filename) in mftlib.snapshotScan(_offset, clustersize, datarunMFT,
+                                                                      _oldsnapshot, _newsnapshot):
+
+        with mftlib.timer("output"):
+            print "{}|{}|{}|{}".format(change, recordnr, sequence, filename)
+
+    sys.exit(0)
+
+
+def start_owner(_offset, _image, _values, _clusters, _mapfile):
+    '''
+    prints the records and streams owning byte offsets or clusters, e.g. hits of a keyword search
+    :param _values: byte offsets in the image or cluster numbers; "-" reads them from stdin, one per line
+    :param _clusters: _values are cluster numbers of the partition
+    :param _mapfile: cluster map file; read if it exists, else written after the scan; None to scan only
+    :return: nothing
+    '''
+
+    if _mapfile and os.path.exists(_mapfile):
+        clustermap = mftlib.loadClusterMap(_mapfile)
+    else:
+        (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+        clustersize = vbrdata["bps"] * vbrdata["spc"]
+        clustermap = mftlib.buildClusterMap(_offset, clustersize, datarunMFT)
+        if _mapfile:
+            mftlib.saveClusterMap(clustermap, _mapfile)
+
+    if not _values:
+        print "Cluster map: {} runs of {} records in {} layers".format(
+            clustermap['count'], len(set(run[3] for run in mftlib.iterClusterMap(clustermap))),
+            len(clustermap['layers']) - 1)
+        sys.exit(0)
+
+    if _values == ["-"]:
+        _values = [line.strip() for line in sys.stdin if line.strip()]
+
+    print "offset|cluster|record|stream|inuse|fileoffset"
+
+    for value in _values:
+        try:
+            value = int(value, 0)
+        except ValueError:
+            print "Offset or cluster as number required: {}".format(value)
+            sys.exit(1)
+
+        if _clusters:
+            value = clustermap['offset'] + value * clustermap['clustersize']
+        (lcn, owners) = mftlib.offsetOwners(clustermap, value)
+
+        with mftlib.timer("output"):
+            if not owners:
+                print "{}|{}||||".format(value, lcn)
+            for owner in owners:
+                print "{}|{}|{}|{}|{}|{}".format(value, lcn, owner['record'], owner['stream'].encode("utf-8"),
+                                                 "yes" if owner['inuse'] else "no", owner['fileoffset'])
+
+    sys.exit(0)
+
+
+def start_reparse(_offset, _image):
+    '''
+    prints the junctions, mount points and symbolic links of the partition with their targets
+    :return: nothing
+    '''
+
+    volume = mftlib.open_volume(_image, _offset)
+    mftlib.buildNameIndex(volume)
+
+    print "record|path|type|substitute|print|target|target path"
+
+    for info in mftlib.iter_records(volume):
+
+        if not info['inuse'] or not any(header['attHex'] == "c0000000" for header in info['attributes']):
+            continue
+
+        try:
+            names = mftlib.reparsePoint(volume, info['number'])
+        except mftlib.RecordError as err:
+            sys.stderr.write("{}\n".format(err))
+            continue
+        if names is None:
+            continue
+
+        target = mftlib.resolveLink(volume, info['number'])
+
+        with mftlib.timer("output"):
+            print u"{}|{}|{}|{}|{}|{}|{}".format(info['number'], mftlib.recordPath(volume, info['number']),
+                                               names['type'], names['substitute'], names['print'],
+                                               "" if target is None else target,
+                                               "" if target is None else mftlib.recordPath(volume, target))\
+                .encode("utf-8")
+
+    mftlib.close_volume(volume)
+
+    sys.exit(0)
+
+
+def start_bitmap(_offset, _image, _values):
+    '''
+    prints the allocated and free clusters of the partition from $Bitmap
+    :param _values: cluster numbers; their allocation state is printed instead of the summary
+    :return: nothing
+    '''
+
+    (datarunMFT, vbrdata) = mftlib.findMFT(_image, _offset)
+    clustersize = vbrdata["bps"] * vbrdata["spc"]
+    bitmap = mftlib.readBitmap(_offset, clustersize, datarunMFT)
+    clusters = mftlib.volumeClusters(vbrdata)
+
+    if _values:
+        print "cluster|allocated"
+        for value in _values:
+            try:
+                lcn = int(value, 0)
+                print "{}|{}".format(lcn, "yes" if mftlib.clusterAllocated(bitmap, lcn) else "no")
+            except ValueError:
+                print "Cluster as number required: {}".format(value)
+                sys.exit(1)
+            except mftlib.VolumeError as err:
+                print "{}|{}".format(lcn, err)
+        sys.exit(0)
+
+    (used, free) = mftlib.bitmapCounts(bitmap, clusters)
+    (starts, lengths) = mftlib.freeExtents(bitmap, clusters)
+    largest = max(lengths) if len(lengths) else 0
+
+    print "Clusters: {} of {} bytes".format(used + free, clustersize)
+    print "Allocated: {} ({:.1f}%)".format(used, 100.0 * used / max(used + free, 1))
+    print "Free: {} ({:.1f}%)".format(free, 100.0 * free / max(used + free, 1))
+    print "Free extents: {}".format(len(starts))
+    print "Largest free extent: {} clusters{}".format(largest, " at cluster {}".format(
+        int(starts[list(lengths).index(largest)])) if largest else "")
+
+    sys.exit(0)
+
+
+def start_partitions(_image):
+    '''
+    prints the partitions of the image with their filesystems
+    :return: nothing
+    '''
+
+    print "number|scheme|type|offset|length|filesystem|name"
+
+    for partition in mftlib.listPartitions(_image):
+
+        print "{}|{}|{}|{}|{}|{}|{}".format(partition['number'], partition['scheme'], partition['type'],
+                                            partition['offset'], partition['length'], partition['fs'],
+                                            partition['name'].encode("utf-8"))
+
+    sys.exit(0)
+
+
+def start_tracesummary(_tracefile):
+    '''
+    prints the access pattern of a trace file written with --trace
+    :return: nothing
+    '''
+
+    for line in mftlib.formatTraceSummary(mftlib.summarizeTrace(_tracefile)):
+        print line
+
+    sys.exit(0)
+
+
+def scanPartition(_task):
+    '''
+    runs mft.py with the arguments of _task in a worker process; stdout goes into a file
+    :param _task: (arguments, file for stdout)
+    :return: exit code
+    '''
+
+    (arguments, stdoutfile) = _task
+
+    sys.argv = arguments
+    stdout = sys.stdout
+    sys.stdout = open(stdoutfile, "w")
+
+    try:
+        main(arguments)
+    except SystemExit as err:
+        code = err.code
+    except mftlib.MFTError as err:
+        code = str(err)
+    else:
+        code = 0
+    finally:
+        mftlib.stopTrace()
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    return code
+
+
+def partitionArguments(_argv, _partition):
+    '''
+    arguments of the mft.py run of one partition; the files of PERPARTITION get the partition number
+    :return: list of arguments
+    '''
+
+    arguments = [_argv[0]]
+    suffix = ".p{}".format(_partition['number'])
+
+    i = 1
+    while i < len(_argv):
+        (option, sep, value) = _argv[i].partition("=")
+        if option in ('--all-partitions', ):
+            pass
+        elif option in ('-o', '--processes'):
+            i += 0 if sep else 1
+        elif option in PERPARTITION and sep:
+            arguments.append(option + "=" + value + suffix)
+        elif option in PERPARTITION and i + 1 < len(_argv):
+            arguments.extend([option, _argv[i + 1] + suffix])
+            i += 1
+        else:
+            arguments.append(_argv[i])
+        i += 1
+
+    return arguments + ['-o', str(_partition['offset'])]
+
+
+def start_allpartitions(_image, _argv, _processes):
+    '''
+    runs the chosen mode on every NTFS partition of the image, _processes partitions at once;
+    the output of each partition is printed in order of the partitions
+    :param _argv: arguments of this run
+    :param _processes: number of worker processes
+    :return: nothing
+    '''
+
+    partitions = [partition for partition in mftlib.listPartitions(_image) if partition['fs'] == "NTFS"]
+    mftlib.closeFile()
+
+    if not partitions:
+        err_note = "No NTFS partition found in '{}'.".format(_image)
+        sys.exit(err_note)
+
+    tempdir = tempfile.mkdtemp(prefix="mftpart")
+    tasks = [(partitionArguments(_argv, partition), os.path.join(tempdir, str(partition['number'])))
+             for partition in partitions]
+
+    pool = multiprocessing.Pool(min(_processes, len(tasks)))
+    try:
+        codes = pool.map(scanPartition, tasks, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = 0
+    for (partition, (arguments, stdoutfile), code) in zip(partitions, tasks, codes):
+
+        print "Partition {} ({}) at offset {}:".format(partition['number'], partition['scheme'], partition['offset'])
+        with open(stdoutfile, "r") as output:
+            for line in output:
+                sys.stdout.write(line)
+        os.remove(stdoutfile)
+
+        if code not in (0, None):
+            failed += 1
+            print "Partition {} failed: {}".format(partition['number'], code)
+
+    os.rmdir(tempdir)
+
+    sys.exit(1 if failed else 0)
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixServer(SocketServer.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def answerQuery(_volumes, _query):
+    '''
+    runs a query against the opened volumes
+    :return: JSON response line
+    '''
+
+    try:
+        response = {"ok": True, "result": mftlib.queryVolumes(_volumes, _query)}
+    except mftlib.MFTError as err:
+        response = {"ok": False, "error": type(err).__name__, "message": str(err)}
+
+    return json.dumps(response) + "\n"
+
+
+def start_serve(_volumes, _socketpath, _port):
+    '''
+    opens the volumes once and answers JSON queries on a unix socket (one query per line)
+    or on localhost HTTP (GET /<<op>>?volume=..&record=..&path=..&name=..) until killed
+    :param _volumes: list of (image, offset)
+    :param _socketpath: path of the unix socket or None
+    :param _port: localhost HTTP port or None
+    :return: nothing
+    '''
+
+    volumes = []
+    for (image, offset) in _volumes:
+        volume = mftlib.open_volume(image, offset)
+        records = mftlib.buildNameIndex(volume)
+        sys.stderr.write("Volume {}: {} at offset {}, {} named records\n".format(len(volumes), image, offset,
+                                                                               records))
+        volumes.append(volume)
+
+    class LineHandler(SocketServer.StreamRequestHandler):
+
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    query = json.loads(line)
+                except ValueError:
+                    query = {"op": None}
+                self.wfile.write(answerQuery(volumes, query))
+                self.wfile.flush()
+
+    class HTTPHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            url = urlparse.urlparse(self.path)
+            query = dict((key, values[0].decode("utf-8"))
+                         for (key, values) in urlparse.parse_qs(url.query).items())
+            query["op"] = url.path.strip("/")
+            response = answerQuery(volumes, query)
+            self.send_response(200 if json.loads(response)["ok"] else 400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response)))
+            self.end_headers()
+            self.wfile.write(response)
+
+        def log_message(self, format, *args):
+            pass
+
+    if _socketpath:
+        # only a socket left by an earlier run is replaced
+        if os.path.lexists(_socketpath):
+            if not stat.S_ISSOCK(os.lstat(_socketpath).st_mode):
+                print "'{}' exists and is no socket.".format(_socketpath)
+                sys.exit(1)
+            os.remove(_socketpath)
+        server = ThreadingUnixServer(_socketpath, LineHandler)
+    else:
+        server = ThreadingHTTPServer(("127.0.0.1", _port), HTTPHandler)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if _socketpath:
+            os.remove(_socketpath)
+
+    sys.exit(0)
+
+
+def main_serve(argv):
+    '''
+    checking startoptions of the serve mode
+    :return:
+    '''
+
+    parser = argparse.ArgumentParser(prog='mft.py serve', description='Answer queries on opened volumes.')
+    parser.add_argument('--volume', nargs=2, metavar=('<<IMAGE>>', '<<OFFSET>>'), action='append', required=True,
+                        help='image and decimal offset of partition start; repeat for more volumes')
+    listen = parser.add_mutually_exclusive_group(required=True)
+    listen.add_argument('--socket', nargs=1, metavar='<<PATH>>', help='path of the unix socket')
+    listen.add_argument('--http', nargs=1, metavar='<<PORT>>', type=int, help='port on localhost')
+    parser.add_argument('--max-memory', nargs=1, metavar='<<MB>>', type=int,
+                        help='memory budget of each name index in MB; larger indexes are kept in temporary files')
+
+    args = parser.parse_args(argv)
+
+    if args.max_memory:
+        mftlib.MAXMEMORY = args.max_memory[0] * 1048576
+
+    try:
+        volumes = [(image, int(offset)) for (image, offset) in args.volume]
+    except ValueError:
+        print "Offset required"
+        parser.print_help()
+        sys.exit(1)
+
+    start_serve(volumes, args.socket[0] if args.socket else None, args.http[0] if args.http else None)
+
+
 def usage():
     '''
     Info for usage of the tool
     :return: nothing
     '''
     print "mft.py [-h] [-v] -o <<OFFSET>> -i <<IMAGE>> -m <<MFT_RECORD_NUMBER>>\n"\
+    "mft.py serve --volume <<IMAGE>> <<OFFSET>> [--volume ...] (--socket <<PATH>> | --http <<PORT>>) [--max-memory <<MB>>]\n"\
 	"\t-o specifies the offset to the start of the partition in sectors\n"\
-    "\t-i specifies the image file\n"\
+    "\t-i specifies the image file, device or first segment of a split raw image (.001)\n"\
     "\t-m specifies the MFT_RECORD_NUMBER to process\n"\
+    "\t--timeline prints the MACB timeline of all records instead of one record\n"\
+    "\t--sort-memory memory budget of the timeline sort in MB; default 256 or --max-memory\n"\
+    "\t--max-memory <<MB>> memory budget of whole-volume structures (timeline sort, name index of serve,\n"\
+    "\t\trecord cache); larger structures are spilled to memory-mapped temporary files\n"\
+    "\t--extract <<RECORD[:STREAM]>> writes the content of a $DATA stream\n"\
+    "\t--range <<OFFSET:LENGTH>> writes only this byte range of the stream with --extract\n"\
+    "\t--streams lists the $DATA streams of record -m or the alternate data streams of all records\n"\
+    "\t--carve searches FILE and INDX records in the whole image\n"\
+    "\t--unallocated searches only the unallocated clusters of the partition with --carve\n"\
+    "\t--indx-slack recovers $FILE_NAME entries from the slack of all index records\n"\
+    "\t--usn prints the records of the change journal $UsnJrnl:$J\n"\
+    "\t--logfile prints the restart pages and log records of $LogFile\n"\
+    "\t--lsn-cursor <<FILE>> with --logfile only records newer than the LSN in FILE; FILE is updated\n"\
+    "\t--snapshot-save <<FILE>> saves the fingerprints of all records\n"\
+    "\t--snapshot-diff <<FILE>> prints the records changed since the snapshot FILE\n"\
+    "\t--owner <<OFFSET>> [...] prints record, stream and offset in the stream owning the byte OFFSET of the\n"\
+    "\t\timage (e.g. a keyword hit); - reads the offsets from stdin\n"\
+    "\t--clusters --owner takes cluster numbers of the partition instead of byte offsets\n"\
+    "\t--cluster-map <<FILE>> cluster map of --owner; read if FILE exists, else saved after the scan\n"\
+    "\t--bitmap [<<CLUSTER>> ...] prints allocated and free clusters and the free extents of $Bitmap or the\n"\
+    "\t\tallocation state of each CLUSTER\n"\
+    "\t--reparse lists junctions, mount points and symbolic links with the target record on the partition\n"\
+    "\t--hash writes the md5/sha1/sha256 manifest of all allocated files\n"\
+    "\t--threads number of hashing threads\n"\
+    "\t--prefetch <<READS>> keeps READS large reads in flight ahead of MFT scans and extraction\n"\
+    "\t-w specifies the output file for --extract, --hash and --carve; default is stdout\n"\
+    "\t--checkpoint <<FILE>> saves the progress of --hash and --carve in FILE; needs -w\n"\
+    "\t--resume continues the scan saved in the --checkpoint FILE\n"\
+    "\t--partitions lists the partitions (MBR, EBR, GPT) of the image with their filesystems\n"\
+    "\t--all-partitions runs the chosen mode on every NTFS partition instead of -o; files of -w, --checkpoint,\n"\
+    "\t\t--lsn-cursor and --snapshot-* get the suffix .p<<PARTITION NUMBER>>\n"\
+    "\t--processes number of partitions processed at once with --all-partitions\n"\
+    "\t--trace <<FILE>> logs offset, length and latency of every read of the image to FILE\n"\
+    "\t--trace-summary <<FILE>> prints sequential/random and re-read ratio and seek distances of a trace\n"\
+    "\t--stats prints reads, bytes read, seeks, parsed records and attributes and the time of each\n"\
+    "\t\tparser stage to stderr when the mode has finished\n"\
+    "\tserve keeps the volumes open and answers JSON queries (volumes, record, path, name)\n"\
     "\t-h prints a help message and exits\n"\
     "\t-v displays version information and exits\n"
 
@@ -82,17 +895,62 @@ def main(argv):
     :return:
     '''
 
+    if len(argv) > 1 and argv[1] == "serve":
+        main_serve(argv[2:])
+
     parser = argparse.ArgumentParser(description='Process MFT Records.')
     parser.add_argument('-v', action='store_true', default=False, help='shows version')
     parser.add_argument('-o', nargs=1, metavar='<<OFFSET>>', type=int,help='decimal offset of partition start')
     parser.add_argument('-i',  nargs=1, metavar='<<IMAGE>>', help='Path to rawimagefile')
     parser.add_argument('-m',  nargs=1, metavar='<<MFT_RECORD_NUMBER>>', type=int, help='MFT Record number')
+    parser.add_argument('--timeline', action='store_true', default=False, help='MACB timeline of all records')
+    parser.add_argument('--sort-memory', nargs=1, metavar='<<MB>>', type=int,
+                        help='memory budget of the timeline sort in MB')
+    parser.add_argument('--max-memory', nargs=1, metavar='<<MB>>', type=int,
+                        help='memory budget of whole-volume structures in MB')
+    parser.add_argument('--extract', nargs=1, metavar='<<RECORD[:STREAM]>>', help='extract a $DATA stream')
+    parser.add_argument('--range', nargs=1, metavar='<<OFFSET:LENGTH>>', help='byte range to extract')
+    parser.add_argument('--streams', action='store_true', default=False, help='list $DATA streams')
+    parser.add_argument('--carve', action='store_true', default=False, help='carve FILE/INDX records')
+    parser.add_argument('--unallocated', action='store_true', default=False, help='carve unallocated clusters only')
+    parser.add_argument('--indx-slack', action='store_true', default=False, help='recover index slack entries')
+    parser.add_argument('--usn', action='store_true', default=False, help='parse the change journal')
+    parser.add_argument('--logfile', action='store_true', default=False, help='parse $LogFile')
+    parser.add_argument('--lsn-cursor', nargs=1, metavar='<<FILE>>', help='LSN cursor file for --logfile')
+    parser.add_argument('--snapshot-save', nargs=1, metavar='<<FILE>>', help='save snapshot of the MFT')
+    parser.add_argument('--snapshot-diff', nargs=1, metavar='<<FILE>>', help='compare with snapshot')
+    parser.add_argument('--hash', action='store_true', default=False, help='hash manifest of all files')
+    parser.add_argument('--threads', nargs=1, metavar='<<THREADS>>', type=int, default=[mftlib.HASHTHREADS],
+                        help='number of hashing threads')
+    parser.add_argument('--prefetch', nargs=1, metavar='<<READS>>', type=int, default=[mftlib.PREFETCHDEPTH],
+                        help='reads in flight ahead of sequential scans')
+    parser.add_argument('-w', nargs=1, metavar='<<OUTPUT>>', help='output file')
+    parser.add_argument('--partitions', action='store_true', default=False, help='list partitions')
+    parser.add_argument('--all-partitions', action='store_true', default=False,
+                        help='process all NTFS partitions')
+    parser.add_argument('--processes', nargs=1, metavar='<<PROCESSES>>', type=int,
+                        default=[multiprocessing.cpu_count()], help='partitions processed at once')
+    parser.add_argument('--checkpoint', nargs=1, metavar='<<FILE>>', help='checkpoint file of --hash/--carve')
+    parser.add_argument('--resume', action='store_true', default=False, help='resume from the checkpoint')
+    parser.add_argument('--owner', nargs='+', metavar='<<OFFSET>>', help='records owning byte offsets')
+    parser.add_argument('--clusters', action='store_true', default=False, help='--owner takes cluster numbers')
+    parser.add_argument('--cluster-map', nargs=1, metavar='<<FILE>>', help='saved cluster map of --owner')
+    parser.add_argument('--reparse', action='store_true', default=False, help='list links and their targets')
+    parser.add_argument('--bitmap', nargs='*', metavar='<<CLUSTER>>', help='allocated and free clusters')
+    parser.add_argument('--stats', action='store_true', default=False, help='print reads, records and timings')
+    parser.add_argument('--trace', nargs=1, metavar='<<FILE>>', help='log every read of the image to FILE')
+    parser.add_argument('--trace-summary', nargs=1, metavar='<<FILE>>', help='access pattern of a trace file')
 
     args = parser.parse_args()
 
+    mftlib.STATS = args.stats
+
     if args.v:
         printVersion()
 
+    if args.trace_summary:
+        start_tracesummary(args.trace_summary[0])
+
     if not args.i and not args.o and not args.m:
         usage()
 
@@ -100,22 +958,108 @@ def main(argv):
         print "Imagefile required"
         usage()
 
+    if args.partitions:
+        start_partitions(args.i[0])
+
+    if args.all_partitions:
+        start_allpartitions(args.i[0], sys.argv, args.processes[0])
+
     if not args.o: #or type(args.o) not "int":
         print "Offset required"
         usage()
 
+    offset  =   args.o[0]
+    image   =   args.i[0]
+
+    output  =   args.w[0] if args.w else None
+
+    checkpoint = args.checkpoint[0] if args.checkpoint else None
+
+    mftlib.PREFETCHDEPTH = args.prefetch[0]
+
+    if args.max_memory:
+        mftlib.MAXMEMORY = args.max_memory[0] * 1048576
+
+    if args.trace:
+        mftlib.startTrace(args.trace[0])
+
+    if args.timeline:
+        start_timeline(offset, image, args.sort_memory[0] if args.sort_memory else None)
+
+    if args.streams:
+        start_streams(offset, image, args.m[0] if args.m else None)
+
+    if args.carve:
+        start_carve(offset, image, args.unallocated, output, checkpoint, args.resume)
+
+    if args.indx_slack:
+        start_indxslack(offset, image)
+
+    if args.usn:
+        start_usn(offset, image)
+
+    if args.logfile:
+        start_logfile(offset, image, args.lsn_cursor[0] if args.lsn_cursor else None)
+
+    if args.snapshot_save or args.snapshot_diff:
+        start_snapshot(offset, image, args.snapshot_diff[0] if args.snapshot_diff else None,
+                       args.snapshot_save[0] if args.snapshot_save else None)
+
+    if args.owner or args.cluster_map:
+        start_owner(offset, image, args.owner or [], args.clusters, args.cluster_map[0] if args.cluster_map else None)
+
+    if args.reparse:
+        start_reparse(offset, image)
+
+    if args.bitmap is not None:
+        start_bitmap(offset, image, args.bitmap)
+
+    if args.hash:
+        start_hash(offset, image, args.threads[0], output, checkpoint, args.resume)
+
+    if args.extract:
+        (extrecord, sep, streamname) = args.extract[0].partition(":")
+        try:
+            extrecord = int(extrecord)
+        except ValueError:
+            print "Recordnumber required"
+            usage()
+        extrange = None
+        if args.range:
+            try:
+                extrange = tuple(int(value) for value in args.range[0].split(":"))
+                (rangeoffset, rangelength) = extrange
+            except ValueError:
+                print "Range as <<OFFSET:LENGTH>> required"
+                usage()
+        start_extract(offset, image, extrecord, streamname.decode("utf-8"), output, extrange)
+
     if not args.m:# or type(args.m) not "int":
         print "Recordnumber required"
         usage()
 
-
-    offset  =   args.o[0]
-    image   =   args.i[0]
     record  =   args.m[0]
 
     start_parsing(offset, image, record)
 
 
+def printStats():
+    '''
+    prints the counters and timers of mftlib to stderr, so they are not mixed with the output
+    :return: nothing
+    '''
+
+    for line in mftlib.formatStats(mftlib.get_stats()):
+        sys.stderr.write(line + "\n")
+
+
 # get started
 if __name__ == '__main__':
-    main(sys.argv)
+    try:
+        main(sys.argv)
+    except mftlib.MFTError as err:
+        sys.exit(str(err))
+    finally:
+        mftlib.stopTrace()
+        if mftlib.STATS:
+            printStats()
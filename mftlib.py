@@ -7,10 +7,30 @@ import struct
 import binascii
 import stat
 import re
+import heapq
+import tempfile
+import hashlib
+import threading
+import Queue
+import collections
+import mmap
+import json
+import contextlib
+import bisect
+import uuid
+import time
+import functools
+import array
 
 from datetime import datetime, timedelta
 from string import Template, printable
 
+# optional; vectorized analytics of the cluster bitmap, without it the same is done in pure Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 
 
@@ -36,6 +56,7 @@ version = "0.8"
 
 ################
 DEBUG=False      # produce real much output ... only, really only for testing
+STATS=False      # count reads, records and attributes and time the parsers; see get_stats
 ################
 
 # FS signature
@@ -59,6 +80,65 @@ VBRHEADER = [
     {"name": "Unknown",         "pos": 0,   "header": "",                   "shift": 0}
 ]
 
+# bytes read at once to compare all VBRHEADER signatures
+PARTITIONPROBE = max(entry["pos"] + entry["shift"] + len(entry["header"]) / 2 for entry in VBRHEADER)
+
+# Partition tables
+MBRSIGNATURE = "55aa"           # at offset 510 of MBR and EBR
+MBRTABLE     = 446              # offset of the 4 partition entries
+MBRPART_DATA = [
+    {"name": "boot",        "offset": 0,    "length": 1, "format": "<B"},       # 0x80 bootable
+    {"name": "type",        "offset": 4,    "length": 1, "format": "<B"},       # partition type
+    {"name": "lbaStart",    "offset": 8,    "length": 4, "format": "<I"},       # first sector
+    {"name": "sectors",     "offset": 12,   "length": 4, "format": "<I"}        # number of sectors
+]
+MBR_EXTENDED = [0x05, 0x0f, 0x85]
+MBR_GPT      = 0xee
+
+GPTHEADER_DATA = [
+    {"name": "sig",         "offset": 0,    "length": 8, "format": "8s"},       # "EFI PART"
+    {"name": "entriesLba",  "offset": 72,   "length": 8, "format": "<Q"},       # first sector of entries
+    {"name": "entries",     "offset": 80,   "length": 4, "format": "<I"},       # number of entries
+    {"name": "entrySize",   "offset": 84,   "length": 4, "format": "<I"}        # bytes per entry
+]
+GPTPART_DATA = [
+    {"name": "typeGUID",    "offset": 0,    "length": 16, "format": "16s"},     # partition type
+    {"name": "partGUID",    "offset": 16,   "length": 16, "format": "16s"},     # unique partition guid
+    {"name": "firstLba",    "offset": 32,   "length": 8, "format": "<Q"},       # first sector
+    {"name": "lastLba",     "offset": 40,   "length": 8, "format": "<Q"},       # last sector, inclusive
+    {"name": "partName",    "offset": 56,   "length": 72, "format": "72s"}      # name utf-16
+]
+
+MBR_TYPE = {
+    0x01: "FAT12",
+    0x04: "FAT16",
+    0x05: "Extended",
+    0x06: "FAT16",
+    0x07: "NTFS/exFAT",
+    0x0b: "FAT32",
+    0x0c: "FAT32 LBA",
+    0x0e: "FAT16 LBA",
+    0x0f: "Extended LBA",
+    0x27: "Windows Recovery",
+    0x82: "Linux Swap",
+    0x83: "Linux",
+    0x85: "Linux Extended",
+    0x8e: "Linux LVM",
+    0xee: "GPT Protective"
+}
+
+GPT_TYPE = {
+    "EBD0A0A2-B9E5-4433-87C0-68B6B72699C7": "Basic Data",
+    "C12A7328-F81F-11D2-BA4B-00A0C93EC93B": "EFI System",
+    "E3C9E316-0B5C-4DB8-817D-F92DF00215AE": "Microsoft Reserved",
+    "DE94BBA4-06D1-4D40-A16A-BFD50179D6AC": "Windows Recovery",
+    "5808C8AA-7E8F-42E0-85D2-E1E90434CFB3": "LDM Metadata",
+    "AF9B60A0-1431-4F62-BC68-3311714A69AD": "LDM Data",
+    "0FC63DAF-8483-4772-8E79-3D69D8477DE4": "Linux Filesystem",
+    "0657FD6D-A4AB-43C4-84E5-0933C84B4F4F": "Linux Swap",
+    "E6D6D379-F507-44C2-A23C-238F2A3DF928": "Linux LVM"
+}
+
 # known Attributes
 # {"name": "name of attribute",    "var":"name of table" ,  "func":function name for parsing    "hex": "hex identifier"},
 ATTRIBUTES =[
@@ -88,7 +168,7 @@ ATTRIBUTES =[
 VBR_DATA = [
     {"name": "bps",         "offset":11,    "length":2, "format":"<H"},         #bytes per sector
     {"name": "spc" ,        "offset":13 ,   "length":1, "format":"<b"},         #sectors per cluster
-    #{"name": "sectorstotal","offset":40,    "length":8, "format":"<Q"},         #total number of sectors per partition
+    {"name": "sectorstotal","offset":40,    "length":8, "format":"<Q"},         #total number of sectors per partition
     {"name": "mftstart" ,   "offset":48 ,   "length":8, "format":"<Q"},         #startcluster of mft
     #{"name": "mirstart" ,   "offset":56 ,   "length":8, "format":"<Q"},         #start of mft mirror
     {"name": "cpr" ,        "offset":64 ,   "length":1, "format":">B"}          #clusters per record
@@ -117,6 +197,9 @@ ATT_HEADER =[
     {"name": "attID",       "offset": 0,    "length": 4, "format": "4s"},       # attribute ID
     {"name": "attLen",      "offset": 4,    "length": 4, "format": "<I"},       # attribute length
     {"name": "resident",    "offset": 8,    "length": 1, "format": "<B"},       # resident/non resident (POSITION_FLAG)
+    {"name": "nameLen",     "offset": 9,    "length": 1, "format": "<B"},       # length of attribute name in characters
+    {"name": "nameOff",     "offset": 10,   "length": 2, "format": "<H"},       # offset to attribute name
+    {"name": "attFlags",    "offset": 12,   "length": 2, "format": "<H"},       # attribute flags (FILE_TYPE_FLAGS)
     {"name": "attNr",       "offset": 14,   "length": 2, "format": "<H"}        # attribute identifier
 
 ]
@@ -129,18 +212,22 @@ SID_DATA = [
     {"name": "modified",     "offset": 32,   "length": 8, "format": "<Q"},      # timestamp
     {"name": "mftmodified",  "offset": 40,   "length": 8, "format": "<Q"},      # timestamp
     {"name": "lastaccess",   "offset": 48,   "length": 8, "format": "<Q"},      # timestamp
-    {"name": "dosflag",      "offset": 56,   "length": 4, "format": "4s"}       # flags (DOS_FLAGS)
+    {"name": "dosflag",      "offset": 56,   "length": 4, "format": "4s"},      # flags (DOS_FLAGS)
+    {"name": "securityId",   "offset": 76,   "length": 4, "format": "<I"}       # id in $Secure; NTFS 3.0 and later
 ]
 
 # Attribute List 0x20
 
+# one entry of the list; offsets relative to the entry, the entries follow each other in the content
 AttList_DATA =[
-    {"name": "type",          "offset": 24, "length": 4, "format": "<I"},
-    {"name": "reclen",        "offset": 28, "length": 2, "format": "<H"},
-    {"name": "namelen",       "offset": 30, "length": 1, "format": "<B"},
-    {"name": "fileref",       "offset": 40, "length": 8, "format": "<Q"},
-    {"name": "ID",            "offset": 48, "length": 2, "format": "<H"},
-    {"name": "name",          "offset": 50, "length": 0, "format": "."},
+    {"name": "type",          "offset": 0,  "length": 4, "format": "4s"},
+    {"name": "reclen",        "offset": 4,  "length": 2, "format": "<H"},
+    {"name": "namelen",       "offset": 6,  "length": 1, "format": "<B"},
+    {"name": "nameoff",       "offset": 7,  "length": 1, "format": "<B"},
+    {"name": "VCNstart",      "offset": 8,  "length": 8, "format": "<Q"},
+    {"name": "fileref",       "offset": 16, "length": 8, "format": "<Q"},
+    {"name": "ID",            "offset": 24, "length": 2, "format": "<H"},
+    {"name": "name",          "offset": 26, "length": 0, "format": "."},
 
 ]
 
@@ -182,7 +269,8 @@ VolInfo_DATA=[
 
 DATA_DATA =[
     {"name": "res_size",    "offset":16,    "length": 4, "format": "<I"},       # size of resident data
-    {"name": "res_data",    "offset":24,    "length": 0, "format": "."}         # resident data
+    {"name": "res_off",     "offset":20,    "length": 2, "format": "<H"},       # offset to resident data
+    {"name": "res_data",    "offset":24,    "length": 0, "format": "."}         # resident data (moved by a stream name)
 
 ]
 
@@ -191,6 +279,8 @@ DATA_DATA =[
 DATAnonres_DATA = [
     {"name": "VCNstart",    "offset":16,    "length": 8, "format": "<Q"},       #virtual cluster number Start
     {"name": "VCNend",      "offset":24,    "length": 8, "format": "<Q"},       #virtual cluster number End
+    {"name": "runOff",      "offset":32,    "length": 2, "format": "<H"},       # offset to runlist
+    {"name": "compUnit",    "offset":34,    "length": 1, "format": "<B"},       # compression unit size (2^x clusters)
     {"name": "physSize",    "offset":40,    "length": 8, "format": "<Q"},       # physical size
     {"name": "logSize",     "offset":48,    "length": 8, "format": "<Q"},       # logical size
     {"name": "resSize",     "offset":56,    "length": 8, "format": "<Q"},       # reserved size
@@ -201,7 +291,6 @@ DATAnonres_DATA = [
 
 IndRoot_DATA=[### has To be revised - not correct! Attribute not parsed yet!
     {"name": "flags",       "offset": 12,     "length": 2, "format": "<H"},     #
-    {"name": "StreamName",  "offset": 24,     "length": 8, "format": "8s"},     #
     {"name": "storedAtt",   "offset": 32,     "length": 4, "format": "<I"},     #
     {"name": "IndBytesize", "offset": 40,     "length": 4, "format": "<I"},     #
     {"name": "IndClustsize","offset": 44,     "length": 1, "format": "<B"},     #
@@ -236,7 +325,6 @@ IndAll_DATA=[
     {"name": "physSize",    "offset": 40,     "length": 8, "format": "<Q"},     # allocated size (physical)
     {"name": "logSize",     "offset": 48,     "length": 8, "format": "<Q"},     # actual size (logical)
     {"name": "iniSize",     "offset": 56,     "length": 8, "format": "<Q"},     # initialized in bytes
-    {"name": "StreamName",  "offset": 64,     "length": 8, "format": "8s"}      # stream name
     #{"name": "runlist",     "offset": 72,     "length": 0, "format": "."}       # runlist
 ]
 
@@ -244,7 +332,6 @@ IndAll_DATA=[
 
 Bitmap_DATA= [
     {"name": "TypeFlags",    "offset": 12,      "length": 2, "format": "<H"},   #
-    {"name": "StreamName",   "offset": 24,      "length": 8, "format": "8s"},   #
     {"name": "bitmap",       "offset": 32,      "length": 8, "format": "<Q"}    #
 ]
 
@@ -256,15 +343,163 @@ SymLink_DATA=[
     {"name": "nameLen",     "offset": 34,    "length": 2, "format": "<H"},      # Length of target name
     {"name": "prNameOff",   "offset": 36,    "length": 2, "format": "<H"},      # Offset of print target name
     {"name": "prNameLen",   "offset": 38,    "length": 2, "format": "<H"},      # length of print target name
-    {"name": "folderPath",  "offset": 40,    "length": 0, "format": "."}        # path
+    {"name": "folderPath",  "offset": 40,    "length": 0, "format": "."},       # path
+    {"name": "reparseData", "offset": 24,    "length": 0, "format": "."}        # complete reparse data for reparseNames
+]
+
+# reparse data of mount points, junctions and symbolic links; relative to the start of the content
+
+REPARSEPOINT_DATA=[
+    {"name": "tag",         "offset": 0,     "length": 4, "format": "<I"},      # reparse tag
+    {"name": "dataLen",     "offset": 4,     "length": 2, "format": "<H"},      # length of the data behind the header
+    {"name": "nameOff",     "offset": 8,     "length": 2, "format": "<H"},      # offset of substitute name in the path buffer
+    {"name": "nameLen",     "offset": 10,    "length": 2, "format": "<H"},      # length of substitute name in bytes
+    {"name": "prNameOff",   "offset": 12,    "length": 2, "format": "<H"},      # offset of print name in the path buffer
+    {"name": "prNameLen",   "offset": 14,    "length": 2, "format": "<H"}       # length of print name in bytes
+]
+
+REPARSE_MOUNTPOINT = 0xA0000003     # junctions and volume mount points; path buffer at 16
+REPARSE_SYMLINK    = 0xA000000C     # symbolic links; flags at 16 (1 relative), path buffer at 20
+
+
+
+
+# USN_RECORD_V2 of the change journal $UsnJrnl:$J
+
+USN_DATA=[
+    {"name": "recLen",      "offset": 0,     "length": 4, "format": "<I"},      # length of the record
+    {"name": "major",       "offset": 4,     "length": 2, "format": "<H"},      # major version
+    {"name": "minor",       "offset": 6,     "length": 2, "format": "<H"},      # minor version
+    {"name": "fileRef",     "offset": 8,     "length": 8, "format": "<Q"},      # file reference
+    {"name": "parentRef",   "offset": 16,    "length": 8, "format": "<Q"},      # parent file reference
+    {"name": "usn",         "offset": 24,    "length": 8, "format": "<Q"},      # update sequence number
+    {"name": "timestamp",   "offset": 32,    "length": 8, "format": "<Q"},      # timestamp
+    {"name": "reason",      "offset": 40,    "length": 4, "format": "<I"},      # reason flags (USN_REASON)
+    {"name": "sourceInfo",  "offset": 44,    "length": 4, "format": "<I"},      # source info
+    {"name": "securityId",  "offset": 48,    "length": 4, "format": "<I"},      # security id
+    {"name": "fileAttr",    "offset": 52,    "length": 4, "format": "<I"},      # file attributes (DOS_FLAGS)
+    {"name": "nameLength",  "offset": 56,    "length": 2, "format": "<H"},      # length of filename in bytes
+    {"name": "nameOff",     "offset": 58,    "length": 2, "format": "<H"}       # offset to filename
+]
+
+# USN_RECORD_V3; 128 bit file references, the lower 64 bit are read
+
+USNv3_DATA=[
+    {"name": "recLen",      "offset": 0,     "length": 4, "format": "<I"},
+    {"name": "major",       "offset": 4,     "length": 2, "format": "<H"},
+    {"name": "minor",       "offset": 6,     "length": 2, "format": "<H"},
+    {"name": "fileRef",     "offset": 8,     "length": 8, "format": "<Q"},
+    {"name": "parentRef",   "offset": 24,    "length": 8, "format": "<Q"},
+    {"name": "usn",         "offset": 40,    "length": 8, "format": "<Q"},
+    {"name": "timestamp",   "offset": 48,    "length": 8, "format": "<Q"},
+    {"name": "reason",      "offset": 56,    "length": 4, "format": "<I"},
+    {"name": "sourceInfo",  "offset": 60,    "length": 4, "format": "<I"},
+    {"name": "securityId",  "offset": 64,    "length": 4, "format": "<I"},
+    {"name": "fileAttr",    "offset": 68,    "length": 4, "format": "<I"},
+    {"name": "nameLength",  "offset": 72,    "length": 2, "format": "<H"},
+    {"name": "nameOff",     "offset": 74,    "length": 2, "format": "<H"}
+]
+
+# largest USN record of a version: header and a name of 255 UTF-16 characters, 8 byte aligned
+USN_MAXRECORD = {2: 0x240, 3: 0x250}
+
+# $LogFile restart page header (RSTR)
+
+RSTR_DATA=[
+    {"name": "sig",         "offset": 0,     "length": 4, "format": "4s"},      # signature RSTR/CHKD
+    {"name": "chkdskLsn",   "offset": 8,     "length": 8, "format": "<Q"},      # LSN of last chkdsk
+    {"name": "sysPageSize", "offset": 16,    "length": 4, "format": "<I"},      # system page size
+    {"name": "logPageSize", "offset": 20,    "length": 4, "format": "<I"},      # log page size
+    {"name": "areaOff",     "offset": 24,    "length": 2, "format": "<H"},      # offset to restart area
+    {"name": "minorVer",    "offset": 26,    "length": 2, "format": "<H"},      # minor version
+    {"name": "majorVer",    "offset": 28,    "length": 2, "format": "<H"}       # major version
+]
+
+# $LogFile restart area; relative to areaOff
+
+RSTRAREA_DATA=[
+    {"name": "currentLsn",  "offset": 0,     "length": 8, "format": "<Q"},      # current LSN
+    {"name": "logClients",  "offset": 8,     "length": 2, "format": "<H"},      # number of log clients
+    {"name": "flags",       "offset": 14,    "length": 2, "format": "<H"},      # flags
+    {"name": "seqNrBits",   "offset": 16,    "length": 4, "format": "<I"},      # bits of the sequence number in a LSN
+    {"name": "fileSize",    "offset": 24,    "length": 8, "format": "<Q"},      # size of $LogFile
+    {"name": "recHeadLen",  "offset": 36,    "length": 2, "format": "<H"},      # length of log record header
+    {"name": "dataOff",     "offset": 38,    "length": 2, "format": "<H"},      # offset to data in log record pages
+    {"name": "openCount",   "offset": 40,    "length": 4, "format": "<I"}       # restart log open count
+]
+
+# $LogFile log record page header (RCRD)
+
+RCRD_DATA=[
+    {"name": "sig",         "offset": 0,     "length": 4, "format": "4s"},      # signature RCRD
+    {"name": "lastLsn",     "offset": 8,     "length": 8, "format": "<Q"},      # last LSN / file offset
+    {"name": "flags",       "offset": 16,    "length": 4, "format": "<I"},      # flags
+    {"name": "pageCount",   "offset": 20,    "length": 2, "format": "<H"},      # page count
+    {"name": "pagePos",     "offset": 22,    "length": 2, "format": "<H"},      # page position
+    {"name": "nextRecOff",  "offset": 24,    "length": 2, "format": "<H"},      # offset to free space in page
+    {"name": "lastEndLsn",  "offset": 32,    "length": 8, "format": "<Q"}       # LSN of last record ending in page
+]
+
+# $LogFile log record header and NTFS client data
+
+LOGREC_DATA=[
+    {"name": "lsn",         "offset": 0,     "length": 8, "format": "<Q"},      # this LSN
+    {"name": "prevLsn",     "offset": 8,     "length": 8, "format": "<Q"},      # previous LSN of the client
+    {"name": "undoNextLsn", "offset": 16,    "length": 8, "format": "<Q"},      # undo next LSN of the client
+    {"name": "dataLen",     "offset": 24,    "length": 4, "format": "<I"},      # length of client data
+    {"name": "recType",     "offset": 32,    "length": 4, "format": "<I"},      # record type (1 client record, 2 client restart)
+    {"name": "transId",     "offset": 36,    "length": 4, "format": "<I"},      # transaction id
+    {"name": "flags",       "offset": 40,    "length": 2, "format": "<H"}       # flags (1 record spans pages)
+]
+
+LOGCLIENT_DATA=[
+    {"name": "redoOp",      "offset": 48,    "length": 2, "format": "<H"},      # redo operation (LOG_OPERATION)
+    {"name": "undoOp",      "offset": 50,    "length": 2, "format": "<H"},      # undo operation (LOG_OPERATION)
+    {"name": "redoOff",     "offset": 52,    "length": 2, "format": "<H"},      # offset to redo data
+    {"name": "redoLen",     "offset": 54,    "length": 2, "format": "<H"},      # length of redo data
+    {"name": "undoOff",     "offset": 56,    "length": 2, "format": "<H"},      # offset to undo data
+    {"name": "undoLen",     "offset": 58,    "length": 2, "format": "<H"},      # length of undo data
+    {"name": "targetAtt",   "offset": 60,    "length": 2, "format": "<H"},      # target attribute
+    {"name": "lcnsFollow",  "offset": 62,    "length": 2, "format": "<H"},      # number of LCNs to follow
+    {"name": "recordOff",   "offset": 64,    "length": 2, "format": "<H"},      # record offset
+    {"name": "attOff",      "offset": 66,    "length": 2, "format": "<H"},      # attribute offset
+    {"name": "targetVcn",   "offset": 72,    "length": 8, "format": "<Q"}       # target VCN
+]
+
+LOGREC_HEADER = 48          # length of the log record header
+
+# Security Descriptor Attribute 0x50; NTFS 1.x only, later volumes keep the descriptors in $Secure
+
+SecDes_DATA=[
+    {"name": "res_size",    "offset": 16,    "length": 4, "format": "<I"},      # size of resident data
+    {"name": "res_off",     "offset": 20,    "length": 2, "format": "<H"},      # offset to resident data
+    {"name": "descriptor",  "offset": 24,    "length": 0, "format": "."}        # self-relative security descriptor
+]
+
+# self-relative security descriptor; offsets relative to its start
+
+SECDESC_DATA=[
+    {"name": "revision",    "offset": 0,     "length": 1, "format": "<B"},      # revision
+    {"name": "control",     "offset": 2,     "length": 2, "format": "<H"},      # control flags (SECURITY_CONTROL)
+    {"name": "ownerOff",    "offset": 4,     "length": 4, "format": "<I"},      # offset to owner SID
+    {"name": "groupOff",    "offset": 8,     "length": 4, "format": "<I"},      # offset to group SID
+    {"name": "saclOff",     "offset": 12,    "length": 4, "format": "<I"},      # offset to SACL
+    {"name": "daclOff",     "offset": 16,    "length": 4, "format": "<I"}       # offset to DACL
 ]
 
+# entry of $Secure:$SDS; header in front of each descriptor
 
+SDSENTRY_DATA=[
+    {"name": "hash",        "offset": 0,     "length": 4, "format": "<I"},      # hash of the descriptor
+    {"name": "securityId",  "offset": 4,     "length": 4, "format": "<I"},      # security id
+    {"name": "sdsOff",      "offset": 8,     "length": 8, "format": "<Q"},      # offset of this entry in $SDS
+    {"name": "sdsLen",      "offset": 16,    "length": 4, "format": "<I"}       # length of header and descriptor
+]
 
+SDSENTRY_HEADER = 20        # length of the $SDS entry header
 
 # Other attributes; not implemented for now. Compare with names from table "ATTRIBUTES" above
 
-SecDes_DATA =[] # Security Descriptor   0x50
 EAInfo_DATA =[] # EA Information        0xd0
 EA_DATA     =[] # EA                    0xe0
 LUS_DATA    =[] # Logged Utility Stream 0x0001
@@ -274,6 +509,64 @@ LUS_DATA    =[] # Logged Utility Stream 0x0001
 
 SIGNATURE= ["FILE", "BAAD", "INDX"]
 
+RECORDSIZE  = 1024          # size of one MFT record in bytes
+SECTORSIZE  = 512           # stride of the update sequence (fixup) array
+SCANCHUNK   = 1048576       # bytes read at once while walking the complete MFT
+SORTMEMORY  = 268435456     # default memory budget of the timeline sort in bytes
+SORTFANIN   = 64            # max. number of sorted runs merged at once
+EXTRACTCHUNK= 8388608       # bytes copied at once while extracting file content
+HASHCHUNK   = 1048576       # bytes read at once while hashing file content
+HASHTHREADS = 4             # default number of hashing threads
+HASHES      = ["md5", "sha1", "sha256"]
+UNITCACHE   = 64            # decompressed compression units kept by a unit cache
+LZNT1CHUNK  = 4096          # uncompressed size of a LZNT1 chunk
+CARVEWINDOW = 16777216      # bytes searched at once while carving
+INDXSIZE    = 4096          # size of an index record (INDX)
+MINFILETIME = 119600064000000000    # 01.01.1980; older timestamps of recovered entries are not plausible
+MAXFILETIME = 157469184000000000    # 01.01.2100
+LOGWINDOW   = 1048576       # bytes of $LogFile read at once
+
+# snapshot file: header (magic, record size, number of entries), then one fixed size entry per record
+SNAPSHOT_MAGIC  = "MFTSNAP1"
+SNAPSHOT_HEADER = struct.Struct("<8sIQ")
+SNAPSHOT_ENTRY  = struct.Struct("<BHHQ16s")     # FILE signature found, flags, sequence, LSN, md5 of record
+
+CHECKPOINTSECONDS = 60      # seconds between two checkpoints of a scan
+RECORDCACHE = 65536         # fixed records kept per volume by get_record
+EXTENSIONCACHE = 1024       # fixed base/extension records kept by a record cache of newRecordCache
+EXTENSIONBATCH = 1024       # records of a scan whose extension records are read together
+ROOTDIR     = 5             # record number of the root directory
+PREFETCHDEPTH = 0           # reads in flight ahead of sequential scans; 0 reads synchronously
+MAXMEMORY   = None          # memory budget in bytes of whole-volume structures; None is unlimited
+NAMEINDEXBYTES = 400        # estimated memory of one record in the name index dictonaries
+NAME_ENTRY  = struct.Struct("<QQI")         # parent, offset in the name heap (0 no name), length of the name
+
+SECURITYCACHE = 4096        # parsed security descriptors kept per volume, by security id
+REPARSEDEPTH = 63           # max. number of links followed to resolve one path, like Windows
+SECURERECORD = 9            # record number of $Secure
+BITMAPCHUNK = 1048576       # bytes of the cluster bitmap analyzed at once
+POPCOUNT    = [bin(i).count("1") for i in range(256)]   # set bits of a byte
+
+# cluster map file
+CLUSTERMAP_MAGIC  = "MFTCMAP2"
+CLUSTERMAP_HEADER = struct.Struct("<8sIQQI")   # magic, bytes per cluster, start of partition, runs, layers + 1
+CLUSTERMAP_RUN    = struct.Struct(">QQQQIB")   # start, length, vcn, record, stream, in use; big endian to sort
+ARRAYQWORD = "L" if array.array("L").itemsize == 8 else "d"     # array typecode of 64 bit values; no 'Q' here
+
+# I/O trace file
+TRACE_MAGIC = "MFTTRAC1"
+TRACE_ENTRY = struct.Struct("<QII")        # offset, length, latency in microseconds
+TRACEBLOCK  = 4096          # granularity of the re-read ratio
+SEEKBUCKETS = [4096, 65536, 1048576, 16777216, 268435456, 4294967296]    # limits of the seek histogram
+
+# MACB order of the timestamps; {"name": keyname in SID_DATA/FN_DATA, "flag": MACB letter}
+MACB = [
+    {"name": "modified",    "flag": "M"},
+    {"name": "lastaccess",  "flag": "A"},
+    {"name": "mftmodified", "flag": "C"},
+    {"name": "creation",    "flag": "B"}
+]
+
 FILE_FLAG={
     0:"Deleted File",
     1:"Allocated File",
@@ -292,8 +585,8 @@ FILENAME_TYPE={
 
 
 POSITION_FLAG={
-    0:"Non Resident",
-    1:"Resident"
+    0:"Resident",
+    1:"Non Resident"
 }
 # dosflags
 # bitposition backwards : flag
@@ -304,10 +597,58 @@ DOS_FLAGS={
     12:"Offline",13:"Not Content Indexed",14:"Encrypted"}
 
 
+# control flags of a security descriptor; bitmask
+SECURITY_CONTROL={
+    0x0001:"Owner Defaulted", 0x0002:"Group Defaulted", 0x0004:"DACL Present", 0x0008:"DACL Defaulted",
+    0x0010:"SACL Present", 0x0020:"SACL Defaulted", 0x0400:"DACL Auto Inherited", 0x0800:"SACL Auto Inherited",
+    0x1000:"DACL Protected", 0x2000:"SACL Protected", 0x8000:"Self Relative"
+}
+
+# types of access control entries
+ACE_TYPE={
+    0:"Allow", 1:"Deny", 2:"Audit", 3:"Alarm", 5:"Allow Object", 6:"Deny Object", 7:"Audit Object",
+    8:"Alarm Object", 9:"Allow Callback", 10:"Deny Callback", 17:"Mandatory Label"
+}
+
+# well known SIDs; domain SIDs are shown without name
+WELLKNOWN_SID={
+    "S-1-0-0":"Nobody", "S-1-1-0":"Everyone", "S-1-3-0":"Creator Owner", "S-1-3-1":"Creator Group",
+    "S-1-5-7":"Anonymous", "S-1-5-11":"Authenticated Users", "S-1-5-18":"SYSTEM", "S-1-5-19":"Local Service",
+    "S-1-5-20":"Network Service", "S-1-5-32-544":"Administrators", "S-1-5-32-545":"Users",
+    "S-1-5-32-546":"Guests", "S-1-15-2-1":"All Application Packages",
+    "S-1-5-80-956008885-3418522649-1831038044-1853292631-2271478464":"TrustedInstaller"
+}
+
+# operations of $LogFile records
+LOG_OPERATION={
+    0:"Noop", 1:"CompensationLogRecord", 2:"InitializeFileRecordSegment", 3:"DeallocateFileRecordSegment",
+    4:"WriteEndOfFileRecordSegment", 5:"CreateAttribute", 6:"DeleteAttribute", 7:"UpdateResidentValue",
+    8:"UpdateNonresidentValue", 9:"UpdateMappingPairs", 10:"DeleteDirtyClusters", 11:"SetNewAttributeSizes",
+    12:"AddIndexEntryRoot", 13:"DeleteIndexEntryRoot", 14:"AddIndexEntryAllocation",
+    15:"DeleteIndexEntryAllocation", 16:"WriteEndOfIndexBuffer", 17:"SetIndexEntryVcnRoot",
+    18:"SetIndexEntryVcnAllocation", 19:"UpdateFileNameRoot", 20:"UpdateFileNameAllocation",
+    21:"SetBitsInNonresidentBitMap", 22:"ClearBitsInNonresidentBitMap", 23:"HotFix", 24:"EndTopLevelAction",
+    25:"PrepareTransaction", 26:"CommitTransaction", 27:"ForgetTransaction", 28:"OpenNonresidentAttribute",
+    29:"OpenAttributeTableDump", 30:"AttributeNamesDump", 31:"DirtyPageTableDump", 32:"TransactionTableDump",
+    33:"UpdateRecordDataRoot", 34:"UpdateRecordDataAllocation"
+}
+
+# attribute flags; bitmask
+# reason flags of the change journal
+# bitposition backwards : flag
+USN_REASON={
+    0:"Data Overwrite",1:"Data Extend",2:"Data Truncation",
+    4:"Named Data Overwrite",5:"Named Data Extend",6:"Named Data Truncation",
+    8:"File Create",9:"File Delete",10:"EA Change",11:"Security Change",
+    12:"Rename Old Name",13:"Rename New Name",14:"Indexable Change",15:"Basic Info Change",
+    16:"Hard Link Change",17:"Compression Change",18:"Encryption Change",19:"Object ID Change",
+    20:"Reparse Point Change",21:"Stream Change",22:"Transacted Change",23:"Integrity Change",
+    31:"Close"}
+
 FILE_TYPE_FLAGS={
-    1:"Compressed",
-    2:"Sparse",
-    3:"Encrypted"
+    0x0001:"Compressed",
+    0x4000:"Encrypted",
+    0x8000:"Sparse"
 }
 
 REPARSE_FLAG={
@@ -321,7 +662,8 @@ REPARSE_FLAG={
     "03000088": "Mount Point",
     "030000A0": "Junction",
     "040000A8": "HSM",
-    "000000E8": "Symbolic Link"
+    "000000E8": "Symbolic Link",
+    "0C0000A0": "Symbolic Link"
 }
 
 
@@ -343,14 +685,396 @@ TIMESTAMPS = Template("\t\t\t\tCreated        : $created\n"
                       "\t\t\t\tMFT modified   : $mftmodified\n"
                       "\t\t\t\tAccessed       : $accessed\n")
 ATTRIBUTELIST = Template("\t\t\t\tType: $atttype Name: $attname $location size: $size\n")
+ATTLISTENTRY = Template("\t\t\t\tType: $atttype Name: $attname Start VCN: $vcn MFT Entry: $record Sequence: $sequence\n")
 DOSFLAG     = Template("\t\t\t\tFileflags: $flags\n")
+SECURITYID  = Template("\t\t\t\tSecurity ID: $securityid\n")
+SECURITY    = Template("\t\t\t\tOwner: $owner\n"
+                       "\t\t\t\tGroup: $group\n"
+                       "\t\t\t\tControl: $control\n"
+                       "\t\t\t\tDACL: $dacl\n")
+REPARSENAMES= Template("\t\t\t\tSubstitute Name: $substitute\n"
+                       "\t\t\t\tPrint Name: $printname\n"
+                       "\t\t\t\tRelative: $relative\n")
+ACEENTRY    = Template("\t\t\t\t\t$acetype $sid Mask: $mask Flags: $flags\n")
 
 ADDTEXT     = Template("\t\t\t\t$text $value")
 
+'''
+Errors
+'''
+
+class MFTError(Exception):
+    """base of all errors of mftlib; the library never ends the process"""
+    pass
+
+
+class ImageError(MFTError):
+    """the image or device can't be opened or read"""
+    pass
+
+
+class VolumeError(MFTError):
+    """no NTFS partition at the offset or a needed system file is missing"""
+    pass
+
+
+class RecordNotFound(MFTError):
+    """the record number is not part of the MFT"""
+    pass
+
+
+class RecordError(MFTError):
+    """a record or the data of a record can't be read or parsed; scans log and skip the record"""
+    pass
+
+
+class StateFileError(MFTError):
+    """a cursor, checkpoint or snapshot file is damaged or of another scan"""
+    pass
+
+
+class QueryError(MFTError):
+    """a query of the query daemon is malformed or names an unknown volume"""
+    pass
+
+
+'''
+Statistics
+'''
+
+statsLock = threading.Lock()
+statistics = {}
+readEnd = None                  # end of the last read of openedFile; a read elsewhere needs a seek
+
+
+def reset_stats():
+    """
+    set all counters and timers to zero
+    :return: nothing
+    """
+    global statistics, readEnd
+
+    with statsLock:
+        statistics = {'reads': 0, 'bytes': 0, 'seeks': 0, 'records': 0, 'descriptors': 0, 'descriptorHits': 0,
+                      'links': 0, 'linkHits': 0, 'attributes': {}, 'timers': {}}
+        readEnd = None
+
+
+def get_stats():
+    """
+    counters and timers collected since reset_stats; collected only while STATS is set
+    :return: dictonary {'reads', 'bytes', 'seeks', 'records', 'descriptors', 'descriptorHits', 'links',
+             'linkHits', 'attributes': {hex: count}, 'timers': {name: [calls, seconds]}}
+    """
+
+    with statsLock:
+        return json.loads(json.dumps(statistics))
+
+
+def countStat(_name, _value=1):
+    """
+    add _value to the counter _name
+    """
+
+    if STATS:
+        with statsLock:
+            statistics[_name] += _value
+
+
+def countRead(_position, _length, _lastend):
+    """
+    count one read of the image
+    :param _position: offset of the read
+    :param _length:   bytes read
+    :param _lastend:  end of the last read of the same file handle
+    :return: end of this read
+    """
+
+    if STATS:
+        with statsLock:
+            statistics['reads'] += 1
+            statistics['bytes'] += _length
+            if _position != _lastend:
+                statistics['seeks'] += 1
+
+    return _position + _length
+
+
+def countAttribute(_atthex):
+    """
+    count one attribute of type _atthex (e.g. 80000000)
+    """
+
+    if STATS:
+        with statsLock:
+            statistics['attributes'][_atthex] = statistics['attributes'].get(_atthex, 0) + 1
+
+
+def addTime(_name, _seconds):
+    """
+    add one call of _seconds to the timer _name
+    """
+
+    with statsLock:
+        _timer = statistics['timers'].setdefault(_name, [0, 0.0])
+        _timer[0] += 1
+        _timer[1] += _seconds
+
+
+def timed(_function):
+    """
+    decorator; time every call of _function while STATS is set
+    """
+
+    @functools.wraps(_function)
+    def _timed(*args, **kwargs):
+        if not STATS:
+            return _function(*args, **kwargs)
+        _start = time.time()
+        try:
+            return _function(*args, **kwargs)
+        finally:
+            addTime(_function.__name__, time.time() - _start)
+
+    return _timed
+
+
+@contextlib.contextmanager
+def timer(_name):
+    """
+    time the block of a with statement as _name while STATS is set (e.g. output rendering)
+    """
+
+    if not STATS:
+        yield
+        return
+
+    _start = time.time()
+    try:
+        yield
+    finally:
+        addTime(_name, time.time() - _start)
+
+
+def formatStats(_stats):
+    """
+    report of get_stats
+    :param _stats: dictonary from get_stats
+    :return: list of lines
+    """
+
+    _names = dict((attribute['hex'], attribute['name']) for attribute in ATTRIBUTES)
+
+    _lines = ["Reads: {}\tBytes read: {}\tSeeks: {}\tRecords parsed: {}".format(
+        _stats['reads'], _stats['bytes'], _stats['seeks'], _stats['records'])]
+
+    if _stats['descriptors'] or _stats['descriptorHits']:
+        _lines.append("Security descriptors parsed: {}\tCache hits: {}".format(_stats['descriptors'],
+                                                                             _stats['descriptorHits']))
+
+    if _stats['links'] or _stats['linkHits']:
+        _lines.append("Links resolved: {}\tCache hits: {}".format(_stats['links'], _stats['linkHits']))
+
+    _lines.append("attribute|count")
+    for _atthex in sorted(_stats['attributes']):
+        _lines.append("{}|{}".format(_names.get(_atthex, _atthex), _stats['attributes'][_atthex]))
+
+    _lines.append("stage|calls|seconds")
+    for (_name, (_calls, _seconds)) in sorted(_stats['timers'].items(), key=lambda item: -item[1][1]):
+        _lines.append("{}|{}|{:.6f}".format(_name, _calls, _seconds))
+
+    return _lines
+
+
+reset_stats()
+
+
+'''
+Trace
+'''
+
+traceFile = None
+traceLock = threading.Lock()
+
+
+def startTrace(_tracefile):
+    """
+    log every read of the image with offset, length and latency to _tracefile until stopTrace
+    :param _tracefile: file name
+    :return: nothing
+    """
+    global traceFile
+
+    stopTrace()
+
+    try:
+        _trace = open(_tracefile, "wb")
+        _trace.write(TRACE_MAGIC)
+    except IOError as syserr:
+        errnote = "Can't write trace file '{}' ({})".format(_tracefile, syserr)
+        raise StateFileError(errnote)
+
+    traceFile = _trace
+
+
+def stopTrace():
+    """
+    close the trace file of startTrace
+    :return: nothing
+    """
+    global traceFile
+
+    with traceLock:
+        if traceFile is not None:
+            traceFile.close()
+            traceFile = None
+
+
+def traceRead(_position, _length, _seconds):
+    """
+    append one read to the trace file
+    """
+
+    with traceLock:
+        if traceFile is not None:
+            traceFile.write(TRACE_ENTRY.pack(_position, _length, min(int(_seconds * 1000000), 0xffffffff)))
+
+
+def iterTrace(_tracefile):
+    """
+    read a trace file of startTrace
+    :param _tracefile: file name
+    :return: generator of (offset, length, latency in microseconds)
+    """
+
+    try:
+        _trace = open(_tracefile, "rb")
+    except IOError as syserr:
+        errnote = "Can't read trace file '{}' ({})".format(_tracefile, syserr)
+        raise StateFileError(errnote)
+
+    with _trace:
+        if _trace.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            errnote = "'{}' is no trace file.".format(_tracefile)
+            raise StateFileError(errnote)
+
+        while True:
+            _entries = _trace.read(TRACE_ENTRY.size * 4096)
+            i = 0
+            while i + TRACE_ENTRY.size <= len(_entries):
+                yield TRACE_ENTRY.unpack_from(_entries, i)
+                i += TRACE_ENTRY.size
+            if len(_entries) < TRACE_ENTRY.size * 4096:
+                return
+
+
+class BlockIntervals(object):
+    """
+    blocks read so far as sorted, merged half-open intervals; a mostly sequential trace keeps only a few
+    intervals instead of one entry per block
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def add(self, _first, _end):
+        """
+        add the blocks _first to _end - 1
+        :return: number of these blocks which were added before
+        """
+
+        # the intervals touching [_first, _end) are merged with it
+        i = bisect.bisect_left(self.ends, _first)
+        j = bisect.bisect_right(self.starts, _end)
+        _covered = 0
+        for k in xrange(i, j):
+            _covered += max(0, min(self.ends[k], _end) - max(self.starts[k], _first))
+
+        if i < j:
+            _first = min(_first, self.starts[i])
+            _end = max(_end, self.ends[j - 1])
+        self.starts[i:j] = [_first]
+        self.ends[i:j] = [_end]
+
+        return _covered
+
+
+def summarizeTrace(_tracefile):
+    """
+    access pattern of a trace file: a read is sequential if it starts where the read before ended;
+    re-read are the TRACEBLOCK blocks which were read before
+    :param _tracefile: file name
+    :return: dictonary {'reads', 'bytes', 'sequential', 'blocks', 'rereads', 'latency', 'maxlatency',
+             'backward', 'seeks': list of counts per SEEKBUCKETS limit and one for larger distances}
+    """
+
+    _summary = {'reads': 0, 'bytes': 0, 'sequential': 0, 'blocks': 0, 'rereads': 0, 'latency': 0,
+                'maxlatency': 0, 'backward': 0, 'seeks': [0] * (len(SEEKBUCKETS) + 1)}
+    _seen = BlockIntervals()
+    _lastend = None
+
+    for (_offset, _length, _latency) in iterTrace(_tracefile):
+
+        _summary['reads'] += 1
+        _summary['bytes'] += _length
+        _summary['latency'] += _latency
+        _summary['maxlatency'] = max(_summary['maxlatency'], _latency)
+
+        if _offset == _lastend:
+            _summary['sequential'] += 1
+        elif _lastend is not None:
+            _distance = abs(_offset - _lastend)
+            if _offset < _lastend:
+                _summary['backward'] += 1
+            _summary['seeks'][bisect.bisect_left(SEEKBUCKETS, _distance)] += 1
+
+        _first = _offset // TRACEBLOCK
+        _end = (_offset + max(_length, 1) - 1) // TRACEBLOCK + 1
+        _summary['blocks'] += _end - _first
+        _summary['rereads'] += _seen.add(_first, _end)
+
+        _lastend = _offset + _length
+
+    return _summary
+
+
+def formatTraceSummary(_summary):
+    """
+    report of summarizeTrace
+    :param _summary: dictonary from summarizeTrace
+    :return: list of lines
+    """
+
+    _reads = max(_summary['reads'], 1)
+    _lines = ["Reads: {}\tBytes read: {}\tAverage latency: {:.0f} us\tMax. latency: {} us".format(
+        _summary['reads'], _summary['bytes'], _summary['latency'] / float(_reads), _summary['maxlatency']),
+        "Sequential: {:.1%}\tRandom: {:.1%}\tBackward seeks: {}\tRe-read: {:.1%} of {} blocks of {} bytes".format(
+            _summary['sequential'] / float(_reads), (_summary['reads'] - _summary['sequential']) / float(_reads),
+            _summary['backward'], _summary['rereads'] / float(max(_summary['blocks'], 1)), _summary['blocks'],
+            TRACEBLOCK),
+        "seek distance|count"]
+
+    _lower = 0
+    for (_limit, _count) in zip(SEEKBUCKETS + [None], _summary['seeks']):
+        if _limit is None:
+            _lines.append(">{}|{}".format(_lower, _count))
+        else:
+            _lines.append("{}-{}|{}".format(_lower + 1, _limit, _count))
+        _lower = _limit
+
+    return _lines
+
+
 '''
 Filehandling
 '''
 
+file_is_open = False
+openedFile = None
+readLock = threading.Lock()     # seek and read of openedFile have to be done together
+volumeFiles = threading.local() # 'file' and 'lock' of the volume a thread uses; see useVolume
+
 def openFile(_image):
     """
     Open file; check access and path;
@@ -366,15 +1090,127 @@ def openFile(_image):
 
     # try to open file; set global marker 'file_is_open' to true
     try:
-        openedFile = open(_image, "rb")
+        openedFile = openImage(_image)
         file_is_open = True
     except IOError as syserr:
         errnote = "({})".format(syserr)
-        sys.exit(errnote)
+        raise ImageError(errnote)
 
     return True
 
 
+def currentFile():
+    """
+    file read by the parsing functions: the file of the volume of useVolume in this thread,
+    else the file of openFile
+    :return: (file object, lock of seek and read) or (None, None) if no file is open
+    """
+
+    _file = getattr(volumeFiles, 'file', None)
+    if _file is not None:
+        return _file, volumeFiles.lock
+
+    if file_is_open:
+        return openedFile, readLock
+
+    return None, None
+
+
+def openImage(_image):
+    """
+    open an image file, a device or all segments of a split raw image
+    :param _image: Imagefile, device or first segment of a split image (.001)
+    :return: file object
+    """
+
+    _segments = segmentFiles(_image)
+    if len(_segments) > 1:
+        return SegmentedImage(_segments)
+
+    return open(_image, "rb")
+
+
+def segmentFiles(_image):
+    """
+    find the segments of a split raw image; the numbering goes on from the extension of _image
+    (image.001, image.002, ...) as long as the next file exists
+    :param _image: Imagefile or first segment
+    :return: list of segment files; only _image if it is not split
+    """
+
+    _match = re.match(r"^(.*\.)(\d{3,})$", _image)
+    if not _match:
+        return [_image]
+
+    (_prefix, _number) = _match.groups()
+    _segments = [_image]
+    _next = int(_number) + 1
+
+    while os.path.isfile(_prefix + str(_next).zfill(len(_number))):
+        _segments.append(_prefix + str(_next).zfill(len(_number)))
+        _next += 1
+
+    return _segments
+
+
+class SegmentedImage(object):
+    """
+    read only file object over the segments of a split raw image; every read looks up its segment with
+    bisect in the sorted start offsets and reads directly from the segment file. Reads over the end of
+    a segment go on in the next one. Segments are opened on first use
+    """
+
+    def __init__(self, _segments):
+        self.name = _segments[0]
+        self.segments = _segments
+        self.starts = []
+        self.size = 0
+        for _segment in _segments:
+            self.starts.append(self.size)
+            self.size += os.path.getsize(_segment)
+        self.files = [None] * len(_segments)
+        self.position = 0
+
+    def seek(self, _offset, _whence=os.SEEK_SET):
+        if _whence == os.SEEK_CUR:
+            _offset += self.position
+        elif _whence == os.SEEK_END:
+            _offset += self.size
+        if _offset < 0:
+            raise IOError("Invalid argument")
+        self.position = _offset
+
+    def tell(self):
+        return self.position
+
+    def read(self, _length=-1):
+        if _length < 0:
+            _length = self.size - self.position
+
+        _parts = []
+        while _length > 0 and self.position < self.size:
+            i = bisect.bisect_right(self.starts, self.position) - 1
+            if self.files[i] is None:
+                self.files[i] = open(self.segments[i], "rb")
+            _end = self.starts[i + 1] if i + 1 < len(self.starts) else self.size
+            self.files[i].seek(self.position - self.starts[i])
+            _data = self.files[i].read(min(_length, _end - self.position))
+            if not _data:
+                break
+            _parts.append(_data)
+            self.position += len(_data)
+            _length -= len(_data)
+
+        # one segment, the usual case, is returned without copying
+        return _parts[0] if len(_parts) == 1 else "".join(_parts)
+
+    def close(self):
+        for _file in self.files:
+            if _file is not None:
+                _file.close()
+        self.files = [None] * len(self.segments)
+
+
 def closeFile():
     """closes the given file _image; return true if closed"""
 
@@ -385,11 +1221,12 @@ def closeFile():
     if file_is_open:
         # try to close file and unset file_is_open
         try:
+            closeReaders(openedFile)
             openedFile.close()
             file_is_open = False
         except IOError as syserr:
             errnote = "({})".format(syserr)
-            sys.exit(errnote)
+            raise ImageError(errnote)
 
     return True
 
@@ -401,10 +1238,8 @@ def readBinary(_position, _length):
     :param _length: length in bytes
     :return: read value
     """
-    global file_is_open
-
     # check if file is open
-    if file_is_open:
+    if currentFile()[0] is not None:
         # read length at position
         i = 0
         # create pointer for USN
@@ -424,20 +1259,42 @@ def readBinary(_position, _length):
 
             print "Warning! Data in USN Area. Verify Data by Hand!"
 
-        try:
-            openedFile.seek(_position)
-            value = openedFile.read(_length)
-        except IOError as syserr:
-            # feedback variable is set and file isn't open; which should never happen
-            closeFile()
-            errnote = "({})".format(syserr)
-            sys.exit(errnote)
-
-        return value
+        return readRaw(_position, _length)
     else:
-        # end script if file isn't open
         errnote = "No file to read is open."
-        sys.exit(errnote)
+        raise ImageError(errnote)
+
+
+def readRaw(_position, _length):
+    """read binary from file from _position with _length without checking the USN area;
+    used for large reads which are checked by applyFixup
+
+    :param _position: position in bytes
+    :param _length: length in bytes
+    :return: read value
+    """
+    global readEnd
+
+    (_file, _lock) = currentFile()
+    if _file is None:
+        errnote = "No file to read is open."
+        raise ImageError(errnote)
+
+    try:
+        with _lock:
+            # only the trace needs the latency
+            _start = time.time() if traceFile is not None else None
+            _file.seek(_position)
+            value = _file.read(_length)
+            readEnd = countRead(_position, len(value), readEnd)
+            if _start is not None:
+                traceRead(_position, len(value), time.time() - _start)
+    except IOError as syserr:
+        # bad sectors; the file stays open, so a scan can go on with the next record
+        errnote = "({}) reading {:} bytes at offset {:}".format(syserr, _length, _position)
+        raise RecordError(errnote)
+
+    return value
 
 
 def checkfile(_image):
@@ -466,8 +1323,8 @@ def checkfile(_image):
         if not isblockdevice(_image):
             _errnote = "({})".format("'" + _image + "' is not a valid file/device. Please specify the filename.")
             _file_is_ok = False
-    # path read access
-    elif not os.access(_image, os.R_OK):
+    # path read access; of all segments of a split image
+    elif not all(os.access(_segment, os.R_OK) for _segment in segmentFiles(_image)):
         _errnote = "({})".format("Permission denied. Please change the permission to read this file or device!")
         _file_is_ok = False
     # get devicesize
@@ -494,9 +1351,13 @@ def checkfile(_image):
 def getdevicesize(_image):
     """
     check devicesize
-    :param _image: raw image name or block device
+    :param _image: raw image name or block device; the size of a split image is the sum of its segments
     :return: devicesize
     """
+    _segments = segmentFiles(_image)
+    if len(_segments) > 1:
+        return sum(os.path.getsize(_segment) for _segment in _segments)
+
     f = os.open(_image, os.O_RDONLY)
     try:
         _size = os.lseek(f, 0, os.SEEK_END)
@@ -522,19 +1383,191 @@ def isblockdevice(_image):
 
 
 '''
-
-Parsing MFT
-
+Prefetch
 '''
 
+readerPools = {}                # ReaderPool of every opened image file, by file object
+poolLock = threading.Lock()
 
-def findMFT(_image, _partoffset):
+
+class ReaderPool(object):
     """
-    read vbr from given offset position, parse the first mft record, which gives the basicinfo to find the
-    requested MFT record
-    :param _image:      imagefilename; only raw images!
-    :param _offset:     start of ntfs partition
-    :return:            return the position of complete mft
+    reader threads of one opened image, each with its own long-lived file handle, taking reads from
+    one queue. Started on the first prefetched read and shut down when the image is closed, so scans
+    and queries share the threads and handles instead of opening the image again for every stream
+    """
+
+    def __init__(self, _image):
+        self.image = _image
+        self.tasks = Queue.Queue()
+        self.workers = []
+
+    def grow(self, _depth):
+        """start readers until _depth are running"""
+
+        while len(self.workers) < _depth:
+            _worker = threading.Thread(target=self.run)
+            _worker.daemon = True
+            _worker.start()
+            self.workers.append(_worker)
+
+    def run(self):
+        try:
+            _file = openImage(self.image)
+        except IOError as syserr:
+            _file = syserr
+        _end = None
+        while True:
+            _task = self.tasks.get()
+            if _task is None:
+                break
+            (_offset, _length, _slot) = _task
+            try:
+                if isinstance(_file, IOError):
+                    raise _file
+                _start = time.time() if traceFile is not None else None
+                _file.seek(_offset)
+                _data = _file.read(_length)
+                _end = countRead(_offset, len(_data), _end)
+                if _start is not None:
+                    traceRead(_offset, len(_data), time.time() - _start)
+                _slot.put(_data)
+            except IOError as syserr:
+                errnote = "({}) reading {:} bytes at offset {:}".format(syserr, _length, _offset)
+                _slot.put(RecordError(errnote))
+        if not isinstance(_file, IOError):
+            _file.close()
+
+    def read(self, _offset, _length):
+        """
+        queue a read
+        :return: queue getting the data or a RecordError
+        """
+
+        _slot = Queue.Queue(1)
+        self.tasks.put((_offset, _length, _slot))
+
+        return _slot
+
+    def close(self):
+        """stop the readers after the queued reads and close their handles"""
+
+        for _worker in self.workers:
+            self.tasks.put(None)
+        for _worker in self.workers:
+            _worker.join()
+        self.workers = []
+
+
+def readerPool(_file, _depth):
+    """
+    the reader pool of an opened image, started on first use
+    :param _file:  opened image file
+    :param _depth: readers needed
+    :return: ReaderPool
+    """
+
+    with poolLock:
+        _pool = readerPools.get(_file)
+        if _pool is None:
+            _pool = readerPools[_file] = ReaderPool(_file.name)
+        _pool.grow(_depth)
+
+    return _pool
+
+
+def closeReaders(_file):
+    """
+    shut down the reader pool of an image file, if there is one
+    :return: nothing
+    """
+
+    with poolLock:
+        _pool = readerPools.pop(_file, None)
+
+    if _pool is not None:
+        _pool.close()
+
+
+def prefetchReads(_requests, _depth=None):
+    """
+    read a sequence of ranges with up to _depth reads in flight on the reader pool of the opened image;
+    the data is returned in order of _requests as soon as it has arrived. Hides the latency of
+    network storage while the caller parses the data before
+    :param _requests: iterable of (absolute offset, length); offset None gives None without reading
+    :param _depth:    reads in flight; default PREFETCHDEPTH; 0 or 1 reads synchronously with readRaw
+    :return: generator of data
+    """
+
+    if _depth is None:
+        _depth = PREFETCHDEPTH
+
+    if _depth < 2:
+        for (_offset, _length) in _requests:
+            yield readRaw(_offset, _length) if _offset is not None else None
+        return
+
+    _file = currentFile()[0]
+    if _file is None:
+        errnote = "No file to read is open."
+        raise ImageError(errnote)
+
+    _pool = readerPool(_file, _depth)
+
+    _inflight = collections.deque()
+    _requests = iter(_requests)
+
+    # if the caller stops early, reads still queued are done and thrown away
+    while True:
+
+        # keep _depth reads in flight
+        while len(_inflight) < _depth:
+            try:
+                (_offset, _length) = next(_requests)
+            except StopIteration:
+                break
+            if _offset is None:
+                _slot = Queue.Queue(1)
+                _slot.put(None)
+            else:
+                _slot = _pool.read(_offset, _length)
+            _inflight.append(_slot)
+
+        if not _inflight:
+            return
+
+        _data = _inflight.popleft().get()
+        if isinstance(_data, RecordError):
+            raise _data
+        yield _data
+
+
+def chunkRanges(_offset, _length, _chunksize):
+    """
+    split a range into reads of _chunksize
+    :return: generator of (absolute offset, length)
+    """
+
+    _pos = 0
+    while _pos < _length:
+        yield _offset + _pos, min(_chunksize, _length - _pos)
+        _pos += _chunksize
+
+
+'''
+
+Parsing MFT
+
+'''
+
+
+def findMFT(_image, _partoffset):
+    """
+    read vbr from given offset position, parse the first mft record, which gives the basicinfo to find the
+    requested MFT record
+    :param _image:      imagefilename; only raw images!
+    :param _offset:     start of ntfs partition
+    :return:            return the position of complete mft
     """
 
     openFile(_image)
@@ -543,7 +1576,7 @@ def findMFT(_image, _partoffset):
     if _partitionFS != "NTFS":
         closeFile()
         _errnote = "Partition is not a NTFS partition. " + _partitionFS + " partition found."
-        sys.exit( _errnote)
+        raise VolumeError(_errnote)
 
     _vbrdata = readMFTData(_partoffset, VBR_DATA)
 
@@ -554,7 +1587,7 @@ def findMFT(_image, _partoffset):
     if not _mftzero['sig'] == "FILE" or not _mftzero['mftRecNr'] == 0 :
         closeFile()
         err_note = "No expected data at record 0. Cancel this Operation"
-        sys.exit(err_note)
+        raise VolumeError(err_note)
 
     _nextAttPos =   _mftPosition + _mftzero['attStart']
     _attributetoread = findAttr(_nextAttPos)
@@ -594,8 +1627,8 @@ def findAttr(_attPos):
             return key
 
 
-    err_note = "Error finding attribute."
-    sys.exit(err_note)
+    err_note = "Error finding attribute at offset {:}.".format(_attPos)
+    raise RecordError(err_note)
 
 
 def findMFTRecord(_partoffset, _clustersize, _recordnr, _datarunMFT):
@@ -640,8 +1673,8 @@ def findMFTRecord(_partoffset, _clustersize, _recordnr, _datarunMFT):
 
             while _startrecord <= _endrecord:
                 _chunkmid = _startrecord + (_endrecord - _startrecord) / 2
-                _offsetmid = ((_startoffset + (_endoffset - _startoffset) / 2) -\
-                              ((_startoffset + (_endoffset - _startoffset) / 2) % 1024))
+                # aligned to records relative to the extent; partitions don't have to start at 1024 bytes
+                _offsetmid = _startoffset + ((_endoffset - _startoffset) / 2048) * 1024
 
                 if _chunkmid == _recordnr:
                     _recData = readMFTData(_offsetmid, MFTRec_DATA)
@@ -649,11 +1682,11 @@ def findMFTRecord(_partoffset, _clustersize, _recordnr, _datarunMFT):
                     if _recordnr != _recData["mftRecNr"]:
                         err_note = "Problems with MFTRecord!\n Searched: {:}\tRead: {:}"\
                             .format(_recordnr, _recData["mftRecNr"])
-                        sys.exit(err_note)
+                        raise RecordError(err_note)
 
                     if _recData["sig"] not in SIGNATURE:
                         err_note = "Problems with MFTRecord! Unknown Header!"
-                        sys.exit(err_note)
+                        raise RecordError(err_note)
 
                     if DEBUG:
                         print "Found Record: {:} Offset: {:}".format(_recData["mftRecNr"], _offsetmid)
@@ -671,7 +1704,7 @@ def findMFTRecord(_partoffset, _clustersize, _recordnr, _datarunMFT):
         i += 1
 
     err_note = "Record " + str(_recordnr) + " not found in MFT.\nHighest recordnumber to choose: " + str(_endrecord)
-    sys.exit(err_note)
+    raise RecordNotFound(err_note)
 
 
 def findMFTRecordold(_partoffset, _clustersize, _recordnr, _datarunMFT):   #very slow; should new constructed; if time ;)
@@ -717,7 +1750,7 @@ def findMFTRecordold(_partoffset, _clustersize, _recordnr, _datarunMFT):   #very
         i += 1
 
     err_note = "Record "+str(_recordnr)+" not found in MFT"
-    sys.exit(err_note)
+    raise RecordNotFound(err_note)
 
     return
 
@@ -783,12 +1816,13 @@ def readMFTRecord(_startoffset):
     OUTPUT = {}
 
     _record = readMFTData(_startoffset, MFTRec_DATA)
+    countStat('records')
 
     _nextAttPos =   _startoffset+_record['attStart']
     _attributetoread = findAttr(_nextAttPos)
     if _attributetoread['var']=="nothing":
         err_note="Empty MFT Record. Nothing to parse"
-        sys.exit(err_note)
+        raise RecordError(err_note)
 
     attributeList = []
     i = 0
@@ -796,6 +1830,7 @@ def readMFTRecord(_startoffset):
 
 
         attvar = globals()[_attributetoread["var"]]
+        countAttribute(_attributetoread['hex'])
 
         attributes = readAttData(_nextAttPos, attvar)
 
@@ -864,6 +1899,10 @@ def readAttData(_startoffset, _datavar):
 
         i += 1
 
+    # attribute name (e.g. name of an alternate data stream); position given by the header
+    _attributeHeaderData['attName'] = readBinary(_startoffset + _attributeHeaderData['nameOff'],
+                                                 2 * _attributeHeaderData['nameLen'])
+
 
     #read data, using the templates
     _attributeData = {}
@@ -919,12 +1958,18 @@ def readAttData(_startoffset, _datavar):
 
     _attributeData.update(_attributeHeaderData)
 
+    # resident data of a named stream starts behind the name
+    if binascii.hexlify(_attributeHeaderData['attID']) == "80000000" and _attributeHeaderData['resident'] == 0 \
+            and _attributeData['res_off'] != 24:
+        _attributeData['res_data'] = readBinary(_startoffset + _attributeData['res_off'], _attributeData['res_size'])
+
     if DEBUG:
         print "Attributedata Out: ", _attributeData
 
     return _attributeData
 
 
+@timed
 def readRunlist(_startoffset, _endOfAttribute):
     """
     :param _startoffset:    start of runlist
@@ -993,44 +2038,39 @@ def getPartitionFS(_startoffset):
     :return: Name of found filesystem or unknown
     """
 
-    i = 0
-    _Filesystem = ""
-    # loop for every entry in VBR Header list
+    # all signatures are compared in one read
+    return classifyFS(readRaw(_startoffset, PARTITIONPROBE))
 
-    while i != len(VBRHEADER):
 
-        _isheader = False
-        _readpos = 0
-        # declare actual variables on which position, which header could found
-        _shift = VBRHEADER[i]["shift"]
-        _header = VBRHEADER[i]["header"]
-        _pos = VBRHEADER[i]["pos"]
-        _length = len(str(_header))
+def classifyFS(_buffer):
+    """ compare the signatures of VBRHEADER with the start of a partition
+    :param _buffer: first PARTITIONPROBE bytes of the partition
+    :return: Name of found filesystem or unknown
+    """
+
+    # loop for every entry in VBR Header list
+    for _entry in VBRHEADER:
+
         #calculate position
-        _readpos = _startoffset + _pos + _shift
-        #read position
-        _partitionInfo = readBinary(_readpos, _length)
+        _readpos = _entry["pos"] + _entry["shift"]
+        _length = len(_entry["header"]) / 2
+
+        # partition too small for this signature
+        if _readpos + _length > len(_buffer):
+            continue
 
-        structstring = "<" + str(_length / 2) + "s"
         #check if header is found; then break and return the filesystem
-        try:
-            _isheader = binascii.hexlify(struct.unpack_from(structstring, _partitionInfo)[0]) == _header
-        except:
-            _Filesystem = "Unknown"
-            return (_Filesystem)
-        if _isheader:
-            _Filesystem = VBRHEADER[i]["name"]
-            return (_Filesystem)
-        #else, if the actual loop filesystem not found, use next entry to compare
-        i += 1
+        if binascii.hexlify(_buffer[_readpos:_readpos + _length]) == _entry["header"]:
+            return _entry["name"]
 
-    return _Filesystem
+    return "Unknown"
 
 
 '''
 Attributeparser
 '''
 
+@timed
 def LISTattributes(_attributes):
     '''
     generate the attribute list
@@ -1045,6 +2085,7 @@ def LISTattributes(_attributes):
 
     return output
 
+@timed
 def parseAttHeader(_attributedata):
 
     """
@@ -1064,8 +2105,11 @@ def parseAttHeader(_attributedata):
     attribute["size"]       = _attributedata["attLen"]
 
     try:
-        attribute["name"]   = unicode(_attributedata["StreamName"], encoding="utf-16le").encode("ascii", "ignore")
+        attribute["name"]   = unicode(_attributedata["attName"], encoding="utf-16le").encode("ascii", "ignore")
     except:
+        attribute["name"]   =   ""
+
+    if attribute["name"] == "":
         attribute["name"]   =   "n/a"
 
     attribute['order']      =   _attributedata["attNr"]
@@ -1073,6 +2117,7 @@ def parseAttHeader(_attributedata):
     return attribute
 
 
+@timed
 def parseSID(_attributedata, _recorddata, _attoffset):
     """
     build the SID template and return the attribute header data
@@ -1108,12 +2153,19 @@ def parseSID(_attributedata, _recorddata, _attoffset):
     #template assemble
     SIDTemp = SIDHead + SIDTitle + SIDTime
 
+    # the security id follows the 48 bytes of NTFS 1.x
+    if _attributedata['attLen'] >= 24 + 56:
+        attribute['securityId'] = _attributedata['securityId']
+        SIDTemp += SECURITYID.substitute(securityid=_attributedata['securityId'])
+
     return attribute, SIDTemp
 
 
+@timed
 def parseAttList(_attributedata, _recorddata, _attoffset):
     """
-    build the AttributeList template and return the attribute header data
+    build the AttributeList template with the entries of a resident list and return the attribute header data;
+    the entries are added as 'entries'
     :param _attributedata:
     :param _recorddata:
     :return:
@@ -1121,9 +2173,28 @@ def parseAttList(_attributedata, _recorddata, _attoffset):
 
     attribute   = parseAttHeader(_attributedata)
 
-    return attribute, ""
+    AttListTitle = ATTRIBUTENAME.substitute(atttype=attribute['type'])
+
+    # a non resident list needs the runs of the partition; see readAttributeList
+    if _attributedata['resident'] != 0:
+        attribute['entries'] = []
+        return attribute, AttListTitle + ADDTEXT.substitute(text="Entries:", value="non resident\n")
+
+    (_size, _contentoffset) = struct.unpack("<IH", readBinary(_attoffset + 16, 6))
+    attribute['entries'] = attributeListEntries(readBinary(_attoffset + _contentoffset, _size))
 
+    AttListTemp = AttListTitle
+    for _entry in attribute['entries']:
+        _type = [key['name'] for key in ATTRIBUTES if key['hex'] == _entry['attHex']]
+        AttListTemp += ATTLISTENTRY.substitute(atttype=_type[0] if _type else _entry['attHex'],
+                                               attname=_entry['name'].encode("ascii", "ignore") or "n/a",
+                                               vcn=_entry['VCNstart'], record=_entry['record'],
+                                               sequence=_entry['sequence'])
 
+    return attribute, AttListTemp
+
+
+@timed
 def parseFilename(_attributedata, _recorddata, _attoffset):
     """
      build the filename attribute template and return the attribute header data
@@ -1163,6 +2234,7 @@ def parseFilename(_attributedata, _recorddata, _attoffset):
     return attribute, FNTemp
 
 
+@timed
 def parseObjID(_attributedata, _recorddata, _attoffset):
     """
     build the ObjectID template and return the attribute header data
@@ -1184,6 +2256,7 @@ def parseObjID(_attributedata, _recorddata, _attoffset):
     return attribute, ObjIDTemp
 
 
+@timed
 def parseSecDes(_attributedata, _recorddata, _attoffset):
     """
     build the security descriptor attribute template and return the attribute header data
@@ -1193,9 +2266,26 @@ def parseSecDes(_attributedata, _recorddata, _attoffset):
     """
     attribute   = parseAttHeader(_attributedata)
 
-    return attribute, ""
+    SecDesTitle = ATTRIBUTENAME.substitute(atttype=attribute["type"])
+
+    if _attributedata['resident'] != 0:
+        return attribute, SecDesTitle + ADDTEXT.substitute(text="Descriptor:", value="Non Resident; not read\n")
+
+    # like $DATA the content may be moved by an attribute name
+    _content = _attributedata['descriptor'][_attributedata['res_off'] - 24:]\
+        [:_attributedata['res_size']]
+
+    try:
+        descriptor = parseSecurityDescriptor(_content)
+    except (struct.error, ValueError) as err:
+        return attribute, SecDesTitle + ADDTEXT.substitute(text="Descriptor:", value="Damaged ({})\n".format(err))
+
+    attribute['descriptor'] = descriptor
 
+    return attribute, SecDesTitle + formatSecurity(descriptor)
 
+
+@timed
 def parseVolName(_attributedata, _recorddata, _attoffset):
     """
     build the volume name attribute template and return the attribute header data
@@ -1208,6 +2298,7 @@ def parseVolName(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseVolInfo(_attributedata, _recorddata, _attoffset):
     """
     build the volume info attribute template and return the attribute header data
@@ -1220,6 +2311,7 @@ def parseVolInfo(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseDATA(_attributedata, _recorddata, _attoffset):
     """
     build the data attribute template and return the attribute header data
@@ -1229,6 +2321,11 @@ def parseDATA(_attributedata, _recorddata, _attoffset):
     """
     attribute   = parseAttHeader(_attributedata)
 
+    # named streams (alternate data streams) are shown as $DATA:name
+    streamlabel = "$DATA"
+    if attribute["name"] != "n/a":
+        streamlabel += ":" + attribute["name"]
+
     if _attributedata['resident']==0:
 
         # DATATEMP=ADDTEXT.substitute(text="\nResident Data:", value=_attributedata['res_data'])
@@ -1240,21 +2337,22 @@ def parseDATA(_attributedata, _recorddata, _attoffset):
 
         if clean_resident != "":
 
-            DATATEMP = ADDTEXT.substitute(text="Resident Data:", value="(adjusted to printable characters)\n")
+            DATATEMP = ADDTEXT.substitute(text="Resident Data " + streamlabel + ":",
+                                          value="(adjusted to printable characters)\n")
             DATATEMP += clean_resident
 
         else:
-            DATATEMP = ADDTEXT.substitute(text="Resident Data:", value="No Content\n")
+            DATATEMP = ADDTEXT.substitute(text="Resident Data " + streamlabel + ":", value="No Content\n")
 
 
     else:
-        _startrunlist  = _attoffset+64
+        _startrunlist  = _attoffset+_attributedata['runOff']
         _endrunlist = _attoffset+_attributedata['attLen']
 
         _datarun = readRunlist(_startrunlist,_endrunlist)
 
 
-        runlistheader = "\t\t\t\t$DATA Runlist:\n" \
+        runlistheader = "\t\t\t\t" + streamlabel + " Runlist:\n" \
                         "\t\t\t\t(Cluster rel. to partitionstart)\n" \
                         "\t\t\t\tChunk\tFirst\t\tLast\n"
 
@@ -1280,6 +2378,7 @@ def parseDATA(_attributedata, _recorddata, _attoffset):
     return attribute, DATATEMP
 
 
+@timed
 def parseIndRoot(_attributedata, _recorddata, _attoffset):
     """
     build the index root attribute template and return the attribute header data
@@ -1292,6 +2391,7 @@ def parseIndRoot(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseIndAll(_attributedata, _recorddata, _attoffset):
     """
     build the index allocate attribute template and return the attribute header data
@@ -1333,6 +2433,7 @@ def parseIndAll(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseBitmap(_attributedata, _recorddata, _attoffset):
     """
     build the bitmap attribute template and return the attribute header data
@@ -1345,6 +2446,7 @@ def parseBitmap(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseSymLink(_attributedata, _recorddata, _attoffset):
     """
     build the symlink/reparse point attribute template and return the attribute header data
@@ -1359,10 +2461,26 @@ def parseSymLink(_attributedata, _recorddata, _attoffset):
     except:
         reparsetype = "Unknown"
 
-    REPARSETemp=ADDTEXT.safe_substitute(text="Reparse Point Type: ", value=reparsetype)
+    try:
+        names = reparseNames(_attributedata['reparseData']) if _attributedata['resident'] == 0 else None
+    except (struct.error, ValueError):
+        names = None
+
+    if names is not None:
+        reparsetype = names['type']
+        attribute['reparse'] = names
+
+    REPARSETemp=ADDTEXT.safe_substitute(text="Reparse Point Type: ", value=reparsetype + "\n")
+
+    if names is not None:
+        REPARSETemp += REPARSENAMES.substitute(substitute=names['substitute'].encode("utf-8"),
+                                               printname=names['print'].encode("utf-8"),
+                                               relative="yes" if names['relative'] else "no")
+
     return attribute, REPARSETemp
 
 
+@timed
 def parseEAInfo(_attributedata, _recorddata, _attoffset):
     """
     build the EA info attribute template and return the attribute header data
@@ -1376,6 +2494,7 @@ def parseEAInfo(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def parseEA(_attributedata, _recorddata, _attoffset):
     """
     build the EA attribute template and return the attribute header data
@@ -1388,6 +2507,7 @@ def parseEA(_attributedata, _recorddata, _attoffset):
     return attribute, ""
 
 
+@timed
 def notparsed(_attributedata, _recorddata, _attoffset):
     """
     placeholder for attributes which are not parsed yet; returns only the header template
@@ -1402,46 +2522,4105 @@ def notparsed(_attributedata, _recorddata, _attoffset):
 
 
 '''
-Helper
+Partitions
 '''
 
-def LE(_string, _length=0, _signed=False):
-    """turns pairs of characters from big to little endian
-    :param _string: string to turn
-    :param _length: length of expected string; rest filled with 0 or f
-    :param _signed: signed or unsigned
-    :return: turned string"""
+def readPartitionTable(_sectorsize=SECTORSIZE):
+    """
+    read the partitions of the opened image from MBR, the EBR chain of extended partitions and GPT
+    :param _sectorsize: bytes per sector of the disk
+    :return: list of {'number', 'scheme', 'type', 'offset', 'length', 'name'}; offset and length in bytes.
+             An image without partition table gives one partition at offset 0
+    """
+
+    _mbr = readRaw(0, _sectorsize)
+    _partitions = []
+
+    if binascii.hexlify(_mbr[510:512]) != MBRSIGNATURE:
+        return [{'number': 1, 'scheme': "None", 'type': "", 'offset': 0, 'length': imageSize(), 'name': ""}]
+    # a boot sector has the signature too; image of a single partition
+    if classifyFS(_mbr) != "Unknown":
+        return [{'number': 1, 'scheme': "None", 'type': "", 'offset': 0, 'length': imageSize(), 'name': ""}]
+
+    _entries = [unpackData(_mbr, MBRTABLE + 16 * i, MBRPART_DATA) for i in range(4)]
+
+    if any(_entry['type'] == MBR_GPT for _entry in _entries):
+        return readGPT(_sectorsize)
+
+    for _entry in _entries:
+
+        if _entry['type'] == 0 or _entry['sectors'] == 0:
+            continue
+
+        if _entry['type'] in MBR_EXTENDED:
+            _partitions.extend(readEBR(_entry['lbaStart'], _sectorsize, len(_partitions) + 1))
+            continue
+
+        _partitions.append({'number': len(_partitions) + 1, 'scheme': "MBR",
+                            'type': MBR_TYPE.get(_entry['type'], "0x{:02x}".format(_entry['type'])),
+                            'offset': _entry['lbaStart'] * _sectorsize,
+                            'length': _entry['sectors'] * _sectorsize, 'name': ""})
+
+    return _partitions
+
+
+def readEBR(_extendedstart, _sectorsize, _number):
+    """
+    follow the chain of EBRs of an extended partition
+    :param _extendedstart: first sector of the extended partition
+    :param _sectorsize:    bytes per sector
+    :param _number:        number of the first logical partition
+    :return: list of partitions like readPartitionTable
+    """
+
+    _partitions = []
+    _ebr = _extendedstart
+    _seen = set()
+
+    # a damaged chain could point back
+    while _ebr not in _seen:
+
+        _seen.add(_ebr)
+        _sector = readRaw(_ebr * _sectorsize, _sectorsize)
+        if binascii.hexlify(_sector[510:512]) != MBRSIGNATURE:
+            break
+
+        _logical = unpackData(_sector, MBRTABLE, MBRPART_DATA)
+        _next = unpackData(_sector, MBRTABLE + 16, MBRPART_DATA)
+
+        if _logical['type'] != 0 and _logical['sectors'] != 0:
+            # relative to this EBR
+            _partitions.append({'number': _number + len(_partitions), 'scheme': "EBR",
+                                'type': MBR_TYPE.get(_logical['type'], "0x{:02x}".format(_logical['type'])),
+                                'offset': (_ebr + _logical['lbaStart']) * _sectorsize,
+                                'length': _logical['sectors'] * _sectorsize, 'name': ""})
+
+        if _next['type'] not in MBR_EXTENDED or _next['lbaStart'] == 0:
+            break
+
+        # relative to the start of the extended partition
+        _ebr = _extendedstart + _next['lbaStart']
+
+    return _partitions
+
+
+def readGPT(_sectorsize):
+    """
+    read the partition entries of the GPT; the header is in sector 1
+    :param _sectorsize: bytes per sector
+    :return: list of partitions like readPartitionTable
+    """
+
+    _header = unpackData(readRaw(_sectorsize, 92), 0, GPTHEADER_DATA)
+    if _header['sig'] != "EFI PART":
+        err_note = "Protective MBR without GPT header."
+        raise VolumeError(err_note)
+
+    _entries = readRaw(_header['entriesLba'] * _sectorsize, _header['entries'] * _header['entrySize'])
+    _partitions = []
 
-    _newstring = ""
     i = 0
+    while (i + 1) * _header['entrySize'] <= len(_entries):
 
-    if len(_string) % 2 != 0:
-        _string = "0" + _string
+        _entry = unpackData(_entries, i * _header['entrySize'], GPTPART_DATA)
+        i += 1
 
-    while i < len(_string):
-        _newstring = _newstring + _string[-(i + 2)] + _string[-(i + 1)]
-        i += 2
+        # unused entry
+        if _entry['typeGUID'] == "\0" * 16:
+            continue
 
-    _fillin = "0"
+        _type = str(uuid.UUID(bytes_le=_entry['typeGUID'])).upper()
+        _partitions.append({'number': i, 'scheme': "GPT", 'type': GPT_TYPE.get(_type, _type),
+                            'offset': _entry['firstLba'] * _sectorsize,
+                            'length': (_entry['lastLba'] - _entry['firstLba'] + 1) * _sectorsize,
+                            'name': _entry['partName'].decode("utf-16le", "replace").split(u"\0")[0]})
 
-    if _signed == True and re.match(r'[8-9a-fA-F]', _newstring[0]):
-        _fillin = "F"
+    return _partitions
 
-    if _length != 0:
-        while len(_newstring) % _length != 0:
-            _newstring = _fillin + _newstring
 
-    return _newstring
+def listPartitions(_image, _sectorsize=SECTORSIZE):
+    """
+    read the partition table of an image and find the filesystem of every partition
+    :param _image:      raw image or device
+    :param _sectorsize: bytes per sector
+    :return: list of partitions like readPartitionTable with 'fs' added
+    """
 
+    openFile(_image)
 
-def mfttime(_miliseconds):
-    '''
-    Convert time in hex to human readable date and time for output
-    :param _hextime:
-    :return: mftdatetime
-    '''
-    _us = int(_miliseconds) / 10.
-    _mftdatetime = datetime(1601,1,1) + timedelta(microseconds=_us)
+    _partitions = readPartitionTable(_sectorsize)
+    for _partition in _partitions:
+        _partition['fs'] = getPartitionFS(_partition['offset'])
+
+    return _partitions
+
+
+'''
+Full MFT scan
+'''
+
+def mftExtents(_partoffset, _clustersize, _datarunMFT):
+    """
+    turn the relative MFT runlist from readRunlist into absolute byte extents
+    :param _partoffset: start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT: MFT Positions
+    :return: list of (startoffset, length) in bytes
+    """
+
+    _extents = []
+    _lastoffset = _partoffset
+
+    for _run in _datarunMFT:
+        _startoffset = (_run['start'] * _clustersize) + _lastoffset
+        _extents.append((_startoffset, _run['length'] * _clustersize))
+        _lastoffset = _startoffset
+
+    return _extents
+
+
+def extentOffset(_extents, _recordnr):
+    """
+    absolute offset of a record, calculated from the MFT extents without reading
+    :param _extents:  list from mftExtents
+    :param _recordnr: record number
+    :return: absolute offset
+    """
+
+    if _recordnr < 0:
+        err_note = "Record {} not found in MFT. Record numbers start at 0.".format(_recordnr)
+        raise RecordNotFound(err_note)
+
+    _first = 0
+    for (_startoffset, _length) in _extents:
+        _count = _length // RECORDSIZE
+        if _recordnr < _first + _count:
+            return _startoffset + (_recordnr - _first) * RECORDSIZE
+        _first += _count
+
+    err_note = "Record {} not found in MFT.\nHighest recordnumber to choose: {}".format(_recordnr, _first - 1)
+    raise RecordNotFound(err_note)
+
+
+def iterMFTRecords(_partoffset, _clustersize, _datarunMFT, _chunksize=SCANCHUNK, _startrecord=0):
+    """
+    walk the complete MFT in large sequential reads
+    :param _partoffset: start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT: MFT Positions
+    :param _chunksize: bytes to read at once; multiple of RECORDSIZE
+    :param _startrecord: first record to return; the records before are not read
+    :return: generator of (recordnumber, absolute offset, raw record)
+    """
+
+    def _chunks():
+        _recordnr = 0
+        for (_startoffset, _length) in mftExtents(_partoffset, _clustersize, _datarunMFT):
+            _pos = 0
+            # resumed scan; skip the records before _startrecord
+            if _recordnr < _startrecord:
+                _skip = min(_startrecord - _recordnr, _length // RECORDSIZE)
+                _recordnr += _skip
+                _pos = _skip * RECORDSIZE
+            for (_offset, _readlength) in chunkRanges(_startoffset + _pos, _length - _pos, _chunksize):
+                _requests.append((_recordnr, _offset, _readlength))
+                yield _offset, _readlength
+                _recordnr += _readlength // RECORDSIZE
+
+    # requests handed to prefetchReads and not yet returned
+    _requests = collections.deque()
+
+    for _chunk in prefetchReads(_chunks()):
+
+        (_recordnr, _offset, _readlength) = _requests.popleft()
+        countStat('records', len(_chunk) // RECORDSIZE)
+
+        i = 0
+        while i + RECORDSIZE <= len(_chunk):
+            yield _recordnr, _offset + i, _chunk[i:i + RECORDSIZE]
+            _recordnr += 1
+            i += RECORDSIZE
+
+        # end of image reached
+        if len(_chunk) < _readlength:
+            return
+
+
+def applyFixup(_record):
+    """
+    verify the update sequence of a record and restore the original bytes at the end of every sector
+    :param _record: raw record (FILE, INDX, ...)
+    :return: fixed record or None if the update sequence does not match
+    """
+
+    try:
+        (_usaoffset, _usacount) = struct.unpack_from("<HH", _record, 4)
+    except struct.error:
+        return None
+
+    if _usacount < 2 or _usaoffset + 2 * _usacount > len(_record) \
+            or (_usacount - 1) * SECTORSIZE > len(_record):
+        return None
+
+    _usn = _record[_usaoffset:_usaoffset + 2]
+    _fixed = bytearray(_record)
+
+    i = 1
+    while i < _usacount:
+        _sectorend = i * SECTORSIZE - 2
+        if _record[_sectorend:_sectorend + 2] != _usn:
+            return None
+        _fixed[_sectorend:_sectorend + 2] = _record[_usaoffset + 2 * i:_usaoffset + 2 * i + 2]
+        i += 1
+
+    return str(_fixed)
+
+
+def unpackData(_buffer, _startoffset, _datavar, _end=0):
+    """
+    same as readAttData/readMFTData, but reads the fields from a buffer in memory
+    :param _buffer:      raw data
+    :param _startoffset: start of the structure in _buffer
+    :param _datavar:     data table from above
+    :param _end:         end of fields with variable length
+    :return: dictonary with the fields
+    """
+
+    _data = {}
+
+    for _field in _datavar:
+
+        _readpos = _startoffset + _field["offset"]
+
+        if _field["length"] != 0:
+            _data[_field["name"]] = struct.unpack_from(_field["format"], _buffer, _readpos)[0]
+        else:
+            _data[_field["name"]] = _buffer[_readpos:_end]
+
+    return _data
+
+
+def iterAttributes(_record):
+    """
+    walk the attributes of a fixed record; reads the attribute headers only
+    :param _record: record from applyFixup
+    :return: generator of attribute header dictonaries with 'attPos', 'attHex' and 'attName' added
+    """
+
+    _attpos = struct.unpack_from("<H", _record, 20)[0]
+    _usedbytes = min(struct.unpack_from("<I", _record, 24)[0], len(_record))
+
+    while _attpos + 16 <= _usedbytes:
+
+        _header = unpackData(_record, _attpos, ATT_HEADER)
+        _header['attHex'] = binascii.hexlify(_header['attID'])
+
+        if _header['attHex'] == "ffffffff":
+            return
+
+        # broken attribute; stop here instead of running in a loop
+        if _header['attLen'] < 16 or _attpos + _header['attLen'] > _usedbytes:
+            return
+
+        _namestart = _attpos + _header['nameOff']
+        _header['attName'] = _record[_namestart:_namestart + 2 * _header['nameLen']]\
+            .decode("utf-16le", "replace")
+        _header['attPos'] = _attpos
+        countAttribute(_header['attHex'])
+
+        yield _header
+
+        _attpos += _header['attLen']
+
+
+def residentContent(_record, _header):
+    """
+    return the content of a resident attribute
+    :param _record: record from applyFixup
+    :param _header: attribute header from iterAttributes
+    :return: content
+    """
+
+    (_size, _contentoffset) = struct.unpack_from("<IH", _record, _header['attPos'] + 16)
+    _start = _header['attPos'] + _contentoffset
+
+    return _record[_start:min(_start + _size, _header['attPos'] + _header['attLen'])]
+
+
+'''
+Timeline
+'''
+
+def timelineEvents(_recordnr, _record):
+    """
+    build the MACB events of the $STANDARD_INFORMATION and $FILE_NAME timestamps of one record
+    :param _recordnr: record number
+    :param _record:   raw record
+    :return: list of events; every event starts with the 20 digit filetime, so it sorts by time
+    """
+
+    if _record[:4] != "FILE":
+        return []
+
+    _record = applyFixup(_record)
+    if _record is None:
+        return []
+
+    try:
+        allocflag = FILE_FLAG[struct.unpack_from("<H", _record, 22)[0]]
+    except KeyError:
+        allocflag = "Unknown"
+
+    _times = []
+    _filename = ""
+
+    for _header in iterAttributes(_record):
+
+        _attend = _header['attPos'] + _header['attLen']
+
+        try:
+            if _header['attHex'] == "10000000":
+                _times.append(("$SI", unpackData(_record, _header['attPos'], SID_DATA, _attend), None))
+
+            elif _header['attHex'] == "30000000":
+                _fndata = unpackData(_record, _header['attPos'], FN_DATA, _attend)
+                _name = _fndata['filename'][:2 * _fndata['nameLength']].decode("utf-16le", "replace")\
+                    .encode("utf-8")
+                _times.append(("$FN", _fndata, _name))
+
+                # prefer the long name for the $SI events
+                if _filename == "" or _fndata['fntype'] != 2:
+                    _filename = _name
+        except struct.error:
+            continue
+
+    events = []
+    for (_source, _data, _name) in _times:
+
+        if _name is None:
+            _name = _filename
+
+        for (_filetime, _macb) in groupMACB(_data):
+            events.append("{:020d}|{}|{}|{}|{}|{}".format(_filetime, _macb, _source, _recordnr, _name, allocflag))
+
+    return events
+
+
+def groupMACB(_data):
+    """
+    group the four timestamps of $SI/$FN by value
+    :param _data: dictonary with the timestamps of SID_DATA or FN_DATA
+    :return: list of (filetime, MACB string) e.g. (130000000000000000, "M.C.")
+    """
+
+    _groups = {}
+
+    for (i, key) in enumerate(MACB):
+        _filetime = _data[key["name"]]
+        # 0 means not set
+        if _filetime == 0:
+            continue
+        _groups.setdefault(_filetime, ["."] * len(MACB))[i] = key["flag"]
+
+    return [(_filetime, "".join(_flags)) for (_filetime, _flags) in sorted(_groups.items())]
+
+
+def externalSort(_lines, _maxmemory=SORTMEMORY):
+    """
+    sort lines with a limited memory budget; sorted runs are spilled to temporary files
+    and merged with a k-way merge
+    :param _lines:     iterable of lines without newline
+    :param _maxmemory: budget in bytes for the lines held in memory
+    :return: generator of sorted lines
+    """
+
+    _run = []
+    _runsize = 0
+    _runfiles = []
+
+    for _line in _lines:
+
+        _run.append(_line)
+        _runsize += sys.getsizeof(_line) + 8
+
+        if _runsize >= _maxmemory:
+            _runfiles.append(spillRun(_run))
+            _run = []
+            _runsize = 0
+
+    # everything fits into memory
+    if not _runfiles:
+        _run.sort()
+        for _line in _run:
+            yield _line
+        return
+
+    if _run:
+        _runfiles.append(spillRun(_run))
+        _run = []
+
+    # limit the open files; merge the oldest runs into one until the rest fits
+    while len(_runfiles) > SORTFANIN:
+        _merged = tempfile.TemporaryFile(prefix="mftsort")
+        for _line in heapq.merge(*[runLines(_runfile) for _runfile in _runfiles[:SORTFANIN]]):
+            _merged.write(_line.encode("string_escape") + "\n")
+        _merged.seek(0)
+        for _runfile in _runfiles[:SORTFANIN]:
+            _runfile.close()
+        _runfiles = _runfiles[SORTFANIN:] + [_merged]
+
+    try:
+        for _line in heapq.merge(*[runLines(_runfile) for _runfile in _runfiles]):
+            yield _line
+    finally:
+        for _runfile in _runfiles:
+            _runfile.close()
+
+
+def spillRun(_run):
+    """
+    sort a run and write it into a temporary file; the lines are escaped with string_escape,
+    so a newline in a line (e.g. in a POSIX file name) does not split it
+    :param _run: list of lines
+    :return: temporary file, positioned at the start
+    """
+
+    _run.sort()
+
+    _runfile = tempfile.TemporaryFile(prefix="mftsort")
+    for _line in _run:
+        _runfile.write(_line.encode("string_escape") + "\n")
+    _runfile.seek(0)
+
+    return _runfile
+
+
+def runLines(_runfile):
+    """
+    read the lines of a run of spillRun; they are compared unescaped, so the merge sorts like the
+    sort in memory
+    :return: generator of lines
+    """
+
+    for _line in _runfile:
+        yield _line[:-1].decode("string_escape")
+
+
+def buildTimeline(_partoffset, _clustersize, _datarunMFT, _maxmemory=None):
+    """
+    build the timeline of all records, sorted by time
+    :param _partoffset: start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT: MFT Positions
+    :param _maxmemory: memory budget of the sort in bytes; default SORTMEMORY, limited by MAXMEMORY
+    :return: generator of lines 'time|MACB|source|record|filename|fileflag'
+    """
+
+    if _maxmemory is None:
+        _maxmemory = memoryBudget(SORTMEMORY)
+
+    _events = (_event for (_recordnr, _offset, _record) in iterMFTRecords(_partoffset, _clustersize, _datarunMFT)
+               for _event in timelineEvents(_recordnr, _record))
+
+    for _line in externalSort(_events, _maxmemory):
+        (_filetime, _rest) = _line.split("|", 1)
+        yield "{}|{}".format(mfttime(_filetime), _rest)
+
+
+'''
+Data extraction
+'''
+
+def readRecord(_recordoffset):
+    """
+    read a complete record in one read and restore the update sequence
+    :param _recordoffset: absolute offset of the record
+    :return: fixed record
+    """
+
+    _record = applyFixup(readRaw(_recordoffset, RECORDSIZE))
+    countStat('records')
+
+    if _record is None:
+        err_note = "Update sequence of record at offset {:} does not match.".format(_recordoffset)
+        raise RecordError(err_note)
+
+    return _record
+
+
+@timed
+def decodeRunlist(_buffer, _startoffset, _end):
+    """
+    decode a runlist from a buffer; unlike readRunlist the start clusters are absolute
+    and sparse runs are kept
+    :param _buffer:      raw data
+    :param _startoffset: start of runlist in _buffer
+    :param _end:         end of attribute in _buffer
+    :return: list of runs {'nr', 'vcn', 'lcn', 'length'}; lcn is None for sparse runs
+    """
+
+    runlist = []
+    _datarunpos = _startoffset
+    _vcn = 0
+    _lcn = 0
+    i = 0
+
+    while _datarunpos < _end:
+
+        _clusterPosInfo = ord(_buffer[_datarunpos])
+        _lengthStartCluster = _clusterPosInfo >> 4
+        _lengthClusterLength = _clusterPosInfo & 0x0f
+
+        if _lengthClusterLength == 0 or _lengthClusterLength > 8 or _lengthStartCluster > 8:
+            break
+
+        _runend = _datarunpos + 1 + _lengthClusterLength + _lengthStartCluster
+        if _runend > _end:
+            break
+
+        _clusterLength = LEint(_buffer[_datarunpos + 1:_datarunpos + 1 + _lengthClusterLength])
+
+        # no start cluster: sparse run
+        if _lengthStartCluster == 0:
+            _start = None
+        else:
+            _lcn += LEint(_buffer[_datarunpos + 1 + _lengthClusterLength:_runend], True)
+            _start = _lcn
+
+        runlist.append({'nr': i, 'vcn': _vcn, 'lcn': _start, 'length': _clusterLength})
+
+        _vcn += _clusterLength
+        _datarunpos = _runend
+        i += 1
+
+    return runlist
+
+
+def findStream(_record, _streamname=u"", _atthex="80000000", _extensions=()):
+    """
+    search a stream of the record by attribute type and name
+    :param _record:     record from applyFixup
+    :param _streamname: name of the stream; empty for the unnamed stream
+    :param _atthex:     attribute type
+    :param _extensions: extension records from loadExtensions; the stream may continue there
+    :return: dictonary {'name', 'resident', 'content'} or {'name', 'resident', 'runs', 'logSize',
+             'iniSize', 'attFlags', 'compUnit'} or None if not found
+    """
+
+    stream = None
+
+    for _part in [_record] + list(_extensions):
+        for _header in iterAttributes(_part):
+
+            if _header['attHex'] != _atthex or _header['attName'] != _streamname:
+                continue
+
+            if _header['resident'] == 0:
+                return {'name': _streamname, 'resident': True, 'content': residentContent(_part, _header)}
+
+            _attend = _header['attPos'] + _header['attLen']
+            _nonres = unpackData(_part, _header['attPos'], DATAnonres_DATA)
+            _runs = decodeRunlist(_part, _header['attPos'] + _nonres['runOff'], _attend)
+
+            if stream is None:
+                stream = {'name': _streamname, 'resident': False, 'runs': []}
+
+            # the first extent holds the sizes; further extents only continue the runlist
+            if _nonres['VCNstart'] == 0 or 'logSize' not in stream:
+                stream.update({'logSize': _nonres['logSize'], 'iniSize': _nonres['resSize'],
+                               'attFlags': _header['attFlags'], 'compUnit': _nonres['compUnit']})
+
+            for _run in _runs:
+                _run['vcn'] += _nonres['VCNstart']
+            stream['runs'].extend(_runs)
+
+    # extents of extension records are not in order of the VCN
+    if stream is not None and _extensions:
+        stream['runs'].sort(key=lambda run: run['vcn'])
+
+    return stream
+
+
+def listStreams(_record, _extensions=()):
+    """
+    list the $DATA streams of a record; only the attribute headers are read, not the content
+    :param _record:     record from applyFixup
+    :param _extensions: extension records from loadExtensions
+    :return: list of {'name', 'resident', 'size'}; name is empty for the unnamed stream
+    """
+
+    streams = []
+
+    for _part in [_record] + list(_extensions):
+        for _header in iterAttributes(_part):
+
+            if _header['attHex'] != "80000000":
+                continue
+
+            if _header['resident'] == 0:
+                _size = struct.unpack_from("<I", _part, _header['attPos'] + 16)[0]
+            else:
+                # further extents of the same stream
+                if struct.unpack_from("<Q", _part, _header['attPos'] + 16)[0] != 0:
+                    continue
+                _size = struct.unpack_from("<Q", _part, _header['attPos'] + 48)[0]
+
+            streams.append({'name': _header['attName'], 'resident': _header['resident'] == 0, 'size': _size})
+
+    return streams
+
+
+def iterADS(_partoffset, _clustersize, _datarunMFT):
+    """
+    find all alternate data streams of the MFT; costs only the parsing of the attribute headers
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :return: generator of (recordnumber, filename, stream) with stream from listStreams
+    """
+
+    for (_recordnr, _offset, _raw, _record, _extensions) in iterRecordsExtended(_partoffset, _clustersize,
+                                                                                _datarunMFT):
+
+        # extension records are listed with their base record
+        if _record is None or struct.unpack_from("<Q", _record, 32)[0] != 0:
+            continue
+
+        _named = [_stream for _stream in listStreams(_record, _extensions) if _stream['name'] != ""]
+        if not _named:
+            continue
+
+        _filename = recordFilename(_record)
+        for _stream in _named:
+            yield _recordnr, _filename, _stream
+
+
+def readStream(_recordoffset, _streamname=u""):
+    """
+    read the record at _recordoffset and return its $DATA stream
+    :param _recordoffset: absolute offset of the record
+    :param _streamname:   name of the stream; empty for the unnamed stream
+    :return: stream dictonary from findStream
+    """
+
+    stream = findStream(readRecord(_recordoffset), _streamname)
+
+    if stream is None:
+        err_note = "No $DATA stream '{}' found.".format(_streamname.encode("utf-8"))
+        raise RecordError(err_note)
+
+    return stream
+
+
+def streamExtents(_partoffset, _clustersize, _stream):
+    """
+    map the logical content of a non resident stream to the image;
+    cut to the logical size, physically following runs are joined
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :return: list of (length, absolute offset); offset None means zeros (sparse or not initialized)
+    """
+
+    extents = []
+    _logsize = _stream['logSize']
+    _inisize = min(_stream['iniSize'], _logsize)
+    _covered = 0
+
+    for _run in sorted(_stream['runs'], key=lambda x: x['vcn']):
+
+        _start = _run['vcn'] * _clustersize
+        _end = min(_start + _run['length'] * _clustersize, _logsize)
+        if _start < _covered or _end <= _start:
+            continue
+
+        if _start > _covered:
+            appendExtent(extents, _start - _covered, None)
+
+        if _run['lcn'] is None:
+            appendExtent(extents, _end - _start, None)
+        else:
+            _dataend = max(min(_end, _inisize), _start)
+            if _dataend > _start:
+                appendExtent(extents, _dataend - _start, _partoffset + _run['lcn'] * _clustersize)
+            if _end > _dataend:
+                appendExtent(extents, _end - _dataend, None)
+
+        _covered = _end
+
+    # runlist ends before the logical size
+    if _covered < _logsize:
+        appendExtent(extents, _logsize - _covered, None)
+
+    return extents
+
+
+def appendExtent(_extents, _length, _offset):
+    """
+    append an extent; joins it with the last one if both are physically following or both are zeros
+    :param _extents: list of (length, offset)
+    :return: nothing
+    """
+
+    if _extents:
+        (_lastlength, _lastoffset) = _extents[-1]
+        if (_lastoffset is None and _offset is None) or \
+                (_lastoffset is not None and _offset is not None and _lastoffset + _lastlength == _offset):
+            _extents[-1] = (_lastlength + _length, _lastoffset)
+            return
+
+    _extents.append((_length, _offset))
+
+
+def iterStream(_partoffset, _clustersize, _stream, _chunksize=EXTRACTCHUNK):
+    """
+    read the content of a stream in chunks, the data is never held completely in memory
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :param _chunksize:   bytes to read at once
+    :return: generator of (length, data); data is None for zeros, which are not read
+    """
+
+    if _stream['resident']:
+        yield len(_stream['content']), _stream['content']
+        return
+
+    # compressed streams are decompressed unit by unit
+    if isCompressed(_stream):
+        _unitsize = (1 << _stream['compUnit']) * _clustersize
+        _pos = 0
+        while _pos < _stream['logSize']:
+            _data = readStreamRange(_partoffset, _clustersize, _stream, _pos, _unitsize)
+            yield len(_data), _data
+            _pos += _unitsize
+        return
+
+    def _chunks():
+        for (_length, _offset) in streamExtents(_partoffset, _clustersize, _stream):
+            if _offset is None:
+                _requests.append((None, _length))
+                yield None, _length
+                continue
+            for _request in chunkRanges(_offset, _length, _chunksize):
+                _requests.append(_request)
+                yield _request
+
+    # requests handed to prefetchReads and not yet returned
+    _requests = collections.deque()
+
+    for _data in prefetchReads(_chunks()):
+
+        (_offset, _length) = _requests.popleft()
+
+        if _offset is None:
+            yield _length, None
+            continue
+
+        if len(_data) < _length:
+            err_note = "Unexpected end of image at offset {:}.".format(_offset + len(_data))
+            raise RecordError(err_note)
+
+        yield _length, _data
+
+
+def extractStream(_partoffset, _clustersize, _stream, _outfd):
+    """
+    write the content of a stream into _outfd; sparse parts become holes if _outfd is a regular file
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :param _outfd:       file descriptor to write to
+    :return: written bytes
+    """
+
+    _isfile = stat.S_ISREG(os.fstat(_outfd).st_mode)
+    _written = 0
+
+    # pipes get zeros for sparse parts and are written from the (prefetched) reads of iterStream
+    if _stream['resident'] or isCompressed(_stream) or not _isfile:
+        _zeros = ""
+        for (_length, _data) in iterStream(_partoffset, _clustersize, _stream):
+            if _data is None:
+                if len(_zeros) < min(_length, EXTRACTCHUNK):
+                    _zeros = "\0" * min(_length, EXTRACTCHUNK)
+                _pos = 0
+                while _pos < _length:
+                    writeAll(_outfd, _zeros[:_length - _pos])
+                    _pos += len(_zeros)
+            else:
+                writeAll(_outfd, _data)
+            _written += _length
+        return _written
+
+    for (_length, _offset) in streamExtents(_partoffset, _clustersize, _stream):
+
+        if _offset is None:
+            os.lseek(_outfd, _length, os.SEEK_CUR)
+
+        else:
+            _pos = 0
+            for _data in prefetchReads(chunkRanges(_offset, _length, EXTRACTCHUNK)):
+                if not _data:
+                    err_note = "Unexpected end of image at offset {:}.".format(_offset + _pos)
+                    raise RecordError(err_note)
+                writeAll(_outfd, _data)
+                _pos += len(_data)
+
+        _written += _length
+
+    # trailing holes
+    if _isfile:
+        os.ftruncate(_outfd, os.lseek(_outfd, 0, os.SEEK_CUR))
+
+    return _written
+
+
+def writeAll(_outfd, _data):
+    """
+    write all data to a file descriptor
+    :return: nothing
+    """
+
+    _view = memoryview(_data)
+    while len(_view):
+        _view = _view[os.write(_outfd, _view):]
+
+
+'''
+Compression
+'''
+
+def isCompressed(_stream):
+    """
+    check if a stream is compressed with LZNT1
+    :param _stream: stream dictonary from findStream
+    :return: boolean
+    """
+
+    return not _stream['resident'] and _stream['attFlags'] & 0x00ff != 0 and _stream['compUnit'] != 0
+
+
+def clusterRange(_runs, _vcn, _count):
+    """
+    map _count clusters from _vcn to the image
+    :param _runs:  runlist from decodeRunlist
+    :param _vcn:   first virtual cluster
+    :param _count: number of clusters
+    :return: list of (lcn, count); lcn is None for sparse clusters or clusters behind the runlist
+    """
+
+    pieces = []
+    _end = _vcn + _count
+
+    for _run in _runs:
+
+        _runstart = max(_run['vcn'], _vcn)
+        _runend = min(_run['vcn'] + _run['length'], _end)
+        if _runend <= _runstart:
+            continue
+
+        if _runstart > _vcn:
+            pieces.append((None, _runstart - _vcn))
+
+        if _run['lcn'] is None:
+            pieces.append((None, _runend - _runstart))
+        else:
+            pieces.append((_run['lcn'] + _runstart - _run['vcn'], _runend - _runstart))
+
+        _vcn = _runend
+
+    if _vcn < _end:
+        pieces.append((None, _end - _vcn))
+
+    return pieces
+
+
+def readCompressionUnit(_partoffset, _clustersize, _stream, _unit, _cache=None):
+    """
+    read and decompress one compression unit; a unit with all clusters allocated is stored
+    uncompressed, a unit without allocated clusters is sparse
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :param _unit:        number of the compression unit
+    :param _cache:       OrderedDict from newUnitCache or None
+    :return: uncompressed unit
+    """
+
+    _unitclusters = 1 << _stream['compUnit']
+    _unitsize = _unitclusters * _clustersize
+
+    _pieces = [_piece for _piece in clusterRange(_stream['runs'], _unit * _unitclusters, _unitclusters)
+               if _piece[0] is not None]
+    _allocated = sum(_count for (_lcn, _count) in _pieces)
+
+    if _allocated == 0:
+        return "\0" * _unitsize
+
+    _key = (_partoffset, _pieces[0][0])
+    if _cache is not None and _key in _cache:
+        # move to the end; last used
+        _cache[_key] = _cache.pop(_key)
+        return _cache[_key]
+
+    _data = "".join(readRaw(_partoffset + _lcn * _clustersize, _count * _clustersize) for (_lcn, _count) in _pieces)
+
+    if _allocated < _unitclusters:
+        _data = lznt1Decompress(_data, _unitsize)
+
+    if _cache is not None:
+        _cache[_key] = _data
+        if len(_cache) > UNITCACHE:
+            _cache.popitem(last=False)
+
+    return _data
+
+
+def newUnitCache():
+    """
+    cache for readCompressionUnit; keeps the last UNITCACHE decompressed units
+    :return: empty cache
+    """
+
+    return collections.OrderedDict()
+
+
+def readStreamRange(_partoffset, _clustersize, _stream, _offset, _length, _cache=None):
+    """
+    read a byte range of a stream; only the clusters, or for compressed streams the compression units,
+    overlapping the range are read
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :param _offset:      logical start of the range
+    :param _length:      length of the range
+    :param _cache:       unit cache from newUnitCache or None
+    :return: data; shorter than _length at the end of the stream
+    """
+
+    if _stream['resident']:
+        return _stream['content'][_offset:_offset + _length]
+
+    _end = min(_offset + _length, _stream['logSize'])
+    if _offset >= _end:
+        return ""
+
+    _data = []
+
+    if isCompressed(_stream):
+        _unitsize = (1 << _stream['compUnit']) * _clustersize
+        _unit = _offset // _unitsize
+        while _unit * _unitsize < _end:
+            _unitstart = _unit * _unitsize
+            _unitdata = readCompressionUnit(_partoffset, _clustersize, _stream, _unit, _cache)
+            _data.append(_unitdata[max(_offset - _unitstart, 0):_end - _unitstart])
+            _unit += 1
+
+        _data = "".join(_data)
+
+        # behind the initialized size everything is zero
+        if _end > _stream['iniSize']:
+            _inisize = max(_stream['iniSize'] - _offset, 0)
+            _data = _data[:_inisize] + "\0" * (len(_data) - _inisize)
+
+        return _data
+
+    _pos = 0
+    for (_extlength, _extoffset) in streamExtents(_partoffset, _clustersize, _stream):
+
+        _start = max(_offset, _pos)
+        _stop = min(_end, _pos + _extlength)
+
+        if _stop > _start:
+            if _extoffset is None:
+                _data.append("\0" * (_stop - _start))
+            else:
+                _data.append(readRaw(_extoffset + _start - _pos, _stop - _start))
+
+        _pos += _extlength
+        if _pos >= _end:
+            break
+
+    return "".join(_data)
+
+
+def lznt1Decompress(_data, _size):
+    """
+    decompress a LZNT1 compressed compression unit
+    :param _data: compressed data
+    :param _size: uncompressed size of the unit
+    :return: uncompressed data; filled with zeros up to _size
+    :raise RecordError: truncated or corrupt chunk
+    """
+
+    _out = bytearray()
+    _pos = 0
+
+    while _pos + 2 <= len(_data) and len(_out) < _size:
+
+        _header = struct.unpack_from("<H", _data, _pos)[0]
+        # end of compressed data
+        if _header == 0:
+            break
+
+        _chunklength = (_header & 0x0fff) + 1
+        _chunk = _data[_pos + 2:_pos + 2 + _chunklength]
+        if len(_chunk) < _chunklength:
+            err_note = "LZNT1 chunk at {} truncated ({} of {} bytes).".format(_pos, len(_chunk), _chunklength)
+            raise RecordError(err_note)
+        _pos += 2 + _chunklength
+
+        if _header & 0x8000:
+            _chunkout = lznt1Chunk(bytearray(_chunk))
+        else:
+            _chunkout = bytearray(_chunk)
+
+        # every chunk stands for LZNT1CHUNK bytes
+        if len(_chunkout) < LZNT1CHUNK:
+            _chunkout += "\0" * (LZNT1CHUNK - len(_chunkout))
+
+        _out += _chunkout
+
+    if len(_out) < _size:
+        _out += "\0" * (_size - len(_out))
+
+    return str(_out[:_size])
+
+
+def lznt1Chunk(_chunk):
+    """
+    decompress one LZNT1 chunk
+    :param _chunk: compressed chunk without header as bytearray
+    :return: uncompressed chunk as bytearray
+    :raise RecordError: back reference cut off or in front of the chunk, or more than LZNT1CHUNK bytes
+    """
+
+    _out = bytearray()
+    i = 0
+    _chunklength = len(_chunk)
+
+    while i < _chunklength:
+
+        _flags = _chunk[i]
+        i += 1
+
+        for _bit in range(8):
+
+            if i >= _chunklength:
+                break
+
+            # literal
+            if not _flags & (1 << _bit):
+                if len(_out) >= LZNT1CHUNK:
+                    err_note = "LZNT1 chunk longer than {} bytes.".format(LZNT1CHUNK)
+                    raise RecordError(err_note)
+                _out.append(_chunk[i])
+                i += 1
+                continue
+
+            # back reference; split of offset and length depends on the position in the chunk
+            if i + 1 >= _chunklength:
+                err_note = "LZNT1 back reference at {} cut off.".format(i)
+                raise RecordError(err_note)
+            _token = _chunk[i] | (_chunk[i + 1] << 8)
+            i += 2
+
+            _lengthmask = 0x0fff
+            _offsetshift = 12
+            _position = len(_out) - 1
+            while _position >= 0x10:
+                _position >>= 1
+                _lengthmask >>= 1
+                _offsetshift -= 1
+
+            _start = len(_out) - ((_token >> _offsetshift) + 1)
+            _length = (_token & _lengthmask) + 3
+
+            # corrupt data
+            if _start < 0 or len(_out) + _length > LZNT1CHUNK:
+                err_note = "LZNT1 back reference at {} out of the chunk (offset {}, length {}).".format(
+                    i - 2, len(_out) - _start, _length)
+                raise RecordError(err_note)
+
+            if _start + _length <= len(_out):
+                _out += _out[_start:_start + _length]
+            else:
+                # overlapping copy repeats the last bytes
+                j = 0
+                while j < _length:
+                    _out.append(_out[_start + j])
+                    j += 1
+
+    return _out
+
+
+'''
+Attribute list
+'''
+
+def attributeListEntries(_content):
+    """
+    decode the entries of an $ATTRIBUTE_LIST
+    :param _content: content of the attribute
+    :return: list of AttList_DATA dictonaries with 'attHex', 'name' (unicode), 'record' and 'sequence'
+    """
+
+    _entries = []
+    _pos = 0
+
+    while _pos + 26 <= len(_content):
+
+        _entry = unpackData(_content, _pos, AttList_DATA)
+        # padding or damaged list
+        if _entry['reclen'] < 26 or _pos + _entry['reclen'] > len(_content):
+            break
+
+        _namestart = _pos + _entry['nameoff']
+        _entry['name'] = _content[_namestart:_namestart + 2 * _entry['namelen']].decode("utf-16le", "replace")
+        _entry['attHex'] = binascii.hexlify(_entry['type'])
+        _entry['record'] = _entry['fileref'] & 0xffffffffffff
+        _entry['sequence'] = _entry['fileref'] >> 48
+        _entries.append(_entry)
+
+        _pos += _entry['reclen']
+
+    return _entries
+
+
+def hasAttributeList(_record):
+    """
+    check for an $ATTRIBUTE_LIST without parsing the attributes; the attributes are sorted by type,
+    so only the $STANDARD_INFORMATION before it has to be skipped
+    :param _record: record from applyFixup
+    :return: True or False
+    """
+
+    _attpos = struct.unpack_from("<H", _record, 20)[0]
+
+    while _attpos + 8 <= len(_record):
+        (_type, _length) = struct.unpack_from("<II", _record, _attpos)
+        if _type >= 0x20 or _length < 16:
+            return _type == 0x20
+        _attpos += _length
+
+    return False
+
+
+def readAttributeList(_partoffset, _clustersize, _record):
+    """
+    entries of the $ATTRIBUTE_LIST of a fixed record; a non resident list is read from its clusters
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _record:      record from applyFixup
+    :return: list from attributeListEntries; empty if the record has no list
+    """
+
+    if not hasAttributeList(_record):
+        return []
+
+    _stream = findStream(_record, u"", "20000000")
+    if _stream is None:
+        return []
+
+    if _stream['resident']:
+        return attributeListEntries(_stream['content'])
+
+    return attributeListEntries(readStreamRange(_partoffset, _clustersize, _stream, 0, _stream['logSize']))
+
+
+def extensionNumbers(_recordnr, _entries):
+    """
+    record numbers of the extension records in an attribute list
+    :param _recordnr: number of the base record
+    :param _entries:  list from attributeListEntries
+    :return: sorted list of record numbers
+    """
+
+    return sorted(set(_entry['record'] for _entry in _entries if _entry['record'] != _recordnr))
+
+
+def newRecordCache():
+    """
+    cache for loadExtensions and iterRecordsExtended; keeps the last EXTENSIONCACHE fixed records by number
+    :return: empty cache
+    """
+
+    return collections.OrderedDict()
+
+
+def cacheRecord(_cache, _recordnr, _record):
+    """
+    put a fixed record into a cache from newRecordCache
+    """
+
+    _cache[_recordnr] = _record
+    if len(_cache) > EXTENSIONCACHE:
+        _cache.popitem(last=False)
+
+
+def validExtension(_record, _recordnr):
+    """
+    check that a fixed record is an extension record of the base record _recordnr; not the flag in use,
+    so the extension records of deleted files are found as well
+    """
+
+    return _record is not None and struct.unpack_from("<Q", _record, 32)[0] & 0xffffffffffff == _recordnr
+
+
+def loadExtensions(_partoffset, _clustersize, _datarunMFT, _recordnr, _record, _cache=None):
+    """
+    read the extension records listed in the $ATTRIBUTE_LIST of a base record; the records are found with
+    the MFT extents, so no search is needed
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _recordnr:    number of the base record
+    :param _record:      base record from applyFixup
+    :param _cache:       record cache from newRecordCache or None
+    :return: list of fixed extension records; records reused for other files are left out
+    """
+
+    _numbers = extensionNumbers(_recordnr, readAttributeList(_partoffset, _clustersize, _record))
+    if not _numbers:
+        return []
+
+    _extents = mftExtents(_partoffset, _clustersize, _datarunMFT)
+    _extensions = []
+
+    for _number in _numbers:
+
+        _extension = _cache.pop(_number, None) if _cache is not None else None
+        if _extension is None:
+            _extension = readRecord(extentOffset(_extents, _number))
+        if _cache is not None:
+            cacheRecord(_cache, _number, _extension)
+
+        if validExtension(_extension, _recordnr):
+            _extensions.append(_extension)
+
+    return _extensions
+
+
+def readRecordStream(_partoffset, _clustersize, _datarunMFT, _recordnr, _streamname=u"", _cache=None):
+    """
+    same as readStream, but the stream may continue in the extension records of the record
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _recordnr:    record number
+    :param _streamname:  name of the stream; empty for the unnamed stream
+    :param _cache:       record cache from newRecordCache or None
+    :return: stream dictonary from findStream
+    """
+
+    _record = readRecord(extentOffset(mftExtents(_partoffset, _clustersize, _datarunMFT), _recordnr))
+    _extensions = loadExtensions(_partoffset, _clustersize, _datarunMFT, _recordnr, _record, _cache)
+
+    stream = findStream(_record, _streamname, "80000000", _extensions)
+
+    if stream is None:
+        err_note = "No $DATA stream '{}' found.".format(_streamname.encode("utf-8"))
+        raise RecordError(err_note)
+
+    return stream
+
+
+def iterRecordsExtended(_partoffset, _clustersize, _datarunMFT, _startrecord=0, _batch=EXTENSIONBATCH):
+    """
+    walk the MFT like iterMFTRecords and add the extension records to the base records with an attribute list;
+    the extension records of _batch records are read together in a second pass, in order of their position,
+    instead of one random read in the middle of the scan for each base record
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _startrecord: first record to return
+    :param _batch:       records per batch
+    :return: generator of (recordnumber, absolute offset, raw record, fixed record or None, list of extensions)
+             in order of the record numbers
+    """
+
+    _extents = mftExtents(_partoffset, _clustersize, _datarunMFT)
+    _cache = newRecordCache()
+    _pending = []
+
+    def _resolve():
+        _wanted = set(_number for (_recordnr, _offset, _raw, _fixed, _numbers) in _pending for _number in _numbers)
+        _found = dict((_number, _cache[_number]) for _number in _wanted if _number in _cache)
+
+        # extension records which were not in the scan so far; read in order of their position
+        _needed = sorted(_wanted - set(_found))
+        _requests = [(extentOffset(_extents, _number), RECORDSIZE) for _number in _needed]
+        for (_number, _raw) in zip(_needed, prefetchReads(_requests)):
+            _found[_number] = applyFixup(_raw) if _raw[:4] == "FILE" else None
+            cacheRecord(_cache, _number, _found[_number])
+
+        for (_recordnr, _offset, _raw, _fixed, _numbers) in _pending:
+            _extensions = [_found[_number] for _number in _numbers]
+            yield _recordnr, _offset, _raw, _fixed, [_extension for _extension in _extensions
+                                                     if validExtension(_extension, _recordnr)]
+        del _pending[:]
+
+    for (_recordnr, _offset, _raw) in iterMFTRecords(_partoffset, _clustersize, _datarunMFT,
+                                                     _startrecord=_startrecord):
+
+        _fixed = applyFixup(_raw) if _raw[:4] == "FILE" else None
+        _numbers = []
+
+        if _fixed is not None and struct.unpack_from("<H", _fixed, 22)[0] & 1:
+            if struct.unpack_from("<Q", _fixed, 32)[0] != 0:
+                # extension record; most base records are near their extension records
+                cacheRecord(_cache, _recordnr, _fixed)
+            else:
+                try:
+                    _numbers = extensionNumbers(_recordnr, readAttributeList(_partoffset, _clustersize, _fixed))
+                except (RecordError, struct.error, ValueError, IndexError):
+                    _numbers = []
+
+        _pending.append((_recordnr, _offset, _raw, _fixed, _numbers))
+
+        if len(_pending) >= _batch:
+            for _result in _resolve():
+                yield _result
+
+    for _result in _resolve():
+        yield _result
+
+
+'''
+Index
+'''
+
+def indexRecordSize(_record):
+    """
+    size of the index records of a directory, given by its $INDEX_ROOT
+    :param _record: record from applyFixup
+    :return: size in bytes; INDXSIZE if the record has no $INDEX_ROOT
+    """
+
+    for _header in iterAttributes(_record):
+        if _header['attHex'] == "90000000" and _header['resident'] == 0:
+            _content = residentContent(_record, _header)
+            if len(_content) >= 12:
+                return struct.unpack_from("<I", _content, 8)[0]
+
+    return INDXSIZE
+
+
+def iterIndexRecords(_partoffset, _clustersize, _stream, _indexsize=INDXSIZE):
+    """
+    read the index records of an $INDEX_ALLOCATION stream one after the other
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      $INDEX_ALLOCATION stream from findStream
+    :param _indexsize:   size of one index record
+    :return: generator of (number of the index record, fixed record or None if not valid)
+    """
+
+    _buffer = ""
+    _number = 0
+
+    for (_length, _data) in iterStream(_partoffset, _clustersize, _stream):
+
+        # sparse; holds no index records
+        if _data is None:
+            _total = len(_buffer) + _length
+            _number += _total // _indexsize
+            _buffer = "\0" * (_total % _indexsize)
+            continue
+
+        _buffer += _data
+
+        _pos = 0
+        while _pos + _indexsize <= len(_buffer):
+            _block = _buffer[_pos:_pos + _indexsize]
+            yield _number, (applyFixup(_block) if _block[:4] == "INDX" else None)
+            _number += 1
+            _pos += _indexsize
+
+        _buffer = _buffer[_pos:]
+
+
+def readFilename(_buffer, _pos, _end):
+    """
+    read a $FILE_NAME structure (content of the attribute or of an index entry)
+    :param _buffer: raw data
+    :param _pos:    start of the structure
+    :param _end:    end of the usable data
+    :return: dictonary of FN_DATA with 'parent', 'parentSeq' and 'name' or None if it doesn't fit
+    """
+
+    if _pos + 66 > _end:
+        return None
+
+    _namelength = ord(_buffer[_pos + 64])
+    if _pos + 66 + 2 * _namelength > _end:
+        return None
+
+    # FN_DATA is relative to the attribute header
+    fndata = unpackData(_buffer, _pos - 24, FN_DATA, _pos + 66 + 2 * _namelength)
+    fndata['parent'] = LEint(fndata['parentRec'])
+    fndata['parentSeq'] = struct.unpack_from("<H", _buffer, _pos + 6)[0]
+    fndata['name'] = fndata['filename'].decode("utf-16le", "replace")
+    fndata['realSize'] = struct.unpack_from("<Q", _buffer, _pos + 48)[0]
+
+    return fndata
+
+
+def indexEntries(_buffer, _nodeoffset, _end):
+    """
+    read the valid entries of an index node ($I30)
+    :param _buffer:     raw data
+    :param _nodeoffset: start of the node header
+    :param _end:        end of the usable data
+    :return: list of (file reference, FN dictonary from readFilename)
+    """
+
+    entries = []
+
+    (_entryoffset, _indexsize) = struct.unpack_from("<II", _buffer, _nodeoffset)
+    _pos = _nodeoffset + _entryoffset
+    _end = min(_nodeoffset + _indexsize, _end)
+
+    while _pos + 16 <= _end:
+
+        (_fileref, _entrylength, _contentlength, _flags) = struct.unpack_from("<QHHI", _buffer, _pos)
+
+        # last entry
+        if _flags & 2 or _entrylength < 16:
+            break
+
+        if _contentlength:
+            _fndata = readFilename(_buffer, _pos + 16, min(_pos + 16 + _contentlength, _end))
+            if _fndata is not None:
+                entries.append((_fileref, _fndata))
+
+        _pos += _entrylength
+
+    return entries
+
+
+def slackFilenames(_block):
+    """
+    search the slack of an index record for left over $FILE_NAME entries; the checks are cheap,
+    the name length and namespace first, then the timestamps
+    :param _block: fixed index record
+    :return: list of (file reference, FN dictonary from readFilename)
+    """
+
+    entries = []
+
+    (_indexsize, _allocsize) = struct.unpack_from("<II", _block, 28)
+    _end = min(24 + _allocsize, len(_block))
+    # entries are aligned to 8 bytes; the content follows the 16 byte entry header
+    _pos = ((24 + _indexsize + 7) & ~7) + 16
+
+    while _pos + 66 <= _end:
+
+        _namelength = ord(_block[_pos + 64])
+        _namespace = ord(_block[_pos + 65])
+
+        if _namelength == 0 or _namespace > 3 or _pos + 66 + 2 * _namelength > _end:
+            _pos += 8
+            continue
+
+        _times = struct.unpack_from("<QQQQ", _block, _pos + 8)
+        if min(_times) < MINFILETIME or max(_times) > MAXFILETIME:
+            _pos += 8
+            continue
+
+        _fndata = readFilename(_block, _pos, _end)
+        if _fndata is None or u"\0" in _fndata['name'] or u"\ufffd" in _fndata['name']:
+            _pos += 8
+            continue
+
+        entries.append((struct.unpack_from("<Q", _block, _pos - 16)[0], _fndata))
+
+        # continue behind this entry
+        _pos = ((_pos + 66 + 2 * _namelength + 7) & ~7) + 16
+
+    return entries
+
+
+def iterIndexSlack(_partoffset, _clustersize, _datarunMFT):
+    """
+    recover $FILE_NAME entries from the slack of the index records of all directories;
+    only one index record is held in memory at once
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :return: generator of (directory record, directory name, index record number, file reference, FN dictonary)
+    """
+
+    for (_recordnr, _offset, _record) in iterMFTRecords(_partoffset, _clustersize, _datarunMFT):
+
+        if _record[:4] != "FILE":
+            continue
+
+        _record = applyFixup(_record)
+        # allocated directories only
+        if _record is None or struct.unpack_from("<H", _record, 22)[0] != 3:
+            continue
+
+        _stream = findStream(_record, u"$I30", "a0000000")
+        if _stream is None or _stream['resident']:
+            continue
+
+        _dirname = recordFilename(_record)
+        for (_number, _block) in iterIndexRecords(_partoffset, _clustersize, _stream, indexRecordSize(_record)):
+            if _block is None:
+                continue
+            for (_fileref, _fndata) in slackFilenames(_block):
+                yield _recordnr, _dirname, _number, _fileref, _fndata
+
+
+'''
+Change journal
+'''
+
+def findIndexEntry(_partoffset, _clustersize, _record, _name):
+    """
+    search a name in the $I30 index of a directory
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _record:      fixed record of the directory
+    :param _name:        name to search; not case sensitive
+    :return: file reference or None
+    """
+
+    _name = _name.lower()
+
+    for _header in iterAttributes(_record):
+        if _header['attHex'] == "90000000" and _header['attName'] == u"$I30" and _header['resident'] == 0:
+            _content = residentContent(_record, _header)
+            for (_fileref, _fndata) in indexEntries(_content, 16, len(_content)):
+                if _fndata['name'].lower() == _name:
+                    return _fileref
+
+    _stream = findStream(_record, u"$I30", "a0000000")
+    if _stream is None or _stream['resident']:
+        return None
+
+    for (_number, _block) in iterIndexRecords(_partoffset, _clustersize, _stream, indexRecordSize(_record)):
+        if _block is None:
+            continue
+        for (_fileref, _fndata) in indexEntries(_block, 24, len(_block)):
+            if _fndata['name'].lower() == _name:
+                return _fileref
+
+    return None
+
+
+def findUsnJournal(_partoffset, _clustersize, _datarunMFT):
+    """
+    find the $J stream of $Extend\\$UsnJrnl
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :return: stream dictonary from findStream
+    """
+
+    # record 11 is $Extend
+    _extend = readRecord(findMFTRecord(_partoffset, _clustersize, 11, _datarunMFT))
+    _fileref = findIndexEntry(_partoffset, _clustersize, _extend, u"$UsnJrnl")
+
+    if _fileref is None:
+        err_note = "No $UsnJrnl found in $Extend. Change journal not active?"
+        raise VolumeError(err_note)
+
+    # a large journal often continues in extension records
+    return readRecordStream(_partoffset, _clustersize, _datarunMFT, _fileref & 0xffffffffffff, u"$J")
+
+
+def iterUsnRecords(_partoffset, _clustersize, _stream):
+    """
+    decode the USN records of the $J stream; sparse runs are skipped without reading,
+    zeros inside of allocated clusters are skipped at C speed
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      $J stream from findUsnJournal
+    :return: generator of dictonaries of USN_DATA with 'name' and 'offset' (in $J) added
+    """
+
+    _nonzero = re.compile(r"[^\x00]")
+    _buffer = ""
+    _bufferoffset = 0
+
+    for (_length, _data) in iterStream(_partoffset, _clustersize, _stream):
+
+        # sparse: records never continue into a sparse run
+        if _data is None:
+            _bufferoffset += len(_buffer) + _length
+            _buffer = ""
+            continue
+
+        _buffer += _data
+        _pos = 0
+
+        while _pos + 8 <= len(_buffer):
+
+            (_reclength, _major) = struct.unpack_from("<IH", _buffer, _pos)
+
+            # padding at the end of a page or cleared area; jump to the next data
+            if _reclength == 0:
+                _match = _nonzero.search(_buffer, _pos)
+                _pos = max(_pos + 8, _match.start() & ~7) if _match else len(_buffer)
+                continue
+
+            # damaged header; search the next record 8 bytes further
+            if _major not in (2, 3) or _reclength % 8 != 0 or not 64 <= _reclength <= USN_MAXRECORD[_major]:
+                _pos += 8
+                continue
+
+            # record continues in the next chunk
+            if _pos + _reclength > len(_buffer):
+                break
+
+            usnrecord = unpackData(_buffer, _pos, USN_DATA if _major == 2 else USNv3_DATA)
+            if usnrecord['nameOff'] + usnrecord['nameLength'] > _reclength:
+                _pos += 8
+                continue
+            _namestart = _pos + usnrecord['nameOff']
+            usnrecord['name'] = _buffer[_namestart:_namestart + usnrecord['nameLength']].decode("utf-16le", "replace")
+            usnrecord['offset'] = _bufferoffset + _pos
+
+            yield usnrecord
+
+            _pos += _reclength
+
+        _bufferoffset += _pos
+        _buffer = _buffer[_pos:]
+
+
+def usnReasons(_reason):
+    """
+    turn the reason flags of a USN record into text
+    :param _reason: reason flags
+    :return: names of the set flags, separated by ', '
+    """
+
+    return ", ".join(USN_REASON[_bit] for _bit in sorted(USN_REASON) if _reason & (1 << _bit))
+
+
+'''
+Logfile
+'''
+
+def readLogRestart(_partoffset, _clustersize, _stream):
+    """
+    read the two restart pages at the start of $LogFile
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      $DATA stream of $LogFile (record 2)
+    :return: list of dictonaries of RSTR_DATA and RSTRAREA_DATA with 'offset'; only valid pages
+    """
+
+    restart = []
+    _pagesize = INDXSIZE
+    _offset = 0
+
+    while len(restart) < 2 and _offset < 2 * _pagesize:
+
+        _page = readStreamRange(_partoffset, _clustersize, _stream, _offset, _pagesize)
+        if _page[:4] in ("RSTR", "CHKD"):
+            _header = unpackData(_page, 0, RSTR_DATA)
+
+            # size of the restart page is given by the page itself
+            if _header['sysPageSize'] != len(_page):
+                _pagesize = _header['sysPageSize']
+                _page = readStreamRange(_partoffset, _clustersize, _stream, _offset, _pagesize)
+
+            _page = applyFixup(_page)
+            if _page is not None:
+                _header.update(unpackData(_page, _header['areaOff'], RSTRAREA_DATA))
+                _header['offset'] = _offset
+                restart.append(_header)
+
+        _offset += _pagesize
+
+    return restart
+
+
+def currentRestart(_restart):
+    """
+    the valid restart page; the one with the newest LSN
+    :param _restart: list of restart pages from readLogRestart
+    :return: dictonary of the restart page
+    :raise VolumeError: no valid restart page
+    """
+
+    if not _restart:
+        err_note = "No valid restart page in $LogFile."
+        raise VolumeError(err_note)
+
+    return max(_restart, key=lambda x: x['currentLsn'])
+
+
+def iterLogRecords(_partoffset, _clustersize, _stream, _lastlsn=0, _restart=None):
+    """
+    decode the log record pages of $LogFile; pages whose last LSN is not newer than _lastlsn
+    are not decoded, records spanning pages are joined
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      $DATA stream of $LogFile (record 2)
+    :param _lastlsn:     last LSN seen by a former run (LSN cursor); 0 decodes everything
+    :param _restart:     restart pages from readLogRestart; read if None
+    :return: generator of dictonaries of LOGREC_DATA (and LOGCLIENT_DATA for client records)
+             with 'offset' (of the page in $LogFile)
+    """
+
+    if _restart is None:
+        _restart = readLogRestart(_partoffset, _clustersize, _stream)
+
+    _restart = currentRestart(_restart)
+    _pagesize = _restart['logPageSize']
+    _dataoffset = _restart['dataOff']
+    _seqbits = _restart['seqNrBits']
+
+    # two restart pages and two buffer pages, then the circular log
+    _pos = 2 * _restart['sysPageSize'] + 2 * _pagesize
+    _window = max(LOGWINDOW - LOGWINDOW % _pagesize, _pagesize)
+    _carry = None
+
+    while _pos < _stream['logSize']:
+
+        _chunk = readStreamRange(_partoffset, _clustersize, _stream, _pos, _window)
+        if not _chunk:
+            break
+
+        i = 0
+        while i + _pagesize <= len(_chunk):
+
+            _pageoffset = _pos + i
+            _page = _chunk[i:i + _pagesize]
+            i += _pagesize
+
+            if _page[:4] != "RCRD":
+                _carry = None
+                continue
+
+            # page is not newer than the cursor; skip without decoding
+            if struct.unpack_from("<Q", _page, 32)[0] <= _lastlsn:
+                _carry = None
+                continue
+
+            _page = applyFixup(_page)
+            if _page is None:
+                _carry = None
+                continue
+
+            _header = unpackData(_page, 0, RCRD_DATA)
+            _end = _header['nextRecOff'] if _dataoffset <= _header['nextRecOff'] <= _pagesize else _pagesize
+            _recpos = _dataoffset
+
+            # rest of a record from the page before
+            if _carry is not None:
+                (_recdata, _total, _startpage) = _carry
+                _recdata += _page[_recpos:_recpos + _total - len(_recdata)]
+                _recpos += (_total - len(_carry[0]) + 7) & ~7
+                _carry = None
+                if len(_recdata) < _total:
+                    _carry = (_recdata, _total, _startpage)
+                    continue
+                logrecord = readLogRecord(_recdata, _startpage)
+                if logrecord['lsn'] > _lastlsn:
+                    yield logrecord
+
+            # the page may start with the rest of a record of a skipped page; search the first record
+            else:
+                while _recpos + LOGREC_HEADER <= _end and \
+                        lsnOffset(struct.unpack_from("<Q", _page, _recpos)[0], _seqbits) != _pageoffset + _recpos:
+                    _recpos += 8
+
+            while _recpos + LOGREC_HEADER <= _end:
+
+                (_lsn, _datalength) = struct.unpack_from("<Q16xI", _page, _recpos)
+                # the LSN gives the position of the record in $LogFile
+                if _lsn == 0 or lsnOffset(_lsn, _seqbits) != _pageoffset + _recpos:
+                    break
+
+                _total = LOGREC_HEADER + _datalength
+                if _recpos + _total > _pagesize:
+                    _carry = (_page[_recpos:], _total, _pageoffset)
+                    break
+
+                logrecord = readLogRecord(_page[_recpos:_recpos + _total], _pageoffset)
+                if logrecord['lsn'] > _lastlsn:
+                    yield logrecord
+
+                _recpos += (_total + 7) & ~7
+
+        _pos += len(_chunk)
+
+
+def lsnOffset(_lsn, _seqbits):
+    """
+    position of a log record in $LogFile, given by its LSN
+    :param _lsn:     LSN
+    :param _seqbits: bits of the sequence number (restart area)
+    :return: offset in $LogFile
+    """
+
+    return ((_lsn << _seqbits) & 0xffffffffffffffff) >> (_seqbits - 3)
+
+
+def readLogRecord(_record, _pageoffset):
+    """
+    decode one log record
+    :param _record:     complete log record
+    :param _pageoffset: offset of the page in $LogFile, where the record starts
+    :return: dictonary of LOGREC_DATA and for client records LOGCLIENT_DATA
+    """
+
+    logrecord = unpackData(_record, 0, LOGREC_DATA)
+    logrecord['offset'] = _pageoffset
+
+    if logrecord['recType'] == 1 and len(_record) >= 80:
+        logrecord.update(unpackData(_record, 0, LOGCLIENT_DATA))
+
+    return logrecord
+
+
+def readLsnCursor(_cursorfile):
+    """
+    read the last LSN seen from the cursor file
+    :param _cursorfile: path of the cursor file
+    :return: LSN; 0 if the file doesn't exist
+    """
+
+    try:
+        with open(_cursorfile, "r") as cursor:
+            return int(cursor.read().strip() or 0)
+    except IOError:
+        return 0
+    except ValueError:
+        err_note = "LSN cursor file '{}' is damaged.".format(_cursorfile)
+        raise StateFileError(err_note)
+
+
+def writeLsnCursor(_cursorfile, _lsn):
+    """
+    write the last LSN seen into the cursor file; replaced at once, so a broken run keeps the old cursor
+    :param _cursorfile: path of the cursor file
+    :param _lsn:        last LSN seen
+    :return: nothing
+    """
+
+    with open(_cursorfile + ".tmp", "w") as cursor:
+        cursor.write("{}\n".format(_lsn))
+
+    os.rename(_cursorfile + ".tmp", _cursorfile)
+
+
+'''
+Snapshot
+'''
+
+def recordFingerprint(_record):
+    """
+    compact fingerprint of a raw record: sequence number, $LogFile LSN and hash of the record
+    :param _record: raw record
+    :return: packed SNAPSHOT_ENTRY
+    """
+
+    if _record[:4] != "FILE":
+        return SNAPSHOT_ENTRY.pack(0, 0, 0, 0, hashlib.md5(_record).digest())
+
+    (_lsn, _sequence, _flags) = struct.unpack_from("<QH4xH", _record, 8)
+
+    return SNAPSHOT_ENTRY.pack(1, _flags, _sequence, _lsn, hashlib.md5(_record).digest())
+
+
+def compareFingerprint(_old, _new):
+    """
+    classify the change of a record between two fingerprints
+    :param _old: SNAPSHOT_ENTRY of the old snapshot or None if the record didn't exist
+    :param _new: SNAPSHOT_ENTRY of the new image or None if the record doesn't exist anymore
+    :return: "added", "deleted", "reused", "modified" or None if nothing of interest changed
+    """
+
+    (_oldfile, _oldflags, _oldseq, _oldlsn, _oldhash) = SNAPSHOT_ENTRY.unpack(_old) if _old else (0, 0, 0, 0, "")
+    (_newfile, _newflags, _newseq, _newlsn, _newhash) = SNAPSHOT_ENTRY.unpack(_new) if _new else (0, 0, 0, 0, "")
+
+    _oldused = _oldfile and _oldflags & 1
+    _newused = _newfile and _newflags & 1
+
+    if _oldused and not _newused:
+        return "deleted"
+    if _newused and not _oldused:
+        return "added"
+    if _newused and _oldseq != _newseq:
+        return "reused"
+    if _newused:
+        return "modified"
+
+    return None
+
+
+def openSnapshot(_snapshotfile):
+    """
+    map a snapshot file and check its header
+    :param _snapshotfile: path of the snapshot
+    :return: (mmap of the file, number of records)
+    :raise StateFileError: empty, cut off or no snapshot of this tool
+    """
+
+    with open(_snapshotfile, "rb") as _file:
+        _size = os.fstat(_file.fileno()).st_size
+        # an empty file can't be mapped
+        if _size < SNAPSHOT_HEADER.size:
+            err_note = "'{}' is empty or no snapshot of this tool.".format(_snapshotfile)
+            raise StateFileError(err_note)
+        _snapshot = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    (_magic, _recordsize, _count) = SNAPSHOT_HEADER.unpack_from(_snapshot, 0)
+
+    if _magic != SNAPSHOT_MAGIC or _recordsize != RECORDSIZE:
+        _snapshot.close()
+        err_note = "'{}' is not a snapshot of this tool.".format(_snapshotfile)
+        raise StateFileError(err_note)
+
+    if _size < SNAPSHOT_HEADER.size + _count * SNAPSHOT_ENTRY.size:
+        _snapshot.close()
+        err_note = "Snapshot '{}' is cut off ({} of {} records).".format(
+            _snapshotfile, (_size - SNAPSHOT_HEADER.size) // SNAPSHOT_ENTRY.size, _count)
+        raise StateFileError(err_note)
+
+    return _snapshot, _count
+
+
+def snapshotScan(_partoffset, _clustersize, _datarunMFT, _oldsnapshot=None, _newsnapshot=None):
+    """
+    compare the MFT with a saved snapshot and/or save the snapshot of the MFT; only records with
+    a changed fingerprint are parsed
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _oldsnapshot: path of the snapshot to compare with or None
+    :param _newsnapshot: path to save the snapshot to or None
+    :return: generator of (change, recordnumber, sequence, filename)
+    """
+
+    _old = None
+    _oldcount = 0
+    if _oldsnapshot:
+        (_old, _oldcount) = openSnapshot(_oldsnapshot)
+
+    _new = None
+    if _newsnapshot:
+        # written beside and renamed at the end, so the old snapshot may be the same file
+        _new = open(_newsnapshot + ".tmp", "wb")
+        _new.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, RECORDSIZE, 0))
+
+    _count = 0
+    for (_recordnr, _offset, _record) in iterMFTRecords(_partoffset, _clustersize, _datarunMFT):
+
+        _fingerprint = recordFingerprint(_record)
+        _count += 1
+
+        if _new is not None:
+            _new.write(_fingerprint)
+
+        if _old is None:
+            continue
+
+        _oldfingerprint = None
+        if _recordnr < _oldcount:
+            _entry = SNAPSHOT_HEADER.size + _recordnr * SNAPSHOT_ENTRY.size
+            _oldfingerprint = _old[_entry:_entry + SNAPSHOT_ENTRY.size]
+            # unchanged; nothing to parse
+            if _oldfingerprint == _fingerprint:
+                continue
+
+        _change = compareFingerprint(_oldfingerprint, _fingerprint)
+        if _change is None:
+            continue
+
+        _filename = ""
+        _fixed = applyFixup(_record) if _record[:4] == "FILE" else None
+        if _fixed is not None:
+            _filename = recordFilename(_fixed)
+
+        yield _change, _recordnr, struct.unpack_from("<H", _record, 16)[0], _filename
+
+    # records of the old snapshot behind the end of the MFT
+    _recordnr = _count
+    while _recordnr < _oldcount:
+        _entry = SNAPSHOT_HEADER.size + _recordnr * SNAPSHOT_ENTRY.size
+        _oldfingerprint = _old[_entry:_entry + SNAPSHOT_ENTRY.size]
+        if compareFingerprint(_oldfingerprint, None) is not None:
+            yield "deleted", _recordnr, SNAPSHOT_ENTRY.unpack(_oldfingerprint)[2], ""
+        _recordnr += 1
+
+    if _old is not None:
+        _old.close()
+
+    if _new is not None:
+        _new.seek(0)
+        _new.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, RECORDSIZE, _count))
+        _new.close()
+        os.rename(_newsnapshot + ".tmp", _newsnapshot)
+
+
+'''
+Security descriptors
+'''
+
+def readSid(_buffer, _pos):
+    """
+    read a SID
+    :param _buffer: raw data
+    :param _pos:    start of the SID
+    :return: SID as string like 'S-1-5-18'
+    """
+
+    (_revision, _count) = struct.unpack_from("<BB", _buffer, _pos)
+    _authority = struct.unpack(">Q", "\0\0" + _buffer[_pos + 2:_pos + 8])[0]
+    _subauthorities = struct.unpack_from("<{}I".format(_count), _buffer, _pos + 8)
+
+    return "S-{}-{}".format(_revision, _authority) + "".join("-{}".format(_sub) for _sub in _subauthorities)
+
+
+def readAcl(_buffer, _pos):
+    """
+    read the entries of an access control list
+    :param _buffer: raw data
+    :param _pos:    start of the ACL
+    :return: list of ACE dictonaries {'type', 'flags', 'mask', 'sid'}; 'sid' is None for object ACEs
+    """
+
+    (_size, _count) = struct.unpack_from("<2xHH", _buffer, _pos)
+    _end = min(_pos + _size, len(_buffer))
+    _pos += 8
+
+    entries = []
+
+    for _i in range(_count):
+
+        if _pos + 8 > _end:
+            break
+
+        (_type, _flags, _acesize, _mask) = struct.unpack_from("<BBHI", _buffer, _pos)
+        if _acesize < 8:
+            break
+
+        # object ACEs have GUIDs in front of the SID
+        _sid = readSid(_buffer, _pos + 8) if _type not in (5, 6, 7, 8) and _acesize >= 16 else None
+
+        entries.append({'type': _type, 'flags': _flags, 'mask': _mask, 'sid': _sid})
+        _pos += _acesize
+
+    return entries
+
+
+def parseSecurityDescriptor(_buffer, _pos=0):
+    """
+    decode a self-relative security descriptor
+    :param _buffer: raw data
+    :param _pos:    start of the descriptor
+    :return: dictonary {'control', 'owner', 'group', 'dacl', 'sacl'}; 'dacl' is None without DACL,
+             'sacl' is the number of audit entries
+    """
+
+    if len(_buffer) < _pos + 20:
+        err_note = "Security descriptor too short ({} bytes).".format(len(_buffer) - _pos)
+        raise ValueError(err_note)
+
+    _header = unpackData(_buffer, _pos, SECDESC_DATA)
+
+    descriptor = {'control': _header['control'], 'owner': None, 'group': None, 'dacl': None, 'sacl': 0}
+
+    if _header['ownerOff']:
+        descriptor['owner'] = readSid(_buffer, _pos + _header['ownerOff'])
+    if _header['groupOff']:
+        descriptor['group'] = readSid(_buffer, _pos + _header['groupOff'])
+    if _header['control'] & 0x0004 and _header['daclOff']:
+        descriptor['dacl'] = readAcl(_buffer, _pos + _header['daclOff'])
+    if _header['control'] & 0x0010 and _header['saclOff']:
+        descriptor['sacl'] = len(readAcl(_buffer, _pos + _header['saclOff']))
+
+    return descriptor
+
+
+def sidName(_sid):
+    """
+    SID with the name of a well known SID
+    :param _sid: SID from readSid or None
+    :return: string like 'S-1-5-18 (SYSTEM)'
+    """
+
+    if _sid is None:
+        return "n/a"
+
+    return "{} ({})".format(_sid, WELLKNOWN_SID[_sid]) if _sid in WELLKNOWN_SID else _sid
+
+
+def formatSecurity(_descriptor):
+    """
+    build the template of a security descriptor
+    :param _descriptor: dictonary from parseSecurityDescriptor
+    :return: owner, group, control flags, summary and entries of the DACL
+    """
+
+    _control = ", ".join(SECURITY_CONTROL[_bit] for _bit in sorted(SECURITY_CONTROL) if _descriptor['control'] & _bit)
+
+    if _descriptor['dacl'] is None:
+        _dacl = "none (full access for everyone)"
+    else:
+        _types = collections.Counter(ACE_TYPE.get(_ace['type'], "Type {}".format(_ace['type']))
+                                     for _ace in _descriptor['dacl'])
+        _dacl = "{} entries".format(len(_descriptor['dacl']))
+        if _types:
+            _dacl += " (" + ", ".join("{} {}".format(_count, _type) for (_type, _count) in sorted(_types.items())) + ")"
+
+    output = SECURITY.substitute(owner=sidName(_descriptor['owner']), group=sidName(_descriptor['group']),
+                                 control=_control or "none", dacl=_dacl)
+
+    for _ace in _descriptor['dacl'] or []:
+        output += ACEENTRY.substitute(acetype=ACE_TYPE.get(_ace['type'], "Type {}".format(_ace['type'])),
+                                      sid=sidName(_ace['sid']), mask="0x{:08x}".format(_ace['mask']),
+                                      flags="0x{:02x}".format(_ace['flags']))
+
+    return output
+
+
+def recordSecurityId(_record):
+    """
+    security id of the $STANDARD_INFORMATION of a record
+    :param _record: record from applyFixup
+    :return: security id or None for NTFS 1.x records and records without $STANDARD_INFORMATION
+    """
+
+    for _header in iterAttributes(_record):
+        if _header['attHex'] == "10000000" and _header['resident'] == 0:
+            _content = residentContent(_record, _header)
+            if len(_content) >= 56:
+                return struct.unpack_from("<I", _content, 52)[0]
+            return None
+
+    return None
+
+
+def siiSearch(_buffer, _nodeoffset, _end, _securityid):
+    """
+    search a security id in one index node of $Secure:$SII; the entries are sorted by security id
+    :param _buffer:     raw data
+    :param _nodeoffset: start of the node header
+    :param _end:        end of the usable data
+    :param _securityid: security id to search
+    :return: (SDSENTRY_DATA dictonary or None, vcn of the subnode to search next or None)
+    """
+
+    (_entryoffset, _indexsize) = struct.unpack_from("<II", _buffer, _nodeoffset)
+    _pos = _nodeoffset + _entryoffset
+    _end = min(_nodeoffset + _indexsize, _end)
+
+    while _pos + 16 <= _end:
+
+        (_dataoffset, _datalength, _entrylength, _flags) = struct.unpack_from("<HH4xHxxH", _buffer, _pos)
+        if _entrylength < 16 or _pos + _entrylength > _end:
+            break
+
+        # the last entry or a larger key: the id can only be in the subnode in front of it
+        _last = _flags & 2 or _pos + 20 > _end
+        if _last or struct.unpack_from("<I", _buffer, _pos + 16)[0] > _securityid:
+            if _flags & 1:
+                return None, struct.unpack_from("<Q", _buffer, _pos + _entrylength - 8)[0]
+            return None, None
+
+        if struct.unpack_from("<I", _buffer, _pos + 16)[0] == _securityid:
+            if _datalength >= SDSENTRY_HEADER and _pos + _dataoffset + SDSENTRY_HEADER <= _end:
+                return unpackData(_buffer, _pos + _dataoffset, SDSENTRY_DATA), None
+            return None, None
+
+        _pos += _entrylength
+
+    return None, None
+
+
+def openSecurity(_partoffset, _clustersize, _datarunMFT):
+    """
+    find the streams of $Secure; only its record is read, the index $SII is searched and the
+    descriptors in $SDS are read and parsed on demand
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :return: dictonary {'sds', 'root', 'sii', 'indexsize', 'vcnsize', 'cache', 'cachesize'}; 'root' is the
+             content of the $INDEX_ROOT of $SII, 'sii' its $INDEX_ALLOCATION stream or None
+    """
+
+    _record = readRecord(extentOffset(mftExtents(_partoffset, _clustersize, _datarunMFT), SECURERECORD))
+    _extensions = loadExtensions(_partoffset, _clustersize, _datarunMFT, SECURERECORD, _record)
+
+    _sds = findStream(_record, u"$SDS", "80000000", _extensions)
+    if _sds is None:
+        err_note = "No $Secure:$SDS found. Volume older than NTFS 3.0?"
+        raise VolumeError(err_note)
+
+    _root = None
+
+    for _part in [_record] + _extensions:
+        for _header in iterAttributes(_part):
+            if _header['attHex'] == "90000000" and _header['attName'] == u"$SII" and _header['resident'] == 0:
+                _root = residentContent(_part, _header)
+
+    if _root is None or len(_root) < 32:
+        err_note = "No $Secure:$SII found."
+        raise VolumeError(err_note)
+
+    _stream = findStream(_record, u"$SII", "a0000000", _extensions)
+    _indexsize = struct.unpack_from("<I", _root, 8)[0]
+
+    # the vcn of an index record counts clusters, or 512 byte blocks if the index records are smaller
+    return {'sds': _sds, 'root': _root, 'sii': _stream if _stream is not None and not _stream['resident'] else None,
+            'indexsize': _indexsize, 'vcnsize': _clustersize if _indexsize >= _clustersize else 512,
+            'cache': collections.OrderedDict(), 'cachesize': SECURITYCACHE}
+
+
+def findSecurityEntry(_partoffset, _clustersize, _security, _securityid):
+    """
+    search the $SDS entry of a security id from the root of $SII down; only the index records on the
+    path are read
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _security:    dictonary from openSecurity
+    :param _securityid:  security id from $STANDARD_INFORMATION
+    :return: SDSENTRY_DATA dictonary
+    """
+
+    (_entry, _vcn) = siiSearch(_security['root'], 16, len(_security['root']), _securityid)
+    _visited = set()
+
+    while _entry is None and _vcn is not None and _security['sii'] is not None and _vcn not in _visited:
+        _visited.add(_vcn)
+        _block = readStreamRange(_partoffset, _clustersize, _security['sii'], _vcn * _security['vcnsize'],
+                                 _security['indexsize'])
+        _block = applyFixup(_block) if _block[:4] == "INDX" else None
+        if _block is None:
+            err_note = "Index record at vcn {} of $Secure:$SII is damaged.".format(_vcn)
+            raise RecordError(err_note)
+        (_entry, _vcn) = siiSearch(_block, 24, len(_block), _securityid)
+
+    if _entry is None:
+        err_note = "Security id {} not found in $Secure:$SII.".format(_securityid)
+        raise RecordNotFound(err_note)
+
+    return _entry
+
+
+def securityDescriptor(_partoffset, _clustersize, _security, _securityid):
+    """
+    parsed security descriptor of a security id; descriptors are shared by many files, so they are
+    parsed once and kept in the cache of _security
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _security:    dictonary from openSecurity
+    :param _securityid:  security id from $STANDARD_INFORMATION
+    :return: dictonary from parseSecurityDescriptor
+    """
+
+    with volumeLock:
+        descriptor = _security['cache'].pop(_securityid, None)
+        if descriptor is not None:
+            _security['cache'][_securityid] = descriptor
+            countStat('descriptorHits')
+            return descriptor
+
+    _sdsentry = findSecurityEntry(_partoffset, _clustersize, _security, _securityid)
+    (_offset, _length) = (_sdsentry['sdsOff'], _sdsentry['sdsLen'])
+    _entry = readStreamRange(_partoffset, _clustersize, _security['sds'], _offset, _length)
+
+    try:
+        _header = unpackData(_entry, 0, SDSENTRY_DATA)
+        if _header['securityId'] != _securityid:
+            err_note = "Entry at offset {} of $SDS belongs to security id {}.".format(_offset,
+                                                                                   _header['securityId'])
+            raise ValueError(err_note)
+        descriptor = parseSecurityDescriptor(_entry, SDSENTRY_HEADER)
+    except (struct.error, ValueError) as err:
+        err_note = "Damaged security descriptor {} ({})".format(_securityid, err)
+        raise RecordError(err_note)
+
+    countStat('descriptors')
+
+    with volumeLock:
+        _security['cache'][_securityid] = descriptor
+        if len(_security['cache']) > _security['cachesize']:
+            _security['cache'].popitem(last=False)
+
+    return descriptor
+
+
+'''
+Reparse points
+'''
+
+def reparseNames(_content):
+    """
+    decode substitute and print name of a mount point, junction or symbolic link
+    :param _content: content of $REPARSE_POINT
+    :return: dictonary {'tag', 'type', 'substitute', 'print', 'relative'} or None for other reparse tags
+    """
+
+    _header = unpackData(_content, 0, REPARSEPOINT_DATA)
+
+    if _header['tag'] == REPARSE_MOUNTPOINT:
+        _buffer = 16
+        _relative = False
+    elif _header['tag'] == REPARSE_SYMLINK:
+        _buffer = 20
+        _relative = bool(struct.unpack_from("<I", _content, 16)[0] & 1)
+    else:
+        return None
+
+    _end = min(len(_content), 8 + _header['dataLen'])
+    _names = []
+
+    for (_offset, _length) in ((_header['nameOff'], _header['nameLen']), (_header['prNameOff'], _header['prNameLen'])):
+        if _buffer + _offset + _length > _end:
+            err_note = "Reparse name ({} bytes at {}) behind the reparse data.".format(_length, _offset)
+            raise ValueError(err_note)
+        _names.append(_content[_buffer + _offset:_buffer + _offset + _length].decode("utf-16le", "replace"))
+
+    # both are mount point reparse points; a volume mount point links to a volume instead of a directory
+    if _header['tag'] == REPARSE_SYMLINK:
+        _type = "Symbolic Link"
+    elif _names[0].lower().startswith(u"\\??\\volume{"):
+        _type = "Mount Point"
+    else:
+        _type = "Junction"
+
+    return {'tag': _header['tag'], 'type': _type, 'substitute': _names[0], 'print': _names[1],
+            'relative': _relative}
+
+
+def recordReparse(_record, _extensions=()):
+    """
+    reparse names of a record
+    :param _record:     record from applyFixup
+    :param _extensions: extension records of the record
+    :return: dictonary from reparseNames or None if the record is no link
+    """
+
+    _stream = findStream(_record, u"", "c0000000", _extensions)
+
+    # a non resident $REPARSE_POINT holds other data than links
+    if _stream is None or not _stream['resident']:
+        return None
+
+    return reparseNames(_stream['content'])
+
+
+def reparseTargetPath(_names, _linkpath):
+    """
+    path of the target on the same volume
+    :param _names:    dictonary from reparseNames
+    :param _linkpath: path of the link like u'\\dir\\link'; relative links start at its directory
+    :return: path like u'\\dir\\target' or None if the target is another volume or a network path
+    """
+
+    _target = _names['substitute']
+
+    if _names['relative']:
+        return _linkpath.rsplit(u"\\", 1)[0] + u"\\" + _target
+
+    if _target.startswith(u"\\??\\"):
+        _target = _target[4:]
+
+    # the drive letter of the volume is not known; the target is taken from this volume
+    if len(_target) >= 2 and _target[1] == u":":
+        return _target[2:] or u"\\"
+
+    return None
+
+
+'''
+Cluster bitmap
+'''
+
+def readBitmap(_partoffset, _clustersize, _datarunMFT):
+    """
+    read the cluster bitmap of the volume ($DATA of record 6 $Bitmap)
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :return: bitmap; one bit per cluster, set if allocated
+    """
+
+    _stream = readRecordStream(_partoffset, _clustersize, _datarunMFT, 6)
+
+    return readStreamRange(_partoffset, _clustersize, _stream, 0,
+                           len(_stream['content']) if _stream['resident'] else _stream['logSize'])
+
+
+def volumeClusters(_vbrdata):
+    """
+    number of clusters of the volume; the bitmap is rounded up to 8 bytes
+    :param _vbrdata: VBR data from findMFT
+    :return: number of clusters
+    """
+
+    return _vbrdata['sectorstotal'] // _vbrdata['spc']
+
+
+def bitmapClusters(_bitmap, _clusters=None):
+    """
+    clusters described by a bitmap
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters; the bits behind are ignored
+    :return: number of clusters
+    """
+
+    return len(_bitmap) * 8 if _clusters is None else min(_clusters, len(_bitmap) * 8)
+
+
+def clusterAllocated(_bitmap, _lcn):
+    """
+    allocation state of one cluster
+    :param _bitmap: bitmap from readBitmap
+    :param _lcn:    cluster number
+    :return: True if allocated
+    """
+
+    if not 0 <= _lcn < len(_bitmap) * 8:
+        err_note = "Cluster {} is not part of the volume.".format(_lcn)
+        raise VolumeError(err_note)
+
+    return bool(ord(_bitmap[_lcn >> 3]) & (1 << (_lcn & 7)))
+
+
+def bitmapCounts(_bitmap, _clusters=None):
+    """
+    count the allocated and free clusters
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters
+    :return: (allocated, free)
+    """
+
+    _clusters = bitmapClusters(_bitmap, _clusters)
+    _full = _clusters // 8
+
+    if numpy is not None:
+        _table = numpy.array(POPCOUNT, dtype=numpy.uint8)
+        _used = int(_table[numpy.frombuffer(_bitmap, numpy.uint8, _full)].sum(dtype=numpy.int64))
+    else:
+        # completely allocated bytes at once, the bits only of the partly allocated bytes
+        _used = 8 * _bitmap.count("\xff", 0, _full)
+        for _match in re.finditer(r"[^\x00\xff]+", _bitmap[:_full]):
+            _used += sum(POPCOUNT[ord(_byte)] for _byte in _match.group())
+
+    # bits of the last byte belonging to the volume
+    for _lcn in range(_full * 8, _clusters):
+        _used += clusterAllocated(_bitmap, _lcn)
+
+    return _used, _clusters - _used
+
+
+def freeChunk(_chunk, _base):
+    """
+    free extents of a part of the bitmap
+    :param _chunk: part of the bitmap
+    :param _base:  cluster number of the first bit
+    :return: (starts, lengths); numpy arrays or lists
+    """
+
+    if numpy is not None:
+        _bytes = numpy.frombuffer(_chunk, numpy.uint8)
+        if _bytes.min() == 0xff:
+            return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64)
+        # unpackbits starts with the highest bit; the bitmap with the lowest
+        _free = (numpy.unpackbits(_bytes).reshape(-1, 8)[:, ::-1].ravel() == 0).astype(numpy.int8)
+        _edges = numpy.diff(numpy.concatenate(([0], _free, [0])))
+        _starts = numpy.flatnonzero(_edges == 1).astype(numpy.int64)
+        _ends = numpy.flatnonzero(_edges == -1).astype(numpy.int64)
+        return _starts + _base, _ends - _starts
+
+    _starts = []
+    _lengths = []
+
+    # completely free bytes at once, bit by bit only the partly allocated bytes
+    for _match in re.finditer(r"\x00+|[^\x00\xff]", _chunk):
+
+        _lcn = _base + _match.start() * 8
+
+        if _match.group()[0] == "\x00":
+            _free = [(_lcn, 8 * len(_match.group()))]
+        else:
+            _byte = ord(_match.group())
+            _free = [(_lcn + _bit, 1) for _bit in range(8) if not _byte & (1 << _bit)]
+
+        for (_start, _count) in _free:
+            # join with the last extent
+            if _starts and _starts[-1] + _lengths[-1] == _start:
+                _lengths[-1] += _count
+            else:
+                _starts.append(_start)
+                _lengths.append(_count)
+
+    return _starts, _lengths
+
+
+def iterFreeChunks(_bitmap, _clusters=None):
+    """
+    free extents of the bitmap, BITMAPCHUNK bytes at once; an extent crossing the end of a chunk
+    is held back and joined with the next chunk
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters
+    :return: generator of (starts, lengths) from freeChunk
+    """
+
+    _clusters = bitmapClusters(_bitmap, _clusters)
+    _end = (_clusters + 7) // 8
+    _carry = None
+
+    for _position in range(0, _end, BITMAPCHUNK):
+
+        (_starts, _lengths) = freeChunk(_bitmap[_position:min(_position + BITMAPCHUNK, _end)], _position * 8)
+
+        # the bits of the last byte behind the volume
+        while len(_starts) and _starts[-1] >= _clusters:
+            (_starts, _lengths) = (_starts[:-1], _lengths[:-1])
+        if len(_starts) and _starts[-1] + _lengths[-1] > _clusters:
+            _lengths[-1] = _clusters - _starts[-1]
+
+        if _carry is not None:
+            if len(_starts) and _starts[0] == _carry[0] + _carry[1]:
+                _starts[0] = _carry[0]
+                _lengths[0] += _carry[1]
+            else:
+                yield [_carry[0]], [_carry[1]]
+
+        _carry = None
+        if len(_starts):
+            _carry = (int(_starts[-1]), int(_lengths[-1]))
+            (_starts, _lengths) = (_starts[:-1], _lengths[:-1])
+
+        yield _starts, _lengths
+
+    if _carry is not None:
+        yield [_carry[0]], [_carry[1]]
+
+
+def freeExtents(_bitmap, _clusters=None):
+    """
+    all free extents as arrays
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters
+    :return: (starts, lengths); numpy int64 arrays or arrays of the array module
+    """
+
+    if numpy is not None:
+        _chunks = [(numpy.asarray(_starts, numpy.int64), numpy.asarray(_lengths, numpy.int64))
+                   for (_starts, _lengths) in iterFreeChunks(_bitmap, _clusters)]
+        if not _chunks:
+            return numpy.zeros(0, numpy.int64), numpy.zeros(0, numpy.int64)
+        return numpy.concatenate([_chunk[0] for _chunk in _chunks]), numpy.concatenate([_chunk[1] for _chunk in _chunks])
+
+    _allstarts = array.array(ARRAYQWORD)
+    _alllengths = array.array(ARRAYQWORD)
+    for (_starts, _lengths) in iterFreeChunks(_bitmap, _clusters):
+        _allstarts.extend(_starts)
+        _alllengths.extend(_lengths)
+
+    return _allstarts, _alllengths
+
+
+def iterUnallocated(_bitmap, _clusters=None):
+    """
+    walk the unallocated clusters of the bitmap
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters
+    :return: generator of (first cluster, number of clusters)
+    """
+
+    for (_starts, _lengths) in iterFreeChunks(_bitmap, _clusters):
+        for (_start, _length) in zip(_starts, _lengths):
+            yield int(_start), int(_length)
+
+
+def unallocatedRanges(_bitmap, _clusters=None):
+    """
+    find the unallocated clusters in the cluster bitmap
+    :param _bitmap:   bitmap from readBitmap
+    :param _clusters: clusters of the volume from volumeClusters
+    :return: list of (first cluster, number of clusters)
+    """
+
+    return list(iterUnallocated(_bitmap, _clusters))
+
+
+'''
+Carving
+'''
+
+def imageSize():
+    """
+    size of the opened image or device
+    :return: size in bytes
+    """
+
+    (_file, _lock) = currentFile()
+
+    with _lock:
+        _file.seek(0, os.SEEK_END)
+        return _file.tell()
+
+
+def validFileRecord(_record):
+    """
+    check a carved FILE record: update sequence, header values and the chain of attributes
+    :param _record: raw record
+    :return: fixed record or None
+    """
+
+    _record = applyFixup(_record)
+    if _record is None:
+        return None
+
+    (_attstart, _flag, _usedbytes, _allocbytes) = struct.unpack_from("<HHII", _record, 20)
+    if _allocbytes != RECORDSIZE or _usedbytes > _allocbytes or _attstart < 42 or _attstart + 8 > _usedbytes:
+        return None
+
+    _known = [key['hex'] for key in ATTRIBUTES]
+    _attpos = _attstart
+    _attributes = 0
+
+    while _attpos + 8 <= _usedbytes:
+
+        _atthex = binascii.hexlify(_record[_attpos:_attpos + 4])
+        if _atthex == "ffffffff":
+            # the normal parser needs at least one attribute
+            return _record if _attributes else None
+
+        _attlen = struct.unpack_from("<I", _record, _attpos + 4)[0]
+        if _atthex not in _known or _attlen < 16 or _attlen % 8 != 0 or _attpos + _attlen > _usedbytes:
+            return None
+
+        _attpos += _attlen
+        _attributes += 1
+
+    return None
+
+
+def validIndexRecord(_record):
+    """
+    check a carved INDX record: update sequence and node header
+    :param _record: raw index record of INDXSIZE bytes
+    :return: fixed record or None
+    """
+
+    if len(_record) < INDXSIZE:
+        return None
+
+    _record = applyFixup(_record)
+    if _record is None:
+        return None
+
+    (_entryoffset, _indexsize, _allocsize) = struct.unpack_from("<III", _record, 24)
+    if _allocsize + 24 != INDXSIZE or _indexsize > _allocsize or _entryoffset < 16 or _entryoffset > _indexsize:
+        return None
+
+    return _record
+
+
+def carveRecords(_ranges, _window=CARVEWINDOW, _startoffset=0):
+    """
+    search FILE and INDX records at sector boundaries in large windows
+    :param _ranges: list of (absolute offset, length) to search; ascending
+    :param _window: bytes to search at once
+    :param _startoffset: absolute offset to start at; everything before is skipped
+    :return: generator of (absolute offset, signature, fixed record); after every window
+             (end of window, None, None), which is where a checkpoint can resume
+    """
+
+    _validate = {"FILE": (RECORDSIZE, validFileRecord), "INDX": (INDXSIZE, validIndexRecord)}
+
+    for (_start, _length) in _ranges:
+
+        if _start + _length <= _startoffset:
+            continue
+
+        _pos = max(0, _startoffset - _start)
+        while _pos < _length:
+
+            _windowstart = _start + _pos
+            _buffer = readRaw(_windowstart, min(_window, _length - _pos))
+            if not _buffer:
+                break
+
+            _hits = []
+            for _signature in _validate:
+                i = _buffer.find(_signature)
+                while i != -1:
+                    if (_windowstart + i) % SECTORSIZE == 0:
+                        _hits.append((i, _signature))
+                    i = _buffer.find(_signature, i + 1)
+
+            for (i, _signature) in sorted(_hits):
+
+                (_size, _check) = _validate[_signature]
+                _record = _buffer[i:i + _size]
+                # record is cut by the window
+                if len(_record) < _size:
+                    _record = readRaw(_windowstart + i, _size)
+
+                _record = _check(_record)
+                if _record is not None:
+                    yield _windowstart + i, _signature, _record
+
+            _pos += len(_buffer)
+            yield _windowstart + len(_buffer), None, None
+
+
+'''
+Cluster map
+'''
+
+def streamLabel(_header):
+    """
+    name of an attribute in a cluster map, e.g. $DATA, $DATA:Zone.Identifier, $INDEX_ALLOCATION:$I30
+    :param _header: attribute header from iterAttributes
+    :return: unicode
+    """
+
+    _type = [key['name'] for key in ATTRIBUTES if key['hex'] == _header['attHex']]
+    _label = u"$" + (_type[0].upper().replace(u" ", u"_") if _type else _header['attHex'])
+
+    return _label + u":" + _header['attName'] if _header['attName'] else _label
+
+
+def buildClusterMap(_partoffset, _clustersize, _datarunMFT, _maxmemory=None):
+    """
+    collect the runs of all non resident attributes of all records (also deleted ones) into an interval index;
+    runs of extension records belong to their base record. The runs are split into layers of runs which
+    don't overlap (see clusterMapLayers); a lookup is one binary search per layer. Sort and runs stay
+    within the memory budget: the runs are sorted by externalSort and kept in a memory-mapped temporary
+    file if they don't fit
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _maxmemory:   memory budget in bytes; default SORTMEMORY, limited by MAXMEMORY
+    :return: cluster map dictonary {'clustersize', 'offset', 'count', 'layers', 'runs', 'base', 'labels'};
+             'runs' holds 'count' CLUSTERMAP_RUN entries from 'base' on, sorted by layer and start cluster,
+             'layers' the first entry of every layer and the end, 'labels' the stream names
+    """
+
+    if _maxmemory is None:
+        _maxmemory = memoryBudget(SORTMEMORY)
+
+    _labels = {}
+    _map = layeredRuns(clusterMapRuns(_partoffset, _clustersize, _datarunMFT, _labels), _maxmemory)
+
+    _map['clustersize'] = _clustersize
+    _map['offset'] = _partoffset
+    _map['labels'] = [_label for (_label, i) in sorted(_labels.items(), key=lambda item: item[1])]
+
+    return _map
+
+
+def layeredRuns(_lines, _maxmemory):
+    """
+    sort runs into the layers of a cluster map
+    :param _lines:     hex lines of CLUSTERMAP_RUN in any order
+    :param _maxmemory: memory budget in bytes
+    :return: dictonary {'count', 'layers', 'runs', 'base'} like buildClusterMap
+    """
+
+    _layers = []
+    _runfile = tempfile.TemporaryFile(prefix="mftcmap")
+
+    # sorted by start to find the layers, then by layer and start
+    for _line in externalSort(clusterMapLayers(externalSort(_lines, _maxmemory)), _maxmemory):
+        _layer = int(_line[:8], 16)
+        while len(_layers) <= _layer:
+            _layers.append(_runfile.tell() // CLUSTERMAP_RUN.size)
+        _runfile.write(binascii.unhexlify(_line[8:]))
+
+    _count = _runfile.tell() // CLUSTERMAP_RUN.size
+    _layers.append(_count)
+
+    _map = {'count': _count, 'layers': _layers, 'base': 0}
+
+    _runfile.seek(0)
+    if _count * CLUSTERMAP_RUN.size <= _maxmemory:
+        _map['runs'] = _runfile.read()
+    else:
+        _map['runs'] = mmap.mmap(_runfile.fileno(), 0, access=mmap.ACCESS_READ)
+    _runfile.close()
+
+    return _map
+
+
+def clusterMapRuns(_partoffset, _clustersize, _datarunMFT, _labels):
+    """
+    runs of all non resident attributes for buildClusterMap
+    :param _labels: dictonary {stream label: number}, filled with the labels found
+    :return: generator of hex lines of CLUSTERMAP_RUN; they sort by start cluster
+    """
+
+    for (_recordnr, _offset, _record) in iterMFTRecords(_partoffset, _clustersize, _datarunMFT):
+
+        if _record[:4] != "FILE":
+            continue
+
+        _record = applyFixup(_record)
+        if _record is None:
+            continue
+
+        _inuse = struct.unpack_from("<H", _record, 22)[0] & 1
+        _owner = struct.unpack_from("<Q", _record, 32)[0] & 0xffffffffffff or _recordnr
+
+        try:
+            for _header in iterAttributes(_record):
+
+                if _header['resident'] == 0:
+                    continue
+
+                _nonres = unpackData(_record, _header['attPos'], DATAnonres_DATA)
+                _label = _labels.setdefault(streamLabel(_header), len(_labels))
+
+                for _run in decodeRunlist(_record, _header['attPos'] + _nonres['runOff'],
+                                          _header['attPos'] + _header['attLen']):
+                    # sparse runs have no clusters
+                    if _run['lcn'] is None or _run['length'] == 0:
+                        continue
+                    yield binascii.hexlify(CLUSTERMAP_RUN.pack(_run['lcn'], _run['length'],
+                                                               _run['vcn'] + _nonres['VCNstart'], _owner, _label,
+                                                               _inuse))
+        except (struct.error, ValueError, IndexError, OverflowError):
+            # damaged attributes; the runs found so far are kept
+            continue
+
+
+def clusterMapLayers(_lines):
+    """
+    put every run into the first layer whose last run ends before it starts; the number of layers is the
+    largest number of runs over one cluster, e.g. stale runs of deleted files over the runs of a newer file
+    :param _lines: hex lines of CLUSTERMAP_RUN sorted by start cluster
+    :return: generator of the lines with the layer as 8 hex digits in front
+    """
+
+    _ends = []          # heap of (end of the last run, layer)
+
+    for _line in _lines:
+        (_start, _length) = struct.unpack(">QQ", binascii.unhexlify(_line[:32]))
+        if _ends and _ends[0][0] <= _start:
+            _layer = heapq.heappop(_ends)[1]
+        else:
+            _layer = len(_ends)
+        heapq.heappush(_ends, (_start + _length, _layer))
+        yield "{:08x}".format(_layer) + _line
+
+
+def clusterMapRun(_map, i):
+    """
+    :return: run i of a cluster map as (start, length, vcn, record, stream, in use)
+    """
+
+    return CLUSTERMAP_RUN.unpack_from(_map['runs'], _map['base'] + i * CLUSTERMAP_RUN.size)
+
+
+def iterClusterMap(_map):
+    """
+    all runs of a cluster map
+    :return: generator of (start, length, vcn, record, stream, in use)
+    """
+
+    for i in xrange(_map['count']):
+        yield clusterMapRun(_map, i)
+
+
+def saveClusterMap(_map, _mapfile):
+    """
+    write a cluster map of buildClusterMap into a file; loadClusterMap maps it without rebuilding
+    :param _map:     cluster map
+    :param _mapfile: file name
+    :return: nothing
+    """
+
+    try:
+        with open(_mapfile + ".tmp", "wb") as _file:
+            _file.write(CLUSTERMAP_HEADER.pack(CLUSTERMAP_MAGIC, _map['clustersize'], _map['offset'], _map['count'],
+                                               len(_map['layers'])))
+            _file.write(struct.pack("<{}Q".format(len(_map['layers'])), *_map['layers']))
+            _end = _map['base'] + _map['count'] * CLUSTERMAP_RUN.size
+            for _start in xrange(_map['base'], _end, EXTRACTCHUNK):
+                _file.write(_map['runs'][_start:min(_start + EXTRACTCHUNK, _end)])
+            _file.write(json.dumps(_map['labels']))
+        os.rename(_mapfile + ".tmp", _mapfile)
+    except (IOError, OSError) as syserr:
+        errnote = "Can't write cluster map '{}' ({})".format(_mapfile, syserr)
+        raise StateFileError(errnote)
+
+
+def loadClusterMap(_mapfile):
+    """
+    map a cluster map written by saveClusterMap; the runs are read from the file when they are looked up
+    :param _mapfile: file name
+    :return: cluster map dictonary like buildClusterMap
+    """
+
+    try:
+        with open(_mapfile, "rb") as _file:
+            (_magic, _clustersize, _partoffset, _count, _layercount) = CLUSTERMAP_HEADER.unpack(
+                _file.read(CLUSTERMAP_HEADER.size).ljust(CLUSTERMAP_HEADER.size, "\0"))
+            if _magic != CLUSTERMAP_MAGIC:
+                errnote = "'{}' is not a cluster map of this tool.".format(_mapfile)
+                raise StateFileError(errnote)
+            _layers = list(struct.unpack("<{}Q".format(_layercount), _file.read(8 * _layercount)))
+            _base = CLUSTERMAP_HEADER.size + 8 * _layercount
+            _runs = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except IOError as syserr:
+        errnote = "Can't read cluster map '{}' ({})".format(_mapfile, syserr)
+        raise StateFileError(errnote)
+    except (struct.error, ValueError, mmap.error) as err:
+        errnote = "Cluster map '{}' is damaged ({})".format(_mapfile, err)
+        raise StateFileError(errnote)
+
+    try:
+        if len(_runs) < _base + _count * CLUSTERMAP_RUN.size or _layers[-1:] != [_count] or _layers != sorted(_layers):
+            raise ValueError("runs or layers cut off")
+        _labels = json.loads(_runs[_base + _count * CLUSTERMAP_RUN.size:])
+    except ValueError as err:
+        _runs.close()
+        errnote = "Cluster map '{}' is damaged ({})".format(_mapfile, err)
+        raise StateFileError(errnote)
+
+    return {'clustersize': _clustersize, 'offset': _partoffset, 'count': _count, 'layers': _layers,
+            'runs': _runs, 'base': _base, 'labels': _labels}
+
+
+def clusterOwners(_map, _lcn):
+    """
+    owners of a cluster by a binary search in every layer of the cluster map
+    :param _map: cluster map from buildClusterMap or loadClusterMap
+    :param _lcn: cluster number, relative to the start of the partition
+    :return: list of {'record', 'stream', 'inuse', 'vcn'}; vcn is the cluster of the stream, empty if no
+             record owns the cluster
+    """
+
+    _owners = []
+
+    for _layer in xrange(len(_map['layers']) - 1):
+
+        # last run of the layer starting at or before _lcn
+        (_low, _high) = (_map['layers'][_layer], _map['layers'][_layer + 1])
+        while _low < _high:
+            _middle = (_low + _high) // 2
+            if clusterMapRun(_map, _middle)[0] <= _lcn:
+                _low = _middle + 1
+            else:
+                _high = _middle
+        if _low == _map['layers'][_layer]:
+            continue
+
+        (_start, _length, _vcn, _recordnr, _stream, _inuse) = clusterMapRun(_map, _low - 1)
+        if _start + _length > _lcn:
+            _owners.append({'record': _recordnr, 'stream': _map['labels'][_stream], 'inuse': bool(_inuse),
+                            'vcn': _vcn + _lcn - _start})
+
+    return _owners
+
+
+def offsetOwners(_map, _offset):
+    """
+    owners of a byte of the image, e.g. a hit of a keyword search
+    :param _map:    cluster map from buildClusterMap or loadClusterMap
+    :param _offset: absolute offset in the image
+    :return: (cluster, list from clusterOwners with 'fileoffset', the offset of the byte in the stream, added)
+    """
+
+    (_lcn, _within) = divmod(_offset - _map['offset'], _map['clustersize'])
+
+    _owners = clusterOwners(_map, _lcn) if _lcn >= 0 else []
+    for _owner in _owners:
+        _owner['fileoffset'] = _owner['vcn'] * _map['clustersize'] + _within
+
+    return _lcn, _owners
+
+
+'''
+Hashing
+'''
+
+def recordFilename(_record):
+    """
+    return the filename of a record; the long name is preferred to the DOS name
+    :param _record: record from applyFixup
+    :return: filename utf-8 encoded; empty if the record has no $FILE_NAME
+    """
+
+    filename = ""
+
+    for _header in iterAttributes(_record):
+
+        if _header['attHex'] != "30000000":
+            continue
+
+        try:
+            _fndata = unpackData(_record, _header['attPos'], FN_DATA, _header['attPos'] + _header['attLen'])
+        except struct.error:
+            continue
+
+        if filename == "" or _fndata['fntype'] != 2:
+            filename = _fndata['filename'][:2 * _fndata['nameLength']].decode("utf-16le", "replace")\
+                .encode("utf-8")
+
+    return filename
+
+
+def hashStream(_partoffset, _clustersize, _stream):
+    """
+    hash the content of a stream in one pass with all algorithms of HASHES
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _stream:      stream dictonary from findStream
+    :return: list of hexdigests in order of HASHES
+    """
+
+    _hashes = [hashlib.new(_name) for _name in HASHES]
+    _zeros = ""
+
+    for (_length, _data) in iterStream(_partoffset, _clustersize, _stream, HASHCHUNK):
+
+        # sparse/not initialized; feed zeros without reading
+        if _data is None:
+            if len(_zeros) < min(_length, HASHCHUNK):
+                _zeros = "\0" * min(_length, HASHCHUNK)
+            while _length > 0:
+                for _hash in _hashes:
+                    _hash.update(_zeros[:_length])
+                _length -= len(_zeros)
+            continue
+
+        for _hash in _hashes:
+            _hash.update(_data)
+
+    return [_hash.hexdigest() for _hash in _hashes]
+
+
+def iterHashTasks(_partoffset, _clustersize, _datarunMFT, _startrecord=0):
+    """
+    find the allocated files of the MFT with a $DATA stream
+    :param _startrecord: first record to check
+    :return: generator of (recordnumber, filename, stream); (recordnumber, None, RecordError) for corrupt records
+    """
+
+    for (_recordnr, _offset, _record, _fixed, _extensions) in iterRecordsExtended(_partoffset, _clustersize,
+                                                                                  _datarunMFT, _startrecord):
+
+        if _record[:4] != "FILE":
+            continue
+
+        if _fixed is None:
+            # unused records are often left with a broken update sequence
+            if struct.unpack_from("<H", _record, 22)[0] & 1:
+                err_note = "Update sequence of record at offset {:} does not match.".format(_offset)
+                yield _recordnr, None, RecordError(err_note)
+            continue
+
+        # allocated files only, no directories or extension records
+        if struct.unpack_from("<H", _fixed, 22)[0] != 1 or struct.unpack_from("<Q", _fixed, 32)[0] != 0:
+            continue
+
+        try:
+            _stream = findStream(_fixed, u"", "80000000", _extensions)
+            if _stream is None:
+                continue
+            _filename = recordFilename(_fixed)
+        except (struct.error, ValueError, IndexError) as err:
+            yield _recordnr, None, RecordError("Damaged attributes ({})".format(err))
+            continue
+
+        yield _recordnr, _filename, _stream
+
+
+def hashManifest(_partoffset, _clustersize, _datarunMFT, _threads=HASHTHREADS, _startrecord=0, _done=()):
+    """
+    hash all files of the MFT; the MFT is read by one thread and the files are read and hashed
+    by _threads threads, so reading and hashing overlap
+    :param _partoffset:  start of partition
+    :param _clustersize: bytes per cluster
+    :param _datarunMFT:  MFT Positions
+    :param _threads:     number of hashing threads
+    :param _startrecord: first record to hash
+    :param _done:        records behind _startrecord which are already hashed
+    :return: generator of (recordnumber, line 'record|filename|size|md5|sha1|sha256' or RecordError,
+             resume record) in order of completion; all records before the resume record are finished
+    """
+
+    _tasks = Queue.Queue(_threads * 16)
+    _results = Queue.Queue(_threads * 16)
+    _pending = set()                        # records handed to the workers and not yet yielded
+    _scanned = [_startrecord]               # resume record if nothing is pending
+    _lock = threading.Lock()
+
+    def _scan():
+        try:
+            for (_recordnr, _filename, _stream) in iterHashTasks(_partoffset, _clustersize, _datarunMFT,
+                                                                 _startrecord):
+                if _recordnr in _done:
+                    continue
+                with _lock:
+                    _pending.add(_recordnr)
+                    _scanned[0] = _recordnr + 1
+                if isinstance(_stream, RecordError):
+                    _results.put((_recordnr, _stream))
+                else:
+                    _tasks.put((_recordnr, _filename, _stream))
+        except BaseException as err:
+            _results.put((None, err))
+        for i in range(_threads):
+            _tasks.put(None)
+
+    def _hash():
+        while True:
+            _task = _tasks.get()
+            if _task is None:
+                _results.put(None)
+                return
+            (_recordnr, _filename, _stream) = _task
+            try:
+                _digests = hashStream(_partoffset, _clustersize, _stream)
+            except (RecordError, struct.error) as err:
+                _results.put((_recordnr, RecordError(err)))
+                continue
+            except BaseException as err:
+                _results.put((None, err))
+                continue
+            _size = len(_stream['content']) if _stream['resident'] else _stream['logSize']
+            _results.put((_recordnr, "{}|{}|{}|{}".format(_recordnr, _filename, _size, "|".join(_digests))))
+
+    _workers = [threading.Thread(target=_scan)] + [threading.Thread(target=_hash) for i in range(_threads)]
+    for _worker in _workers:
+        _worker.daemon = True
+        _worker.start()
+
+    _finished = 0
+    while _finished < _threads:
+        _result = _results.get()
+        if _result is None:
+            _finished += 1
+            continue
+
+        (_recordnr, _line) = _result
+        if _recordnr is None:
+            if isinstance(_line, MFTError):
+                raise _line
+            err_note = "Error while hashing: {}".format(_line)
+            raise MFTError(err_note)
+
+        with _lock:
+            _pending.discard(_recordnr)
+            _resume = min(_pending) if _pending else _scanned[0]
+
+        yield _recordnr, _line, _resume
+
+
+'''
+Checkpoint
+'''
+
+def readCheckpoint(_checkpointfile, _scan):
+    """
+    read the state of an interrupted scan
+    :param _checkpointfile: path of the checkpoint file
+    :param _scan:           name of the scan; a checkpoint of another scan is refused
+    :return: state dictonary as given to writeCheckpoint; None if the file doesn't exist
+    """
+
+    try:
+        with open(_checkpointfile, "r") as checkpoint:
+            _state = json.load(checkpoint)
+    except IOError:
+        return None
+    except ValueError:
+        err_note = "Checkpoint file '{}' is damaged.".format(_checkpointfile)
+        raise StateFileError(err_note)
+
+    if _state.get('scan') != _scan:
+        err_note = "Checkpoint file '{}' does not belong to a {} scan.".format(_checkpointfile, _scan)
+        raise StateFileError(err_note)
+
+    return _state
+
+
+def writeCheckpoint(_checkpointfile, _state, _outfile=None):
+    """
+    save the state of a scan; the output file is written to disk before, so its saved size
+    never contains less than the state says. Replaced at once, so a broken run keeps the old checkpoint
+    :param _checkpointfile: path of the checkpoint file
+    :param _state:          dictonary with 'scan', 'position' and everything needed to resume
+    :param _outfile:        output file of the scan; its size is saved as 'output'
+    :return: nothing
+    """
+
+    if _outfile is not None:
+        _outfile.flush()
+        os.fsync(_outfile.fileno())
+        _state['output'] = _outfile.tell()
+
+    with open(_checkpointfile + ".tmp", "w") as checkpoint:
+        json.dump(_state, checkpoint)
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+
+    os.rename(_checkpointfile + ".tmp", _checkpointfile)
+
+
+def resumeOutput(_output, _state):
+    """
+    open the output file of a scan; a resumed scan cuts the lines written after the checkpoint
+    :param _output: path of the output file
+    :param _state:  state from readCheckpoint or None for a new scan
+    :return: opened file positioned at the end
+    """
+
+    if _state is None:
+        return open(_output, "w")
+
+    _outfile = open(_output, "r+")
+    _outfile.truncate(_state['output'])
+    _outfile.seek(_state['output'])
+
+    return _outfile
+
+
+'''
+Library API
+'''
+
+volumeLock = threading.RLock()      # guards the caches of the volumes and the global openedFile of open_volume
+
+def open_volume(_image, _offset=0):
+    """
+    open the NTFS partition at _offset of an image or device; every volume has its own file and read lock,
+    so many volumes can be open in one process and threads can use them at the same time
+    :param _image:  raw image or device
+    :param _offset: start of partition in bytes
+    :return: volume dictonary {'image', 'offset', 'clustersize', 'vbrdata', 'datarunMFT', 'extents', 'file',
+             'lock'}
+    """
+
+    global openedFile
+    global file_is_open
+
+    (_file_is_ok, _errnote, _devicesize) = checkfile(_image)
+    if not _file_is_ok:
+        raise ImageError(_errnote)
+
+    # findMFT reads the global openedFile; a volume of useVolume in this thread would hide it
+    with volumeLock:
+        _saved = (openedFile, file_is_open, getattr(volumeFiles, 'file', None))
+        volumeFiles.file = None
+        try:
+            (_datarunMFT, _vbrdata) = findMFT(_image, _offset)
+            _file = openedFile
+        finally:
+            (openedFile, file_is_open, volumeFiles.file) = _saved
+
+    _clustersize = _vbrdata["bps"] * _vbrdata["spc"]
+
+    # the record cache gets at most a quarter of the memory budget
+    _cachesize = RECORDCACHE if MAXMEMORY is None else max(1, min(RECORDCACHE, MAXMEMORY // 4 // RECORDSIZE))
+
+    return {'image': _image, 'offset': _offset, 'clustersize': _clustersize, 'vbrdata': _vbrdata,
+            'datarunMFT': _datarunMFT, 'extents': mftExtents(_offset, _clustersize, _datarunMFT), 'file': _file,
+            'lock': threading.Lock(), 'cache': collections.OrderedDict(), 'cachesize': _cachesize}
+
+
+def close_volume(_volume):
+    """
+    close the file and the reader pool of a volume from open_volume and the temporary files of a
+    spilled name index
+    :return: nothing
+    """
+
+    closeReaders(_volume['file'])
+    _volume['file'].close()
+
+    for _key in ('names', 'children', 'byname'):
+        if hasattr(_volume.get(_key), 'close'):
+            _volume[_key].close()
+
+
+@contextlib.contextmanager
+def useVolume(_volume):
+    """
+    make the file of _volume the file read by the parsing functions of this thread for the duration of
+    the with block; other threads read their own volumes at the same time
+    :param _volume: volume from open_volume
+    """
+
+    _saved = (getattr(volumeFiles, 'file', None), getattr(volumeFiles, 'lock', None))
+    (volumeFiles.file, volumeFiles.lock) = (_volume['file'], _volume['lock'])
+    try:
+        yield _volume
+    finally:
+        (volumeFiles.file, volumeFiles.lock) = _saved
+
+
+def recordOffset(_volume, _recordnr):
+    """
+    absolute offset of a record, calculated from the MFT extents without reading
+    :param _volume:   volume from open_volume
+    :param _recordnr: record number
+    :return: absolute offset
+    """
+
+    return extentOffset(_volume['extents'], _recordnr)
+
+
+def recordInfo(_recordnr, _offset, _record, _extensions=()):
+    """
+    header values, filename, attributes and $DATA streams of a fixed record
+    :param _recordnr:   record number
+    :param _offset:     absolute offset of the record
+    :param _record:     record from applyFixup
+    :param _extensions: extension records of the record; their attributes and streams are added
+    :return: dictonary {'number', 'offset', 'sequence', 'lsn', 'flags', 'inuse', 'directory', 'baseRecord',
+             'filename', 'securityId', 'attributes', 'streams', 'extensions', 'record'}
+    """
+
+    (_lsn, _sequence, _flags) = struct.unpack_from("<QH4xH", _record, 8)
+
+    try:
+        _attributes = [_header for _part in [_record] + list(_extensions) for _header in iterAttributes(_part)]
+        _streams = listStreams(_record, _extensions)
+        _filename = recordFilename(_record)
+        _securityid = recordSecurityId(_record)
+    except (struct.error, ValueError, IndexError) as err:
+        err_note = "Damaged attributes in record {} ({})".format(_recordnr, err)
+        raise RecordError(err_note)
+
+    return {'number': _recordnr, 'offset': _offset, 'sequence': _sequence, 'lsn': _lsn, 'flags': _flags,
+            'inuse': bool(_flags & 1), 'directory': bool(_flags & 2),
+            'baseRecord': struct.unpack_from("<Q", _record, 32)[0] & 0xffffffffffff,
+            'filename': _filename, 'securityId': _securityid, 'attributes': _attributes, 'streams': _streams,
+            'extensions': [struct.unpack_from("<I", _extension, 44)[0] for _extension in _extensions],
+            'record': _record}
+
+
+def get_record(_volume, _recordnr):
+    """
+    read and decode one record; the extension records of a base record with an attribute list are read
+    through the same cache
+    :param _volume:   volume from open_volume
+    :param _recordnr: record number
+    :return: dictonary from recordInfo
+    """
+
+    (_offset, _record) = cachedRecord(_volume, _recordnr)
+    countStat('records')
+
+    _extensions = []
+    if struct.unpack_from("<Q", _record, 32)[0] == 0:
+        try:
+            with useVolume(_volume):
+                _numbers = extensionNumbers(_recordnr, readAttributeList(_volume['offset'], _volume['clustersize'],
+                                                                         _record))
+            for _number in _numbers:
+                _extension = cachedRecord(_volume, _number)[1]
+                if validExtension(_extension, _recordnr):
+                    _extensions.append(_extension)
+        except (struct.error, ValueError, IndexError) as err:
+            err_note = "Damaged attribute list in record {} ({})".format(_recordnr, err)
+            raise RecordError(err_note)
+
+    return recordInfo(_recordnr, _offset, _record, _extensions)
+
+
+def cachedRecord(_volume, _recordnr):
+    """
+    read one fixed record through the record cache of the volume
+    :param _volume:   volume from open_volume
+    :param _recordnr: record number
+    :return: (absolute offset, record from applyFixup)
+    """
+
+    _offset = recordOffset(_volume, _recordnr)
+
+    with volumeLock:
+        _record = _volume['cache'].pop(_recordnr, None)
+        if _record is not None:
+            _volume['cache'][_recordnr] = _record
+            return _offset, _record
+
+    with useVolume(_volume):
+        _raw = readRaw(_offset, RECORDSIZE)
+
+    if _raw[:4] != "FILE":
+        err_note = "Record {} at offset {:} has no FILE signature.".format(_recordnr, _offset)
+        raise RecordError(err_note)
+
+    _record = applyFixup(_raw)
+    if _record is None:
+        err_note = "Update sequence of record at offset {:} does not match.".format(_offset)
+        raise RecordError(err_note)
+
+    with volumeLock:
+        _volume['cache'][_recordnr] = _record
+        if len(_volume['cache']) > _volume['cachesize']:
+            _volume['cache'].popitem(last=False)
+
+    return _offset, _record
+
+
+def get_security(_volume, _securityid):
+    """
+    security descriptor of a security id; $Secure is opened with the first call, the parsed
+    descriptors are cached per volume
+    :param _volume:     volume from open_volume
+    :param _securityid: security id, e.g. 'securityId' of get_record
+    :return: dictonary from parseSecurityDescriptor
+    """
+
+    with volumeLock:
+        if 'security' not in _volume:
+            # a volume without $Secure is not searched again
+            _volume['security'] = None
+            with useVolume(_volume):
+                _volume['security'] = openSecurity(_volume['offset'], _volume['clustersize'], _volume['datarunMFT'])
+
+    if _volume['security'] is None:
+        err_note = "No $Secure:$SDS found. Volume older than NTFS 3.0?"
+        raise VolumeError(err_note)
+
+    with useVolume(_volume):
+        return securityDescriptor(_volume['offset'], _volume['clustersize'], _volume['security'], _securityid)
+
+
+def iter_records(_volume, _startrecord=0, _skipcorrupt=True):
+    """
+    decode all records of the MFT in large sequential reads
+    :param _volume:      volume from open_volume
+    :param _startrecord: first record
+    :param _skipcorrupt: skip damaged records; raise RecordError if False
+    :return: generator of dictonaries from recordInfo; records without FILE signature are left out
+    """
+
+    _records = iterRecordsExtended(_volume['offset'], _volume['clustersize'], _volume['datarunMFT'], _startrecord)
+
+    while True:
+
+        # the volume is only used while reading, so other volumes can be read between two records
+        with useVolume(_volume):
+            try:
+                (_recordnr, _offset, _raw, _record, _extensions) = next(_records)
+            except StopIteration:
+                return
+
+        if _raw[:4] != "FILE":
+            continue
+
+        try:
+            if _record is None:
+                err_note = "Update sequence of record at offset {:} does not match.".format(_offset)
+                raise RecordError(err_note)
+            _info = recordInfo(_recordnr, _offset, _record, _extensions)
+        except RecordError:
+            if _skipcorrupt:
+                continue
+            raise
+
+        yield _info
+
+
+'''
+Query
+'''
+
+def recordNames(_record):
+    """
+    parents and names of a record for the name index: every $FILE_NAME but the DOS names, so hard links
+    are found by all their names; the DOS name only if there is no other
+    :param _record: record from applyFixup
+    :return: list of (parent record number, name); empty if the record has no $FILE_NAME
+    """
+
+    _found = []
+    _dosnames = []
+
+    for _header in iterAttributes(_record):
+
+        if _header['attHex'] != "30000000":
+            continue
+
+        try:
+            _fndata = unpackData(_record, _header['attPos'], FN_DATA, _header['attPos'] + _header['attLen'])
+        except struct.error:
+            continue
+
+        _name = _fndata['filename'][:2 * _fndata['nameLength']].decode("utf-16le", "replace")
+        _entry = (LEint(_fndata['parentRec']), _name)
+
+        _names = _dosnames if _fndata['fntype'] == 2 else _found
+        if _entry not in _names:
+            _names.append(_entry)
+
+    return _found or _dosnames
+
+
+def memoryBudget(_default):
+    """
+    budget of one whole-volume structure
+    :param _default: budget in bytes without MAXMEMORY
+    :return: _default, limited by MAXMEMORY
+    """
+
+    return _default if MAXMEMORY is None else min(_default, MAXMEMORY)
+
+
+def nameKey(_name):
+    """
+    sort key of a lower case name in SpilledKeys; escaped, so it has no newline and no NUL
+    """
+
+    return _name.encode("utf-8").encode("string_escape") + "\0"
+
+
+class SpilledNames(object):
+    """
+    'names' of a spilled name index: a table of NAME_ENTRY per record number and a heap of the
+    UTF-8 names, both in memory-mapped temporary files; used like the dictonary {record: (parent, name)}
+    """
+
+    def __init__(self, _records):
+        self.records = max(_records, 1)
+        self.tablefile = tempfile.TemporaryFile(prefix="mftnames")
+        self.tablefile.truncate(self.records * NAME_ENTRY.size)
+        self.table = mmap.mmap(self.tablefile.fileno(), 0)
+        self.heapfile = tempfile.TemporaryFile(prefix="mftnames")
+        # offset 0 stands for no name
+        self.heapfile.write("\0")
+        self.heapsize = 1
+        self.heap = None
+        self.count = 0
+
+    def add(self, _recordnr, _parent, _name):
+        _name = _name.encode("utf-8")
+        self.heapfile.write(_name)
+        NAME_ENTRY.pack_into(self.table, _recordnr * NAME_ENTRY.size, _parent, self.heapsize, len(_name))
+        self.heapsize += len(_name)
+        self.count += 1
+
+    def finish(self):
+        self.heapfile.flush()
+        self.heap = mmap.mmap(self.heapfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def entry(self, _recordnr):
+        if not 0 <= _recordnr < self.records:
+            return None
+        (_parent, _nameoffset, _length) = NAME_ENTRY.unpack_from(self.table, _recordnr * NAME_ENTRY.size)
+        if _nameoffset == 0:
+            return None
+        return _parent, self.heap[_nameoffset:_nameoffset + _length].decode("utf-8")
+
+    def __contains__(self, _recordnr):
+        return self.entry(_recordnr) is not None
+
+    def __getitem__(self, _recordnr):
+        _entry = self.entry(_recordnr)
+        if _entry is None:
+            raise KeyError(_recordnr)
+        return _entry
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        for _file in (self.table, self.heap, self.tablefile, self.heapfile):
+            if _file is not None:
+                _file.close()
+        (self.table, self.heap, self.tablefile, self.heapfile) = (None, None, None, None)
+
+
+class SpilledKeys(object):
+    """
+    sorted lines 'nameKey parent record' of a spilled name index in a memory-mapped temporary file,
+    with a table of the line offsets for the binary search
+    """
+
+    def __init__(self, _lines):
+        self.datafile = tempfile.TemporaryFile(prefix="mftkeys")
+        self.offsetfile = tempfile.TemporaryFile(prefix="mftkeys")
+        self.count = 0
+        _position = 0
+
+        for _line in _lines:
+            self.datafile.write(_line)
+            self.offsetfile.write(struct.pack("<Q", _position))
+            _position += len(_line)
+            self.count += 1
+        self.offsetfile.write(struct.pack("<Q", _position))
+
+        self.datafile.flush()
+        self.offsetfile.flush()
+        self.data = mmap.mmap(self.datafile.fileno(), 0, access=mmap.ACCESS_READ) if _position else ""
+        self.offsets = mmap.mmap(self.offsetfile.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def line(self, i):
+        (_start, _end) = struct.unpack_from("<QQ", self.offsets, 8 * i)
+        return self.data[_start:_end]
+
+    def prefixed(self, _prefix):
+        """
+        :return: generator of (parent, record) of the lines starting with _prefix
+        """
+
+        (_low, _high) = (0, self.count)
+        while _low < _high:
+            _middle = (_low + _high) // 2
+            if self.line(_middle) < _prefix:
+                _low = _middle + 1
+            else:
+                _high = _middle
+
+        while _low < self.count:
+            _line = self.line(_low)
+            if not _line.startswith(_prefix):
+                return
+            (_parent, _recordnr) = _line[_line.index("\0") + 1:].split("\0")
+            yield int(_parent, 16), int(_recordnr)
+            _low += 1
+
+    def close(self):
+        if self.offsets is not None:
+            if self.data:
+                self.data.close()
+            self.offsets.close()
+            self.datafile.close()
+            self.offsetfile.close()
+            (self.data, self.offsets) = (None, None)
+
+
+class SpilledChildren(object):
+    """
+    'children' of a spilled name index; used like the dictonary {(parent, lower name): record}
+    """
+
+    def __init__(self, _keys):
+        self.keys = _keys
+
+    def get(self, _key, _default=None):
+        (_parent, _name) = _key
+        for (_found, _recordnr) in self.keys.prefixed(nameKey(_name) + "{:016x}\0".format(_parent)):
+            _default = _recordnr
+        return _default
+
+    def close(self):
+        self.keys.close()
+
+
+class SpilledByName(object):
+    """
+    'byname' of a spilled name index; used like the dictonary {lower name: [records]}
+    """
+
+    def __init__(self, _keys):
+        self.keys = _keys
+
+    def get(self, _name, _default=None):
+        _records = []
+        for (_parent, _recordnr) in self.keys.prefixed(nameKey(_name)):
+            # hard links of the same name in several directories
+            if _recordnr not in _records:
+                _records.append(_recordnr)
+        return _records or _default
+
+    def close(self):
+        self.keys.close()
+
+
+def iterNamedRecords(_volume):
+    """
+    parents and names of all records in use which are no extension records; a record with hard links
+    comes once per name, the first name first
+    :param _volume: volume from open_volume
+    :return: generator of (record number, parent, name)
+    """
+
+    with useVolume(_volume):
+        for (_recordnr, _offset, _record) in iterMFTRecords(_volume['offset'], _volume['clustersize'],
+                                                            _volume['datarunMFT']):
+
+            if _record[:4] != "FILE":
+                continue
+
+            _record = applyFixup(_record)
+            # unused or extension records don't have a name of their own
+            if _record is None or struct.unpack_from("<H", _record, 22)[0] & 1 == 0 \
+                    or struct.unpack_from("<Q", _record, 32)[0] != 0:
+                continue
+
+            for (_parent, _name) in recordNames(_record):
+                yield _recordnr, _parent, _name
+
+
+def buildNameIndex(_volume, _spill=None):
+    """
+    read the names of all records in use into the volume: 'names' {record: (parent, name)} with the
+    first name of a record, 'children' {(parent, lower name): record} and 'byname' {lower name: [records]}
+    with all names, so hard links are found under every parent
+    :param _volume: volume from open_volume
+    :param _spill:  keep the index in memory-mapped temporary files (SpilledNames, SpilledKeys);
+                    default: if the dictonaries of all records would exceed MAXMEMORY
+    :return: number of indexed records
+    """
+
+    _records = sum(_length for (_offset, _length) in _volume['extents']) // RECORDSIZE
+
+    if _spill is None:
+        _spill = MAXMEMORY is not None and _records * NAMEINDEXBYTES > MAXMEMORY
+
+    if _spill:
+        _names = SpilledNames(_records)
+
+        def _lines():
+            _last = None
+            for (_recordnr, _parent, _name) in iterNamedRecords(_volume):
+                if _recordnr != _last:
+                    _names.add(_recordnr, _parent, _name)
+                    _last = _recordnr
+                yield nameKey(_name.lower()) + "{:016x}\0{}".format(_parent, _recordnr)
+
+        # the sort of externalSort gets half of the budget
+        _keys = SpilledKeys(externalSort(_lines(), memoryBudget(SORTMEMORY) // 2))
+        _names.finish()
+
+        _volume['names'] = _names
+        _volume['children'] = SpilledChildren(_keys)
+        _volume['byname'] = SpilledByName(_keys)
+
+        return len(_names)
+
+    _names = {}
+    _children = {}
+    _byname = {}
+
+    for (_recordnr, _parent, _name) in iterNamedRecords(_volume):
+        _names.setdefault(_recordnr, (_parent, _name))
+        _children[(_parent, _name.lower())] = _recordnr
+        _records = _byname.setdefault(_name.lower(), [])
+        # hard links of the same name in several directories
+        if _recordnr not in _records:
+            _records.append(_recordnr)
+
+    _volume['names'] = _names
+    _volume['children'] = _children
+    _volume['byname'] = _byname
+
+    return len(_names)
+
+
+def recordPath(_volume, _recordnr):
+    """
+    full path of a record from the name index
+    :param _volume:   volume with name index from buildNameIndex
+    :param _recordnr: record number
+    :return: path like u'\\dir\\file'; u'?' stands for a missing parent
+    """
+
+    _parts = []
+    _seen = set()
+
+    while _recordnr != ROOTDIR:
+        # orphan or loop of parents
+        if _recordnr not in _volume['names'] or _recordnr in _seen:
+            _parts.append(u"?")
+            break
+        _seen.add(_recordnr)
+        (_recordnr, _name) = _volume['names'][_recordnr]
+        _parts.append(_name)
+
+    return u"\\" + u"\\".join(reversed(_parts))
+
+
+def findPath(_volume, _path):
+    """
+    record number of a path; case insensitive like NTFS
+    :param _volume: volume with name index from buildNameIndex
+    :param _path:   path like u'\\dir\\file' or u'dir/file'
+    :return: record number
+    """
+
+    _recordnr = ROOTDIR
+
+    for _part in _path.replace(u"/", u"\\").split(u"\\"):
+        if _part == u"":
+            continue
+        _recordnr = _volume['children'].get((_recordnr, _part.lower()))
+        if _recordnr is None:
+            err_note = u"Path '{}' not found.".format(_path).encode("utf-8")
+            raise RecordNotFound(err_note)
+
+    return _recordnr
+
+
+def reparsePoint(_volume, _recordnr):
+    """
+    reparse names of a record; kept in the cache 'reparse' of the volume
+    :param _volume:   volume from open_volume
+    :param _recordnr: record number
+    :return: dictonary from reparseNames or None if the record is no link
+    """
+
+    with volumeLock:
+        _cache = _volume.setdefault('reparse', collections.OrderedDict())
+        if _recordnr in _cache:
+            names = _cache.pop(_recordnr)
+            _cache[_recordnr] = names
+            return names
+
+    _info = get_record(_volume, _recordnr)
+
+    names = None
+    if any(_header['attHex'] == "c0000000" for _header in _info['attributes']):
+        _extensions = [cachedRecord(_volume, _number)[1] for _number in _info['extensions']]
+        try:
+            names = recordReparse(_info['record'], _extensions)
+        except (struct.error, ValueError) as err:
+            err_note = "Damaged reparse point in record {} ({})".format(_recordnr, err)
+            raise RecordError(err_note)
+
+    with volumeLock:
+        _cache[_recordnr] = names
+        if len(_cache) > _volume['cachesize']:
+            _cache.popitem(last=False)
+
+    return names
+
+
+def resolvePath(_volume, _path, _depth=REPARSEDEPTH, _visiting=None):
+    """
+    record number of a path like findPath, but junctions and symbolic links on the way are followed;
+    '.' and '..' are resolved by the path like Windows does
+    :param _volume:   volume with name index from buildNameIndex
+    :param _path:     path like u'\\dir\\file' or u'dir/file'
+    :param _depth:    links that may still be followed
+    :param _visiting: links resolved by the calls of resolveLink this path belongs to
+    :return: record number
+    """
+
+    _walked = [ROOTDIR]
+
+    for _part in _path.replace(u"/", u"\\").split(u"\\"):
+
+        if _part in (u"", u"."):
+            continue
+        if _part == u"..":
+            if len(_walked) > 1:
+                _walked.pop()
+            continue
+
+        _recordnr = _volume['children'].get((_walked[-1], _part.lower()))
+        if _recordnr is None:
+            err_note = u"Path '{}' not found.".format(_path).encode("utf-8")
+            raise RecordNotFound(err_note)
+
+        _target = resolveLink(_volume, _recordnr, _depth, _visiting)
+        if _target is None:
+            err_note = u"Link {} in path '{}' not resolvable.".format(_recordnr, _path).encode("utf-8")
+            raise RecordNotFound(err_note)
+
+        _walked.append(_target)
+
+    return _walked[-1]
+
+
+def resolveLink(_volume, _recordnr, _depth=REPARSEDEPTH, _visiting=None):
+    """
+    final target of a junction or symbolic link; chains of links are followed. The targets resolved with
+    the full depth are kept in 'targets' of the volume, so every link of the volume is resolved only once
+    :param _volume:   volume with name index from buildNameIndex
+    :param _recordnr: record number
+    :param _depth:    links that may still be followed
+    :param _visiting: links being resolved by the calls this one is part of; None for a new resolution
+    :return: record number of the target; _recordnr if it is no link; None if the target is on another
+             volume, missing or part of a loop
+    """
+
+    with volumeLock:
+        _targets = _volume.setdefault('targets', {})
+        if _recordnr in _targets:
+            countStat('linkHits')
+            return _targets[_recordnr]
+
+    names = reparsePoint(_volume, _recordnr)
+    if names is None:
+        return _recordnr
+
+    # a loop back to a link of this resolution ends with None
+    if _depth <= 0 or (_visiting is not None and _recordnr in _visiting):
+        return None
+
+    _visiting = set() if _visiting is None else _visiting
+    _visiting.add(_recordnr)
+
+    _path = reparseTargetPath(names, recordPath(_volume, _recordnr))
+
+    _target = None
+    if _path is not None:
+        try:
+            _target = resolvePath(_volume, _path, _depth - 1, _visiting)
+        except RecordNotFound:
+            pass
+
+    _visiting.discard(_recordnr)
+    countStat('links')
+
+    # a link within a chain was resolved with less depth; only full resolutions are final
+    if _depth == REPARSEDEPTH:
+        with volumeLock:
+            _targets[_recordnr] = _target
+
+    return _target
+
+
+def recordSummary(_volume, _info):
+    """
+    JSON serializable summary of a record from get_record
+    :param _volume: volume with name index from buildNameIndex
+    :param _info:   dictonary from recordInfo
+    :return: dictonary
+    """
+
+    _attributes = []
+    for _header in _info['attributes']:
+        _type = [key['name'] for key in ATTRIBUTES if key['hex'] == _header['attHex']]
+        _attributes.append({'type': _type[0] if _type else _header['attHex'], 'name': _header['attName'],
+                            'resident': _header['resident'] == 0, 'length': _header['attLen']})
+
+    # without $Secure (NTFS 1.x) or with a damaged descriptor the summary has no security
+    _security = None
+    if _info['securityId'] is not None:
+        try:
+            _security = get_security(_volume, _info['securityId'])
+        except MFTError:
+            pass
+
+    # junctions and symbolic links with their target on this volume
+    _reparse = None
+    try:
+        _reparse = reparsePoint(_volume, _info['number'])
+    except RecordError:
+        pass
+    if _reparse is not None:
+        _reparse = dict(_reparse)
+        _target = resolveLink(_volume, _info['number'])
+        _reparse['target'] = _target
+        _reparse['targetPath'] = recordPath(_volume, _target) if _target is not None else None
+
+    return {'record': _info['number'], 'offset': _info['offset'], 'sequence': _info['sequence'],
+            'lsn': _info['lsn'], 'inuse': _info['inuse'], 'directory': _info['directory'],
+            'baseRecord': _info['baseRecord'], 'filename': _info['filename'].decode("utf-8"),
+            'path': recordPath(_volume, _info['number']), 'securityId': _info['securityId'],
+            'security': _security, 'reparse': _reparse, 'attributes': _attributes, 'streams': _info['streams']}
+
+
+def queryVolumes(_volumes, _query):
+    """
+    answer a query of the query daemon
+    :param _volumes: list of volumes with name index from buildNameIndex
+    :param _query:   dictonary {'op': 'volumes'|'record'|'path'|'name', 'volume': index,
+                     'record': number, 'path': path, 'name': name}
+    :return: JSON serializable result
+    """
+
+    _op = _query.get('op')
+
+    if _op == "volumes":
+        return [{'volume': i, 'image': _volume['image'], 'offset': _volume['offset'],
+                 'clustersize': _volume['clustersize'], 'records': len(_volume['names'])}
+                for (i, _volume) in enumerate(_volumes)]
+
+    try:
+        _volume = _volumes[int(_query.get('volume', 0))]
+    except (IndexError, ValueError, TypeError):
+        err_note = "Unknown volume {}.".format(_query.get('volume'))
+        raise QueryError(err_note)
+
+    try:
+        if _op == "record":
+            return recordSummary(_volume, get_record(_volume, int(_query['record'])))
+
+        if _op == "path":
+            return recordSummary(_volume, get_record(_volume, findPath(_volume, unicode(_query['path']))))
+
+        if _op == "name":
+            return [{'record': _recordnr, 'path': recordPath(_volume, _recordnr)}
+                    for _recordnr in _volume['byname'].get(unicode(_query['name']).lower(), [])]
+    except (KeyError, ValueError, TypeError) as err:
+        err_note = "Malformed query ({}: {}).".format(type(err).__name__, err)
+        raise QueryError(err_note)
+
+    err_note = "Unknown operation {}.".format(_op)
+    raise QueryError(err_note)
+
+
+'''
+Helper
+'''
+
+def LE(_string, _length=0, _signed=False):
+    """turns pairs of characters from big to little endian
+    :param _string: string to turn
+    :param _length: length of expected string; rest filled with 0 or f
+    :param _signed: signed or unsigned
+    :return: turned string"""
+
+    _newstring = ""
+    i = 0
+
+    if len(_string) % 2 != 0:
+        _string = "0" + _string
+
+    while i < len(_string):
+        _newstring = _newstring + _string[-(i + 2)] + _string[-(i + 1)]
+        i += 2
+
+    _fillin = "0"
+
+    if _signed == True and re.match(r'[8-9a-fA-F]', _newstring[0]):
+        _fillin = "F"
+
+    if _length != 0:
+        while len(_newstring) % _length != 0:
+            _newstring = _fillin + _newstring
+
+    return _newstring
+
+
+def LEint(_string, _signed=False):
+    """turns little endian bytes of any length into an integer
+    :param _string: raw bytes
+    :param _signed: signed or unsigned
+    :return: integer"""
+
+    if not _string:
+        return 0
+
+    _value = int(binascii.hexlify(_string[::-1]), 16)
+
+    if _signed and ord(_string[-1]) & 0x80:
+        _value -= 1 << (8 * len(_string))
+
+    return _value
+
+
+def mfttime(_miliseconds):
+    '''
+    Convert time in hex to human readable date and time for output
+    :param _hextime:
+    :return: mftdatetime; 'INVALID(0x...)' for values beyond the range of datetime
+    '''
+    _us = int(_miliseconds) / 10.
+
+    # corrupt or carved records; one timestamp must not abort the whole output
+    try:
+        _mftdatetime = datetime(1601,1,1) + timedelta(microseconds=_us)
+    except OverflowError:
+        return "INVALID(0x{:016x})".format(int(_miliseconds))
 
     return _mftdatetime
 
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# mftlib and the image generator of bench/ are imported from the checkout
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+sys.path.insert(0, ROOT)
+
+import mkimage
+
+
+@pytest.fixture(scope="session")
+def image(tmpdir_factory):
+    """
+    image of mkimage with system files, a directory and links to it; not to be changed by the tests
+    :return: (path, dictonary from buildImage)
+    """
+
+    _path = str(tmpdir_factory.mktemp("image").join("volume.raw"))
+
+    return _path, mkimage.buildImage(_path, 1700, 3)
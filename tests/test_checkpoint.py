@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import mftlib
+
+
+def manifest(_path, _startrecord=0, _done=()):
+    """hash manifest of the image with two hashing threads"""
+
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(_path, 0)
+
+    return mftlib.hashManifest(0, _vbrdata["bps"] * _vbrdata["spc"], _datarunMFT, 2, _startrecord, _done)
+
+
+def test_resume_after_interruption(image, tmpdir):
+    _full = sorted(_line for (_recordnr, _line, _resume) in manifest(image[0]))
+    _checkpoint = str(tmpdir.join("hash.checkpoint"))
+    _output = str(tmpdir.join("hash.txt"))
+
+    # checkpoint after 50 files like mft.py --hash; the run breaks 10 files later
+    _outfile = mftlib.resumeOutput(_output, None)
+    _done = set()
+    for (i, (_recordnr, _line, _resume)) in enumerate(manifest(image[0])):
+        _outfile.write(_line + "\n")
+        _done.add(_recordnr)
+        if i == 49:
+            _done = set(_number for _number in _done if _number >= _resume)
+            mftlib.writeCheckpoint(_checkpoint, {'scan': "hash", 'position': _resume, 'done': sorted(_done)},
+                                   _outfile)
+        if i == 59:
+            break
+    _outfile.close()
+
+    # the lines behind the checkpoint are cut and hashed again
+    _state = mftlib.readCheckpoint(_checkpoint, "hash")
+    _outfile = mftlib.resumeOutput(_output, _state)
+    for (_recordnr, _line, _resume) in manifest(image[0], _state['position'], set(_state['done'])):
+        _outfile.write(_line + "\n")
+    _outfile.close()
+
+    with open(_output) as _result:
+        assert sorted(_result.read().splitlines()) == _full
+
+
+def test_checkpoint_of_other_scan(tmpdir):
+    _checkpoint = str(tmpdir.join("carve.checkpoint"))
+    mftlib.writeCheckpoint(_checkpoint, {'scan': "carve", 'position': 0})
+
+    with pytest.raises(mftlib.StateFileError):
+        mftlib.readCheckpoint(_checkpoint, "hash")
+
+
+def test_missing_and_damaged_checkpoint(tmpdir):
+    _checkpoint = tmpdir.join("hash.checkpoint")
+
+    assert mftlib.readCheckpoint(str(_checkpoint), "hash") is None
+
+    _checkpoint.write("{\"scan\": \"hash\", ")
+    with pytest.raises(mftlib.StateFileError):
+        mftlib.readCheckpoint(str(_checkpoint), "hash")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import os
+import threading
+
+import pytest
+
+import mkimage
+
+import mftlib
+
+
+@pytest.fixture
+def image_file(image):
+    """the image opened as the file of the parsing functions"""
+
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(image[0], 0)
+    yield _datarunMFT, _vbrdata["bps"] * _vbrdata["spc"]
+    mftlib.closeFile()
+
+
+def extract(_stream, _clustersize, _path):
+    """extract into a regular file; returns (written bytes, content, allocated bytes of the file)"""
+
+    _outfd = os.open(_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _written = mftlib.extractStream(0, _clustersize, _stream, _outfd)
+    finally:
+        os.close(_outfd)
+
+    with open(_path, "rb") as _output:
+        return _written, _output.read(), os.stat(_path).st_blocks * 512
+
+
+def test_sparse_runs_become_holes(image, image_file, tmpdir):
+    (_datarunMFT, _clustersize) = image_file
+    _stream = mftlib.findUsnJournal(0, _clustersize, _datarunMFT)
+
+    (_written, _content, _allocated) = extract(_stream, _clustersize, str(tmpdir.join("J")))
+
+    assert _written == len(_content) == _stream['logSize']
+    assert _content == mftlib.readStreamRange(0, _clustersize, _stream, 0, _stream['logSize'])
+    assert _content[:mkimage.USNSPARSE * _clustersize] == "\0" * mkimage.USNSPARSE * _clustersize
+    # the hole takes no blocks
+    assert _allocated < _stream['logSize']
+
+
+def test_cut_at_logical_size(image, image_file, tmpdir):
+    (_datarunMFT, _clustersize) = image_file
+
+    for _recordnr in range(mkimage.FIRSTFILE, image[1]['records']):
+        _stream = mftlib.findStream(mftlib.readRecord(mftlib.findMFTRecord(0, _clustersize, _recordnr, _datarunMFT)))
+        if _stream is not None and not _stream['resident'] and not mftlib.isCompressed(_stream) and \
+                _stream['logSize'] % _clustersize:
+            break
+    else:
+        pytest.fail("no non-resident stream ending inside a cluster")
+
+    (_written, _content, _allocated) = extract(_stream, _clustersize, str(tmpdir.join("file")))
+
+    assert _written == len(_content) == _stream['logSize']
+    assert _content == mftlib.readStreamRange(0, _clustersize, _stream, 0, _stream['logSize'])
+
+
+def test_pipe_gets_zeros(image, image_file):
+    (_datarunMFT, _clustersize) = image_file
+    _stream = mftlib.findUsnJournal(0, _clustersize, _datarunMFT)
+    (_readfd, _writefd) = os.pipe()
+
+    def writer():
+        try:
+            mftlib.extractStream(0, _clustersize, _stream, _writefd)
+        finally:
+            os.close(_writefd)
+
+    # the pipe is drained here while a thread writes into it
+    _writer = threading.Thread(target=writer)
+    _writer.start()
+    _parts = []
+    while True:
+        _data = os.read(_readfd, 65536)
+        if not _data:
+            break
+        _parts.append(_data)
+    os.close(_readfd)
+    _writer.join()
+
+    assert "".join(_parts) == mftlib.readStreamRange(0, _clustersize, _stream, 0, _stream['logSize'])
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+import binascii
+import shutil
+import threading
+
+import pytest
+
+import mkimage
+
+import mftlib
+
+
+@pytest.fixture
+def volume(image):
+    _volume = mftlib.open_volume(image[0])
+    yield _volume
+    mftlib.close_volume(_volume)
+
+
+def mft(_path):
+    """(datarunMFT, clustersize) of the image; opens it as the file of the parsing functions"""
+
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(_path, 0)
+
+    return _datarunMFT, _vbrdata["bps"] * _vbrdata["spc"]
+
+
+def test_fixup_of_all_records(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+
+    _records = [(_recordnr, _record) for (_recordnr, _offset, _record)
+                in mftlib.iterMFTRecords(0, _clustersize, _datarunMFT) if _record[:4] == "FILE"]
+
+    assert len(_records) == image[1]['records']
+    for (_recordnr, _record) in _records:
+        _fixed = mftlib.applyFixup(_record)
+        assert _fixed is not None, _recordnr
+        # the sector ends hold the saved bytes again
+        assert _fixed[510:512] == _record[50:52] and _fixed[1022:1024] == _record[52:54]
+
+
+def test_fixup_mismatch(image):
+    with open(image[0], "rb") as _image:
+        _image.seek(mkimage.recordPosition(image[1]['mftruns'], 100))
+        _record = bytearray(_image.read(mkimage.RECORDSIZE))
+
+    _record[1022] ^= 0xff
+
+    assert mftlib.applyFixup(str(_record)) is None
+
+
+def test_mft_extents(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _extents = mftlib.mftExtents(0, _clustersize, _datarunMFT)
+
+    assert _extents == [(_lcn * mkimage.CLUSTER, _length * mkimage.CLUSTER) for (_lcn, _length) in image[1]['mftruns']]
+    for _recordnr in (0, 11, 400, 1000, image[1]['records'] - 1):
+        assert mftlib.extentOffset(_extents, _recordnr) == mkimage.recordPosition(image[1]['mftruns'], _recordnr)
+
+    for _recordnr in (image[1]['records'], -1):
+        with pytest.raises(mftlib.RecordNotFound):
+            mftlib.extentOffset(_extents, _recordnr)
+
+
+def test_sparse_stream_extents(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _stream = mftlib.findUsnJournal(0, _clustersize, _datarunMFT)
+    _sparse = mkimage.USNSPARSE * _clustersize
+
+    _extents = mftlib.streamExtents(0, _clustersize, _stream)
+
+    assert _extents[0] == (_sparse, None)
+    assert [_length for (_length, _offset) in _extents] == [_sparse, _stream['logSize'] - _sparse]
+    assert mftlib.clusterRange(_stream['runs'], mkimage.USNSPARSE - 1, 2) == \
+        [(None, 1), (_extents[1][1] // _clustersize, 1)]
+
+
+def test_bitmap(image):
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(image[0], 0)
+    _clustersize = _vbrdata["bps"] * _vbrdata["spc"]
+    _clusters = mftlib.volumeClusters(_vbrdata)
+
+    _used = set()
+    for (_first, _count) in image[1]['used']:
+        _used.update(range(_first, _first + _count))
+    _free = [_lcn for _lcn in range(_clusters) if _lcn not in _used]
+
+    _bitmap = mftlib.readBitmap(0, _clustersize, _datarunMFT)
+
+    assert mftlib.bitmapCounts(_bitmap, _clusters) == (_clusters - len(_free), len(_free))
+    (_starts, _lengths) = mftlib.freeExtents(_bitmap, _clusters)
+    assert sum(_lengths) == len(_free)
+    assert [_start for _start in _starts] == [_lcn for _lcn in _free if _lcn - 1 not in _free]
+
+
+def test_usn_journal(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _stream = mftlib.findUsnJournal(0, _clustersize, _datarunMFT)
+
+    _records = list(mftlib.iterUsnRecords(0, _clustersize, _stream))
+
+    assert [(_record['usn'], _record['fileRef'] & 0xffffffffffff) for _record in _records] == image[1]['usns']
+
+
+def test_logfile(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _stream = mftlib.readRecordStream(0, _clustersize, _datarunMFT, 2)
+    _restart = mftlib.readLogRestart(0, _clustersize, _stream)
+
+    assert mftlib.currentRestart(_restart)['currentLsn'] == image[1]['lsns'][-1]
+    # the long records go on in the next page
+    assert [_record['lsn'] for _record in mftlib.iterLogRecords(0, _clustersize, _stream)] == image[1]['lsns']
+    assert [_record['lsn'] for _record in mftlib.iterLogRecords(0, _clustersize, _stream, image[1]['lsns'][10])] == \
+        image[1]['lsns'][11:]
+
+
+def test_record_out_of_range(volume, image):
+    assert mftlib.get_record(volume, 0)['number'] == 0
+
+    for _recordnr in (-1, -image[1]['records'], image[1]['records']):
+        with pytest.raises(mftlib.RecordNotFound):
+            mftlib.get_record(volume, _recordnr)
+
+
+def test_volumes_in_threads(volume, image, tmpdir):
+    _copy = str(tmpdir.join("copy.raw"))
+    shutil.copy(image[0], _copy)
+    _other = mftlib.open_volume(_copy)
+    _records = []
+
+    # a thread reads another volume while this one is in use
+    try:
+        with mftlib.useVolume(volume):
+            _reader = threading.Thread(target=lambda: _records.append(mftlib.get_record(_other, 1500)))
+            _reader.start()
+            _reader.join(10)
+            assert not _reader.is_alive()
+            assert mftlib.readRecord(mftlib.recordOffset(volume, 1500)) == _records[0]['record']
+    finally:
+        mftlib.close_volume(_other)
+
+    assert _records[0]['number'] == 1500
+
+
+def test_security(volume):
+    assert mftlib.get_record(volume, 1500)['securityId'] == mkimage.LINKSECURITYID
+    assert mftlib.get_security(volume, mkimage.SECURITYID)['owner'] == "S-1-5-32-544"
+    assert mftlib.get_security(volume, mkimage.LINKSECURITYID)['owner'] == "S-1-5-21-1-2-3-1001"
+
+    with pytest.raises(mftlib.RecordNotFound):
+        mftlib.get_security(volume, 0x102)
+
+
+def test_compressed_streams(image):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _found = 0
+
+    for _recordnr in range(3, image[1]['records'], mkimage.COMPRESSED):
+        _record = mftlib.readRecord(mftlib.findMFTRecord(0, _clustersize, _recordnr, _datarunMFT))
+        _stream = mftlib.findStream(_record)
+        if _stream is None or not mftlib.isCompressed(_stream):
+            continue
+        _found += 1
+        assert mftlib.readStreamRange(0, _clustersize, _stream, 0, _stream['logSize']) == \
+            mkimage.compressibleContent(_recordnr, _stream['logSize'])
+
+    assert _found > 0
+
+
+def test_links(volume):
+    mftlib.buildNameIndex(volume)
+
+    assert mftlib.reparsePoint(volume, mkimage.JUNCTION)['type'] == "Junction"
+    assert mftlib.resolveLink(volume, mkimage.JUNCTION) == mftlib.ROOTDIR
+    assert mftlib.reparsePoint(volume, mkimage.DIRECTORY + mkimage.SYMLINK)['type'] == "Symbolic Link"
+    assert mftlib.resolveLink(volume, mkimage.DIRECTORY + mkimage.SYMLINK) == mkimage.DIRECTORY
+    assert mftlib.resolvePath(volume, mftlib.recordPath(volume, mkimage.DIRECTORY + mkimage.JUNCTION)) == \
+        mkimage.DIRECTORY
+
+
+def test_cluster_map(image, tmpdir):
+    (_datarunMFT, _clustersize) = mft(image[0])
+    _map = mftlib.buildClusterMap(0, _clustersize, _datarunMFT)
+
+    (_lcn, _length) = image[1]['mftruns'][-1]
+    assert [(_owner['record'], _owner['stream'], _owner['vcn']) for _owner in mftlib.clusterOwners(_map, _lcn + 1)] == \
+        [(0, u"$DATA", sum(_count for (_first, _count) in image[1]['mftruns'][:-1]) + 1)]
+    assert mftlib.clusterOwners(_map, 0) == []
+
+    # a tiny budget spills the sort every few runs and maps the runs from a temporary file
+    _spilled = mftlib.buildClusterMap(0, _clustersize, _datarunMFT, 4096)
+    assert not isinstance(_spilled['runs'], str)
+    assert list(mftlib.iterClusterMap(_spilled)) == list(mftlib.iterClusterMap(_map))
+
+    # the saved map is used as it is
+    _mapfile = str(tmpdir.join("volume.map"))
+    mftlib.saveClusterMap(_spilled, _mapfile)
+    _loaded = mftlib.loadClusterMap(_mapfile)
+    assert (_loaded['count'], _loaded['layers'], _loaded['labels']) == (_map['count'], _map['layers'], _map['labels'])
+    for _lcn in range(0, mftlib.volumeClusters(mftlib.findMFT(image[0], 0)[1]), 7):
+        assert mftlib.clusterOwners(_loaded, _lcn) == mftlib.clusterOwners(_map, _lcn)
+
+    with open(_mapfile, "r+b") as _file:
+        _file.truncate(100)
+    with pytest.raises(mftlib.StateFileError):
+        mftlib.loadClusterMap(_mapfile)
+
+
+def runMap(_runs, _maxmemory=1 << 20):
+    """cluster map of (start, length, record, in use) runs of one stream"""
+
+    _map = mftlib.layeredRuns((binascii.hexlify(mftlib.CLUSTERMAP_RUN.pack(_start, _length, 0, _recordnr, 0, _inuse))
+                               for (_start, _length, _recordnr, _inuse) in _runs), _maxmemory)
+    _map['labels'] = [u"$DATA"]
+
+    return _map
+
+
+def test_overlapping_runs():
+    # a large deleted run under many small ones
+    _runs = [(0, 1000, 7, 0)] + [(i * 10, 5, 100 + i, 1) for i in range(100)] + [(2000, 10, 8, 1)]
+
+    for _map in (runMap(_runs), runMap(_runs, 256)):
+        def owners(_lcn):
+            return sorted(_owner['record'] for _owner in mftlib.clusterOwners(_map, _lcn))
+
+        assert len(_map['layers']) == 3
+        assert owners(503) == [7, 150] and owners(506) == [7] and owners(999) == [7]
+        assert owners(1000) == [] and owners(2009) == [8] and owners(2010) == []
+        assert sorted(_owner['vcn'] for _owner in mftlib.clusterOwners(_map, 504)) == [4, 504]
+
+
+def test_stale_runs_keep_the_map_linear():
+    # 50 deleted runs over the region of 20000 runs of files in use
+    _runs = [(i * 4, 4, 1000 + i, 1) for i in range(20000)] + [(1000 + i, 50000, 50 + i, 0) for i in range(50)]
+    _map = runMap(_runs)
+
+    assert _map['count'] == len(_runs) and len(_map['runs']) == len(_runs) * mftlib.CLUSTERMAP_RUN.size
+    assert len(_map['layers']) - 1 == 51
+    assert sorted(_owner['record'] for _owner in mftlib.clusterOwners(_map, 1049)) == list(range(50, 100)) + [1262]
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import collections
+
+import mftlib
+
+
+def volume(_links):
+    """
+    volume with files in the root and their reparse names already cached
+    :param _links: {name: target name or None for a file}
+    """
+
+    _volume = {'names': {}, 'children': {}, 'reparse': collections.OrderedDict(), 'cachesize': 100}
+
+    for (i, (_name, _target)) in enumerate(sorted(_links.items())):
+        _volume['names'][100 + i] = (mftlib.ROOTDIR, _name)
+        _volume['children'][(mftlib.ROOTDIR, _name)] = 100 + i
+        _volume['reparse'][100 + i] = None if _target is None else \
+            {'type': "Junction", 'substitute': u"\\??\\C:\\" + _target, 'print': u"C:\\" + _target, 'relative': False}
+
+    return _volume
+
+
+def test_loop():
+    _volume = volume({u"a": u"b", u"b": u"a", u"c": u"a"})
+
+    assert mftlib.resolveLink(_volume, 100) is None
+    assert mftlib.resolveLink(_volume, 102) is None
+    # b was resolved within the chains only and is left to its own resolution
+    assert _volume['targets'] == {100: None, 102: None}
+
+
+def test_chain_is_cached_when_final():
+    _volume = volume({u"a": u"b", u"b": u"c", u"c": u"file", u"file": None})
+
+    assert mftlib.resolveLink(_volume, 100) == 103
+    assert _volume['targets'] == {100: 103}
+    assert mftlib.resolveLink(_volume, 101) == 103
+    assert _volume['targets'] == {100: 103, 101: 103}
+
+
+def test_depth():
+    _links = dict((u"l{:02d}".format(i), u"l{:02d}".format(i + 1)) for i in range(mftlib.REPARSEDEPTH + 1))
+    _links[u"l{:02d}".format(mftlib.REPARSEDEPTH + 1)] = None
+    _volume = volume(_links)
+
+    assert mftlib.resolveLink(_volume, 100) is None
+    assert mftlib.resolveLink(_volume, 101) == 100 + mftlib.REPARSEDEPTH + 1
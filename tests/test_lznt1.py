@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""
+LZNT1 vectors assembled by hand from the format: a chunk header of 12 bit length - 1, signature 3 and the
+compressed flag, then groups of a flag byte and eight literals or back references. A back reference has
+12 - n offset bits and 4 + n length bits, n growing with the position in the chunk (16, 32, 64, ... bytes).
+"""
+
+import struct
+
+import pytest
+
+import mftlib
+
+
+def chunk(_body, _compressed=True):
+    """chunk header in front of _body"""
+
+    return struct.pack("<H", (0x8000 if _compressed else 0) | 0x3000 | (len(_body) - 1)) + _body
+
+
+def group(_items):
+    """
+    flag byte and up to eight items
+    :param _items: literal characters or (offset, length, lengthbits) of back references
+    """
+
+    _flags = 0
+    _body = ""
+
+    for (_bit, _item) in enumerate(_items):
+        if isinstance(_item, tuple):
+            (_offset, _length, _lengthbits) = _item
+            _flags |= 1 << _bit
+            _body += struct.pack("<H", ((_offset - 1) << _lengthbits) | (_length - 3))
+        else:
+            _body += _item
+
+    return chr(_flags) + _body
+
+
+def literals(_text):
+    """groups of eight literals"""
+
+    return "".join(group(list(_text[i:i + 8])) for i in range(0, len(_text), 8))
+
+
+def test_uncompressed_chunk():
+    data = chunk("plain text", _compressed=False)
+    assert mftlib.lznt1Decompress(data, 10) == "plain text"
+
+
+def test_full_uncompressed_chunk():
+    text = "".join(chr(i % 251) for i in range(mftlib.LZNT1CHUNK))
+    assert mftlib.lznt1Decompress(chunk(text, _compressed=False), len(text)) == text
+
+
+def test_back_reference_overlapping():
+    # "abc", then 9 bytes from 3 back: the copy repeats its own output
+    data = chunk(group(["a", "b", "c", (3, 9, 12)]))
+    assert data == "\x05\xb0\x08abc\x06\x20"
+    assert mftlib.lznt1Decompress(data, 12) == "abcabcabcabc"
+
+
+def test_split_after_16_bytes():
+    # at position 17 the offset has 5 bits and the length 11 bits
+    text = "0123456789abcdefg"
+    data = chunk(literals(text[:16]) + group(["g", (17, 17, 11)]))
+    assert data[-2:] == "\x0e\x80"
+    assert mftlib.lznt1Decompress(data, 34) == text * 2
+
+
+def test_split_after_128_bytes():
+    # at position 129 the offset has 8 bits and the length 8 bits
+    text = "".join(chr(0x20 + i % 90) for i in range(129))
+    data = chunk(literals(text[:128]) + group([text[128], (129, 40, 8)]))
+    assert mftlib.lznt1Decompress(data, 169) == text + text[:40]
+
+
+def test_chunks_are_4096_bytes():
+    # a short chunk stands for a full chunk; the next one starts at 4096
+    data = chunk("first", _compressed=False) + chunk(group(["x", (1, 5, 12)]))
+    result = mftlib.lznt1Decompress(data, 2 * mftlib.LZNT1CHUNK)
+    assert result[:5] == "first"
+    assert result[5:mftlib.LZNT1CHUNK] == "\0" * (mftlib.LZNT1CHUNK - 5)
+    assert result[mftlib.LZNT1CHUNK:mftlib.LZNT1CHUNK + 6] == "xxxxxx"
+    assert len(result) == 2 * mftlib.LZNT1CHUNK
+
+
+def test_zero_header_ends_the_data():
+    data = chunk("end", _compressed=False) + "\0\0" + chunk("never", _compressed=False)
+    assert mftlib.lznt1Decompress(data, 2 * mftlib.LZNT1CHUNK) == "end" + "\0" * (2 * mftlib.LZNT1CHUNK - 3)
+
+
+def test_truncated_chunk():
+    data = chunk(group(["a", "b", "c", (3, 9, 12)]))
+    with pytest.raises(mftlib.RecordError):
+        mftlib.lznt1Decompress(data[:-3], 12)
+
+
+def test_back_reference_cut_off():
+    # the flag announces a back reference, but only one byte follows
+    with pytest.raises(mftlib.RecordError):
+        mftlib.lznt1Decompress(chunk("\x02a\x06"), 16)
+
+
+def test_back_reference_in_front_of_the_chunk():
+    with pytest.raises(mftlib.RecordError):
+        mftlib.lznt1Decompress(chunk(group(["a", (2, 3, 12)])), 16)
+
+
+def test_chunk_longer_than_4096_bytes():
+    with pytest.raises(mftlib.RecordError):
+        mftlib.lznt1Decompress(chunk(group(["a", (1, 4095, 12), (1, 4, 12)])), 2 * mftlib.LZNT1CHUNK)
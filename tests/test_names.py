@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import mkimage
+
+import mftlib
+
+
+def nameAttribute(_parent, _name, _namespace, _instance):
+    """resident $FILE_NAME of namespace 1 (Win32), 2 (DOS) or 3 (Win32 and DOS)"""
+
+    _content = mkimage.fileName(_parent, 1, _name, 40)
+    _content = _content[:65] + chr(_namespace) + _content[66:]
+
+    return mkimage.residentAttribute(0x30, _content, _instance=_instance)
+
+
+def names(_attributes):
+    return mftlib.recordNames(mftlib.applyFixup(mkimage.buildRecord(40, _attributes)))
+
+
+def test_hard_links():
+    _attributes = [nameAttribute(5, u"report.txt", 3, 1), nameAttribute(30, u"copy.txt", 3, 2),
+                   nameAttribute(31, u"report.txt", 3, 3)]
+
+    assert names(_attributes) == [(5, u"report.txt"), (30, u"copy.txt"), (31, u"report.txt")]
+
+
+def test_dos_name_left_out():
+    _attributes = [nameAttribute(5, u"LONGFI~1.TXT", 2, 1), nameAttribute(5, u"long file name.txt", 1, 2)]
+
+    assert names(_attributes) == [(5, u"long file name.txt")]
+
+
+def test_only_dos_name():
+    assert names([nameAttribute(5, u"SHORT.TXT", 2, 1)]) == [(5, u"SHORT.TXT")]
+
+
+def test_no_name():
+    assert names([mkimage.residentAttribute(0x10, mkimage.standardInformation(40))]) == []
+
+
+def test_spilled_index_like_in_memory(image):
+    (_inmemory, _spilled) = (mftlib.open_volume(image[0]), mftlib.open_volume(image[0]))
+
+    try:
+        assert mftlib.buildNameIndex(_inmemory, False) == mftlib.buildNameIndex(_spilled, True)
+        assert isinstance(_spilled['byname'], mftlib.SpilledByName)
+
+        _links = 0
+        for _recordnr in range(image[1]['records'] + 1):
+            assert (_recordnr in _spilled['names']) == (_recordnr in _inmemory['names'])
+            if _recordnr not in _inmemory['names']:
+                continue
+            assert _spilled['names'][_recordnr] == _inmemory['names'][_recordnr]
+            _path = mftlib.recordPath(_inmemory, _recordnr)
+            assert mftlib.recordPath(_spilled, _recordnr) == _path
+            assert mftlib.findPath(_spilled, _path.upper()) == mftlib.findPath(_inmemory, _path.upper())
+
+        for ((_parent, _name), _recordnr) in _inmemory['children'].items():
+            assert _spilled['children'].get((_parent, _name)) == _recordnr
+            # the second name of a hard link is found under its own parent
+            if _inmemory['names'][_recordnr][0] != _parent:
+                _links += 1
+
+        for (_name, _records) in _inmemory['byname'].items():
+            assert sorted(_spilled['byname'].get(_name)) == sorted(_records)
+
+        assert _links > 0
+        assert _spilled['children'].get((mftlib.ROOTDIR, u"no such file")) is None
+        assert _spilled['byname'].get(u"no such file") is None
+    finally:
+        mftlib.close_volume(_inmemory)
+        mftlib.close_volume(_spilled)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import struct
+import uuid
+
+import mftlib
+
+SECTOR = 512
+BASICDATA = uuid.UUID("EBD0A0A2-B9E5-4433-87C0-68B6B72699C7")
+
+
+def mbrEntry(_type, _start, _sectors):
+    return struct.pack("<B3xB3xII", 0, _type, _start, _sectors)
+
+
+def bootSector(_entries):
+    """MBR or EBR with up to four partition entries"""
+
+    _sector = "\0" * 446 + "".join(_entries)
+
+    return _sector + "\0" * (510 - len(_sector)) + "\x55\xaa"
+
+
+def writeDisk(_path, _sectors):
+    """write a disk of {first sector: data}"""
+
+    with open(_path, "wb") as _disk:
+        for (_start, _data) in sorted(_sectors.items()):
+            _disk.seek(_start * SECTOR)
+            _disk.write(_data)
+
+
+def partition(_image):
+    with open(_image[0], "rb") as _volume:
+        return _volume.read()
+
+
+def checkVolumes(_disk, _partitions, _image):
+    """the MFT of every partition is found behind its start"""
+
+    for _partition in _partitions:
+        (_datarunMFT, _vbrdata) = mftlib.findMFT(_disk, _partition['offset'])
+        _extents = mftlib.mftExtents(_partition['offset'], _vbrdata["bps"] * _vbrdata["spc"], _datarunMFT)
+        assert _extents[0][0] == _partition['offset'] + _image[1]['mftruns'][0][0] * _vbrdata["bps"] * _vbrdata["spc"]
+
+
+def test_single_volume(image):
+    _partitions = mftlib.listPartitions(image[0])
+
+    assert [(_partition['scheme'], _partition['offset'], _partition['fs']) for _partition in _partitions] == \
+        [("None", 0, "NTFS")]
+
+
+def test_mbr_with_logical_partition(image, tmpdir):
+    _volume = partition(image)
+    _length = len(_volume) // SECTOR
+    _extended = 2048 + _length
+    _disk = str(tmpdir.join("mbr.raw"))
+
+    # the logical partition starts 63 sectors behind its EBR; the second EBR has no partition
+    writeDisk(_disk, {0: bootSector([mbrEntry(0x07, 2048, _length), mbrEntry(0x0f, _extended, _length + 128)]),
+                      2048: _volume,
+                      _extended: bootSector([mbrEntry(0x07, 63, _length), mbrEntry(0x05, _length + 64, 64)]),
+                      _extended + 63: _volume,
+                      _extended + _length + 64: bootSector([])})
+
+    _partitions = mftlib.listPartitions(_disk)
+
+    assert [(_partition['number'], _partition['scheme'], _partition['type'], _partition['offset'],
+             _partition['length'], _partition['fs']) for _partition in _partitions] == \
+        [(1, "MBR", "NTFS/exFAT", 2048 * SECTOR, len(_volume), "NTFS"),
+         (2, "EBR", "NTFS/exFAT", (_extended + 63) * SECTOR, len(_volume), "NTFS")]
+    checkVolumes(_disk, _partitions, image)
+
+
+def test_gpt(image, tmpdir):
+    _volume = partition(image)
+    _length = len(_volume) // SECTOR
+    _disk = str(tmpdir.join("gpt.raw"))
+
+    _header = "EFI PART" + "\0" * 64 + struct.pack("<QII", 2, 128, 128)
+    _name = u"Data".encode("utf-16le")
+    _entry = BASICDATA.bytes_le + uuid.UUID(int=1).bytes_le + struct.pack("<QQQ", 2048, 2048 + _length - 1, 0) + _name
+    _entries = _entry + "\0" * (128 * 128 - len(_entry))
+
+    writeDisk(_disk, {0: bootSector([mbrEntry(0xee, 1, 2048 + _length)]), 1: _header, 2: _entries, 2048: _volume})
+
+    _partitions = mftlib.listPartitions(_disk)
+
+    assert [(_partition['number'], _partition['scheme'], _partition['type'], _partition['offset'],
+             _partition['length'], _partition['name'], _partition['fs']) for _partition in _partitions] == \
+        [(1, "GPT", "Basic Data", 2048 * SECTOR, len(_volume), u"Data", "NTFS")]
+    checkVolumes(_disk, _partitions, image)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+import mftlib
+
+
+def image(_tmpdir):
+    """opened image of 64 KiB counting bytes"""
+
+    _data = "".join(chr(i % 251) for i in range(65536))
+    _path = _tmpdir.join("image.raw")
+    _path.write_binary(_data)
+    mftlib.openFile(str(_path))
+
+    return _data
+
+
+def test_prefetch_in_order(tmpdir):
+    _data = image(tmpdir)
+    try:
+        _requests = [(4096, 100), (None, 0), (0, 512), (60000, 10000)]
+        _reads = list(mftlib.prefetchReads(_requests, 4))
+    finally:
+        mftlib.closeFile()
+
+    assert _reads == [_data[4096:4196], None, _data[:512], _data[60000:]]
+
+
+def test_pool_reused_and_closed(tmpdir):
+    image(tmpdir)
+    _file = mftlib.openedFile
+    try:
+        list(mftlib.prefetchReads(mftlib.chunkRanges(0, 65536, 4096), 3))
+        _workers = list(mftlib.readerPools[_file].workers)
+        # a second scan stopped early runs on the same readers
+        next(mftlib.prefetchReads(mftlib.chunkRanges(0, 65536, 4096), 3))
+        assert mftlib.readerPools[_file].workers == _workers
+    finally:
+        mftlib.closeFile()
+
+    assert _file not in mftlib.readerPools
+    assert not any(_worker.is_alive() for _worker in _workers)
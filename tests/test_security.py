@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+import mftlib
+
+INDEXSIZE = 4096
+
+
+def siiEntry(_securityid, _subnode=None):
+    """$SII entry; the $SDS entry of every id is at 16 times the id"""
+
+    _flags = 0 if _subnode is None else 1
+    _length = 40 if _subnode is None else 48
+    _entry = struct.pack("<HHIHHHHI", 20, 20, 0, _length, 4, _flags, 0, _securityid) + \
+        struct.pack("<IIQI", 0, _securityid, _securityid * 16, 100)
+
+    return _entry if _subnode is None else _entry + struct.pack("<Q", _subnode)
+
+
+def lastEntry(_subnode=None):
+    if _subnode is None:
+        return struct.pack("<HHIHHHH", 0, 0, 0, 16, 0, 2, 0)
+    return struct.pack("<HHIHHHHQ", 0, 0, 0, 24, 0, 3, 0, _subnode)
+
+
+def node(_entries, _offset=16):
+    _body = "".join(_entries)
+    return struct.pack("<IIII", _offset, _offset + len(_body), _offset + len(_body), 1) + "\0" * (_offset - 16) + _body
+
+
+def indexRecord(_vcn, _entries):
+    """INDX record with an update sequence of zeros"""
+
+    _record = "INDX" + struct.pack("<HHQQ", 40, INDEXSIZE // 512 + 1, 0, _vcn) + node(_entries, 40)
+
+    return _record + "\0" * (INDEXSIZE - len(_record))
+
+
+@pytest.fixture
+def security():
+    """$SII of two levels: 10 and 20 in the root, smaller ids in vcn 0, 11 to 19 in vcn 1, larger in vcn 2"""
+
+    _root = struct.pack("<IIIB3x", 0, 0x10, INDEXSIZE, 1) + \
+        node([siiEntry(10, 0), siiEntry(20, 1), lastEntry(2)])
+    _records = [indexRecord(0, [siiEntry(_id) for _id in range(1, 10)] + [lastEntry()]),
+                indexRecord(1, [siiEntry(_id) for _id in range(11, 20)] + [lastEntry()]),
+                indexRecord(2, [siiEntry(_id) for _id in range(21, 30)] + [lastEntry()])]
+
+    return {'root': _root, 'sii': {'resident': True, 'content': "".join(_records)}, 'indexsize': INDEXSIZE,
+            'vcnsize': INDEXSIZE}
+
+
+def test_search_down_the_index(security):
+    for _securityid in range(1, 30):
+        _entry = mftlib.findSecurityEntry(0, 4096, security, _securityid)
+        assert (_entry['securityId'], _entry['sdsOff']) == (_securityid, _securityid * 16)
+
+    for _securityid in (0, 30, 0x100):
+        with pytest.raises(mftlib.RecordNotFound):
+            mftlib.findSecurityEntry(0, 4096, security, _securityid)
+
+
+def test_damaged_index_record(security):
+    security['sii']['content'] = security['sii']['content'][:INDEXSIZE] + "\xff" * INDEXSIZE
+
+    assert mftlib.findSecurityEntry(0, 4096, security, 5)['securityId'] == 5
+    with pytest.raises(mftlib.RecordError):
+        mftlib.findSecurityEntry(0, 4096, security, 15)
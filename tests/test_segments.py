@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+import os
+
+import mkimage
+
+import mftlib
+
+# neither a multiple of the record size nor of the cluster size
+SEGMENTSIZE = 1000003
+
+
+def splitImage(_path, _directory):
+    """split an image into _directory/volume.001, .002, ... of SEGMENTSIZE bytes"""
+
+    _segments = []
+
+    with open(_path, "rb") as _image:
+        while True:
+            _data = _image.read(SEGMENTSIZE)
+            if not _data:
+                break
+            _segments.append(os.path.join(_directory, "volume.{:03d}".format(len(_segments) + 1)))
+            with open(_segments[-1], "wb") as _segment:
+                _segment.write(_data)
+
+    return _segments
+
+
+def test_reads_over_segment_borders(image, tmpdir):
+    _segments = splitImage(image[0], str(tmpdir))
+
+    assert mftlib.segmentFiles(_segments[0]) == _segments
+    assert mftlib.segmentFiles(_segments[1]) == _segments[1:]
+
+    _split = mftlib.openImage(_segments[0])
+    with open(image[0], "rb") as _image:
+        for (_offset, _length) in ((SEGMENTSIZE - 100, 200), (SEGMENTSIZE * 2 - 1, 1), (SEGMENTSIZE - 1, SEGMENTSIZE + 2),
+                                   (0, os.path.getsize(image[0]) + 10), (os.path.getsize(image[0]) - 5, 10)):
+            _image.seek(_offset)
+            _split.seek(_offset)
+            assert _split.read(_length) == _image.read(_length)
+            assert _split.tell() == _image.tell()
+    _split.close()
+
+
+def test_records_of_split_image(image, tmpdir):
+    _segments = splitImage(image[0], str(tmpdir))
+    _volumes = (mftlib.open_volume(image[0]), mftlib.open_volume(_segments[0]))
+
+    try:
+        (_whole, _split) = [[(_info['number'], _info['record']) for _info in mftlib.iter_records(_volume)]
+                            for _volume in _volumes]
+    finally:
+        for _volume in _volumes:
+            mftlib.close_volume(_volume)
+
+    # at least one record is split over two segments
+    assert any(mkimage.recordPosition(image[1]['mftruns'], _recordnr) // SEGMENTSIZE !=
+               (mkimage.recordPosition(image[1]['mftruns'], _recordnr) + mkimage.RECORDSIZE - 1) // SEGMENTSIZE
+               for (_recordnr, _record) in _split)
+    assert len(_split) == image[1]['records']
+    assert _split == _whole
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import pytest
+
+import mkimage
+
+import mftlib
+import mft
+
+
+@pytest.fixture(scope="module")
+def volumes(image):
+    _volume = mftlib.open_volume(image[0])
+    mftlib.buildNameIndex(_volume)
+    yield [_volume]
+    mftlib.close_volume(_volume)
+
+
+def query(_volumes, **_query):
+    return json.loads(mft.answerQuery(_volumes, _query))
+
+
+def test_record_path_and_name(volumes):
+    _record = query(volumes, op="record", record=mkimage.DIRECTORY)
+    assert _record['ok'] and _record['result']['record'] == mkimage.DIRECTORY
+
+    _path = _record['result']['path']
+    assert query(volumes, op="path", path=_path)['result']['record'] == mkimage.DIRECTORY
+    assert query(volumes, op="path", path=_path.upper(), volume="0")['result']['record'] == mkimage.DIRECTORY
+
+    _name = _path.rsplit(u"\\", 1)[1]
+    assert query(volumes, op="name", name=_name.upper())['result'] == [{'record': mkimage.DIRECTORY, 'path': _path}]
+    assert query(volumes, op="name", name=u"no such file")['result'] == []
+
+    assert query(volumes, op="volumes")['result'][0]['records'] == len(volumes[0]['names'])
+
+
+@pytest.mark.parametrize("_query, _error", [
+    ({'op': None}, "QueryError"),
+    ({'op': "delete", 'record': 5}, "QueryError"),
+    ({'op': "record"}, "QueryError"),
+    ({'op': "record", 'record': "five"}, "QueryError"),
+    ({'op': "record", 'record': [5]}, "QueryError"),
+    ({'op': "record", 'record': 5, 'volume': 1}, "QueryError"),
+    ({'op': "record", 'record': 5, 'volume': "first"}, "QueryError"),
+    ({'op': "record", 'record': -1}, "RecordNotFound"),
+    ({'op': "record", 'record': 10 ** 9}, "RecordNotFound"),
+    ({'op': "path", 'path': u"\\no\\such\\path"}, "RecordNotFound")])
+def test_malformed_and_failing_queries(volumes, _query, _error):
+    _response = json.loads(mft.answerQuery(volumes, _query))
+
+    assert not _response['ok'] and _response['error'] == _error and _response['message']
+
+
+def test_socket_path_of_other_file(tmpdir):
+    _path = tmpdir.join("not-a-socket")
+    _path.write("data")
+
+    with pytest.raises(SystemExit):
+        mft.start_serve([], str(_path), None)
+
+    assert _path.read() == "data"
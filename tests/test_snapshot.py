@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import pytest
+
+import mkimage
+
+import mftlib
+
+
+def snapshot(_tmpdir, _count, _entries):
+    """snapshot file announcing _count records but holding _entries"""
+
+    _path = _tmpdir.join("old.snap")
+    _path.write_binary(mftlib.SNAPSHOT_HEADER.pack(mftlib.SNAPSHOT_MAGIC, mftlib.RECORDSIZE, _count) +
+                       mftlib.recordFingerprint("\0" * mftlib.RECORDSIZE) * _entries)
+
+    return str(_path)
+
+
+def test_complete_snapshot(tmpdir):
+    (_snapshot, _count) = mftlib.openSnapshot(snapshot(tmpdir, 3, 3))
+    _snapshot.close()
+
+    assert _count == 3
+
+
+def test_empty_snapshot(tmpdir):
+    _path = tmpdir.join("empty.snap")
+    _path.write_binary("")
+
+    with pytest.raises(mftlib.StateFileError):
+        mftlib.openSnapshot(str(_path))
+
+
+def test_cut_off_snapshot(tmpdir):
+    with pytest.raises(mftlib.StateFileError) as _error:
+        mftlib.openSnapshot(snapshot(tmpdir, 3, 1))
+
+    assert "1 of 3" in str(_error.value)
+
+
+def test_foreign_file(tmpdir):
+    _path = tmpdir.join("foreign.snap")
+    _path.write_binary("x" * 64)
+
+    with pytest.raises(mftlib.StateFileError):
+        mftlib.openSnapshot(str(_path))
+
+
+def scan(_path, _oldsnapshot=None, _newsnapshot=None):
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(_path, 0)
+
+    return [(_change, _recordnr) for (_change, _recordnr, _sequence, _filename)
+            in mftlib.snapshotScan(0, _vbrdata["bps"] * _vbrdata["spc"], _datarunMFT, _oldsnapshot, _newsnapshot)]
+
+
+def test_snapshot_diff(image, tmpdir):
+    _snapshot = str(tmpdir.join("old.snap"))
+    _changed = tmpdir.join("changed.raw")
+    with open(image[0], "rb") as _image:
+        _changed.write_binary(_image.read())
+
+    assert scan(image[0], None, _snapshot) == []
+    assert scan(image[0], _snapshot) == []
+
+    # three files in use: the first is deleted, the second reused, the third changed
+    _records = []
+    with open(str(_changed), "r+b") as _image:
+        for _recordnr in range(mkimage.FIRSTFILE, image[1]['records']):
+            _offset = mkimage.recordPosition(image[1]['mftruns'], _recordnr)
+            _image.seek(_offset)
+            _record = bytearray(_image.read(mftlib.RECORDSIZE))
+            if struct.unpack_from("<H", _record, 22)[0] == 1 and struct.unpack_from("<Q", _record, 32)[0] == 0:
+                _records.append((_recordnr, _offset, _record))
+            if len(_records) == 3:
+                break
+
+        for (_field, _value, (_recordnr, _offset, _record)) in zip((22, 16, 300), (0, 9, 0xee), _records):
+            struct.pack_into("<H", _record, _field, _value)
+            _image.seek(_offset)
+            _image.write(_record)
+
+    assert scan(str(_changed), _snapshot) == [("deleted", _records[0][0]), ("reused", _records[1][0]),
+                                              ("modified", _records[2][0])]
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import mftlib
+
+
+def test_spilled_sort_keeps_lines():
+    _random = random.Random(5)
+    _lines = ["{:020d}|{}".format(_random.randrange(10 ** 18), _name) for _name in
+              ["name\nwith newline", "back\\slash", "tab\there", "nul\0", u"über".encode("utf-8"), "plain"]
+              for i in range(300)]
+
+    # a budget of a few lines spills hundreds of runs and merges them in more than one pass
+    _spilled = list(mftlib.externalSort(iter(_lines), 1000))
+
+    assert _spilled == sorted(_lines)
+    assert list(mftlib.externalSort(iter(_lines))) == _spilled
+
+
+def test_timeline_independent_of_budget(image):
+    (_datarunMFT, _vbrdata) = mftlib.findMFT(image[0], 0)
+    _clustersize = _vbrdata["bps"] * _vbrdata["spc"]
+
+    try:
+        _inmemory = list(mftlib.buildTimeline(0, _clustersize, _datarunMFT))
+        _spilled = list(mftlib.buildTimeline(0, _clustersize, _datarunMFT, 65536))
+    finally:
+        mftlib.closeFile()
+
+    assert len(_inmemory) > 1000
+    assert _spilled == _inmemory
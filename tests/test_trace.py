@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+import random
+
+import mftlib
+
+
+def writeTrace(_path, _reads):
+    with open(_path, "wb") as _trace:
+        _trace.write(mftlib.TRACE_MAGIC)
+        for (_offset, _length) in _reads:
+            _trace.write(mftlib.TRACE_ENTRY.pack(_offset, _length, 10))
+
+
+def test_rereads(tmpdir):
+    _random = random.Random(3)
+    _reads = [(_random.randrange(0, 1 << 24), _random.randrange(0, 1 << 17)) for i in range(2000)]
+    _reads += [(i * 65536, 65536) for i in range(300)]
+    _path = str(tmpdir.join("read.trace"))
+    writeTrace(_path, _reads)
+
+    _seen = set()
+    _rereads = 0
+    for (_offset, _length) in _reads:
+        for _block in range(_offset // mftlib.TRACEBLOCK, (_offset + max(_length, 1) - 1) // mftlib.TRACEBLOCK + 1):
+            _rereads += _block in _seen
+            _seen.add(_block)
+
+    _summary = mftlib.summarizeTrace(_path)
+
+    assert (_summary['reads'], _summary['rereads']) == (len(_reads), _rereads)
+    assert _summary['sequential'] == 299
+
+
+def test_sequential_trace_keeps_one_interval():
+    _blocks = mftlib.BlockIntervals()
+
+    assert [_blocks.add(i, i + 4) for i in range(0, 4000, 4)] == [0] * 1000
+    assert _blocks.add(10, 12) == 2 and _blocks.add(3990, 4010) == 10
+    assert (_blocks.starts, _blocks.ends) == ([0], [4010])
+
+
+def test_reads_take_time_only_while_tracing(image, tmpdir, monkeypatch):
+    _volume = mftlib.open_volume(image[0])
+    _clock = []
+    monkeypatch.setattr(mftlib.time, "time", lambda: _clock.append(1) or 1.0)
+
+    try:
+        mftlib.get_record(_volume, 100)
+        assert _clock == []
+
+        _path = str(tmpdir.join("read.trace"))
+        mftlib.startTrace(_path)
+        try:
+            mftlib.get_record(_volume, 101)
+        finally:
+            mftlib.stopTrace()
+    finally:
+        mftlib.close_volume(_volume)
+
+    assert _clock and [_offset for (_offset, _length, _latency) in mftlib.iterTrace(_path)] == \
+        [mftlib.recordOffset(_volume, 101)]
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import mftlib
+
+
+def usnRecord(_usn, _name, _major=2):
+    """USN_RECORD_V2 or V3 with a name, 8 byte aligned"""
+
+    _name = _name.encode("utf-16le")
+
+    if _major == 2:
+        _header = struct.pack("<IHHQQQQIIIIHH", 0, 2, 0, 100 + _usn, 5, _usn, 130000000000000000, 0x100, 0, 0,
+                              0x20, len(_name), 60)
+    else:
+        _header = struct.pack("<IHH16s16sQQIIIIHH", 0, 3, 0, struct.pack("<Q", 100 + _usn), struct.pack("<Q", 5),
+                              _usn, 130000000000000000, 0x100, 0, 0, 0x20, len(_name), 76)
+
+    _record = _header + _name
+    _record += "\0" * (-len(_record) % 8)
+
+    return struct.pack("<I", len(_record)) + _record[4:]
+
+
+def records(_journal):
+    """decode a journal held as resident stream"""
+
+    return list(mftlib.iterUsnRecords(0, 4096, {'name': u"$J", 'resident': True, 'content': _journal}))
+
+
+def test_records_and_padding():
+    journal = usnRecord(1, u"a.txt") + "\0" * 4096 + usnRecord(2, u"b.txt", 3)
+    found = records(journal)
+    assert [(usn['usn'], usn['name'], usn['major']) for usn in found] == [(1, u"a.txt", 2), (2, u"b.txt", 3)]
+    assert found[1]['offset'] == len(usnRecord(1, u"a.txt")) + 4096
+
+
+def test_corrupt_record_length_in_the_middle():
+    # a header claiming 256 MB must not swallow the rest of the journal
+    bad = struct.pack("<IHH", 0x10000000, 2, 0) + "\xff" * 56
+    journal = usnRecord(1, u"first") + bad + "".join(usnRecord(n, u"file{}".format(n)) for n in range(2, 50))
+    assert [usn['usn'] for usn in records(journal)] == range(1, 50)
+
+
+def test_name_behind_the_record():
+    bad = bytearray(usnRecord(1, u"name"))
+    struct.pack_into("<H", bad, 56, 400)
+    assert [usn['usn'] for usn in records(str(bad) + usnRecord(2, u"next"))] == [2]
+
+
+def test_longest_name():
+    record = usnRecord(7, u"x" * 255, 3)
+    assert len(record) == mftlib.USN_MAXRECORD[3]
+    assert [usn['name'] for usn in records(record)] == [u"x" * 255]